@@ -0,0 +1,108 @@
+from typing import Annotated, Any, Optional, Union
+
+import msgspec
+import orjson
+from flask import Response
+
+# Declarative request schemas for the scoring and forecast endpoints.
+# Bodies are decoded and type-checked in one msgspec pass straight from the raw
+# request bytes (no request.json dict, no per-field checks in the handlers);
+# a missing field or a wrong type fails with a message naming the JSON path.
+# Fields are read into numpy arrays in the model's feature order without a
+# DataFrame. Responses are encoded with orjson (keys sorted like jsonify).
+# Unknown fields are ignored, as the dict-based handlers did, and values are
+# coerced the way their float(...) parsing accepted them: numeric strings such as
+# "12" (strict=False) and booleans for numeric fields.
+
+JSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# Query-string flags: 1/0 and true/false as msgspec converts them, plus yes/no and empty
+FLAG_WORDS = {'yes': True, 'no': False, '': False}
+
+Number = Union[float, bool]
+
+
+class ChurnRequest(msgspec.Struct):
+    customer_tenure: Number
+    number_of_services_or_products: Number
+    average_monthly_usage: Number
+    days_since_last_interaction: Number
+    complaints_resolved_ratio: Number
+    total_spent: Number
+    average_transaction_value: Number
+    discount_or_offer_received: Number
+    account_status: Union[str, int]
+
+
+class ProductRequest(msgspec.Struct):
+    region: str
+    gender: str
+    user_age_group: str
+    user_preferences: str
+    season: str
+    product_keywords: str
+    previous_buy: str
+    user_id: Optional[Union[str, int]] = None
+
+
+class ProductBatchRequest(msgspec.Struct):
+    records: list[ProductRequest]
+    k: Optional[int] = None
+
+
+SeriesName = Annotated[str, msgspec.Meta(pattern=r'^[A-Za-z0-9_-]{1,64}$')]
+
+
+class ForecastParams(msgspec.Struct):
+    # /predict-file query string; values arrive as text and are converted
+    series: Optional[SeriesName] = None
+    aggregate: bool = False
+
+
+class ProductBatchParams(msgspec.Struct):
+    # /predict-product-batch query string; a "k" in the body takes precedence
+    k: Optional[int] = None
+
+
+churn_decoder = msgspec.json.Decoder(ChurnRequest, strict=False)
+product_decoder = msgspec.json.Decoder(ProductRequest, strict=False)
+product_batch_decoder = msgspec.json.Decoder(Union[list[ProductRequest], ProductBatchRequest], strict=False)
+# /predict-churn-batch rows stay loose: a bad value marks its own NDJSON line as an
+# error instead of failing the whole batch, so only the array-of-objects shape is checked
+churn_batch_decoder = msgspec.json.Decoder(list[dict[str, Any]])
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def decode(decoder, body):
+    try:
+        return decoder.decode(body)
+    except msgspec.ValidationError as e:
+        raise SchemaError(str(e)) from e
+    except msgspec.DecodeError as e:
+        raise SchemaError(f"Invalid JSON: {e}") from e
+
+
+def decode_args(args, schema):
+    # Query parameters (last value wins) converted from text to the schema's types
+    params = args.to_dict()
+    for field in msgspec.structs.fields(schema):
+        if field.type is bool and field.encode_name in params:
+            value = params[field.encode_name]
+            params[field.encode_name] = FLAG_WORDS.get(value.strip().lower(), value)
+    try:
+        return msgspec.convert(params, schema, strict=False)
+    except msgspec.ValidationError as e:
+        raise SchemaError(str(e)) from e
+
+
+def values(struct, fields):
+    # Field values in the given (model feature) order
+    return [getattr(struct, field) for field in fields]
+
+
+def json_response(payload, status=200, headers=None):
+    return Response(orjson.dumps(payload, option=JSON_OPTIONS), status=status, headers=headers,
+                    mimetype='application/json')
@@ -1,172 +1,777 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, Response, stream_with_context, g
 from flask_cors import CORS
+import numpy as np
 import pandas as pd
 import pickle
+import json
+import itertools
 import logging
 import os
 import sys
+import signal
+from types import SimpleNamespace
 sys.path.append('.')
-from forcast_model import train_and_predict
+from churn_kernel import ChurnKernel, load_feature_spec, status_code, status_column
+from churn_aggregates import ChurnAggregateCache
+from churn_cube import DIMENSIONS as SEGMENT_DIMENSIONS, ChurnSegmentCube
+from churn_drift import DriftBaseline, DriftSketch
+from forcast_cache import ForecastCache
+from forcast_ingest import IngestError, spool_upload
+from forcast_jobs import ForecastJobQueue, QueueFull
+from forcast_model import state_version
+from product_lookup import ProductLookup, file_digest
+from instrumentation import StageHistograms, instrumented
+from model_artifacts import CHURN_ARTIFACT, PRODUCT_ARTIFACT, MANIFEST, ChurnArtifact, ProductArtifact
+from model_registry import ModelRegistry
+from scoring_rpc import ScoringService, listen, start_rpc_server
+from api_schemas import (ForecastParams, ProductBatchParams, ProductBatchRequest, SchemaError, churn_batch_decoder,
+                         churn_decoder, decode, decode_args, json_response, product_batch_decoder, product_decoder,
+                         values)
 
 # Setup
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Forecast-Cache', 'X-Forecast-Cache-Key', 'Location', 'Retry-After', 'X-Model-Version'])
 logging.basicConfig(level=logging.DEBUG)
 
 # Folders
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Trained forecast models + results keyed by the hash of the uploaded CSV
+FORECAST_CACHE_FOLDER = "forcast_cache"
+FORECAST_CACHE_MAX_ENTRIES = 64
+FORECAST_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Background forecast training: worker processes, max queued + running jobs, and
+# the folder where job status is shared between serve.py workers
+FORECAST_JOBS_FOLDER = "forcast_jobs"
+FORECAST_WORKERS = int(os.environ.get('FORECAST_WORKERS', 2))
+FORECAST_MAX_PENDING = int(os.environ.get('FORECAST_MAX_PENDING', 8))
+
+# Incremental forecasts: /predict-file?series=<name> continues the booster kept in
+# forcast_state/<name>/ with the months added since its last upload
+FORECAST_STATE_FOLDER = "forcast_state"
+
+# Per-stage latency histograms; serve.py sets a shared folder so /internal/metrics covers all workers
+API_METRICS_DIR = os.environ.get('API_METRICS_DIR')
+
+# Model hot reload: seconds between checks of the model files, and the token for
+# POST /admin/reload (without one, only requests from localhost may reload)
+MODEL_POLL_INTERVAL = float(os.environ.get('MODEL_POLL_INTERVAL', 5))
+API_ADMIN_TOKEN = os.environ.get('API_ADMIN_TOKEN')
+
+# Binary scoring RPC (scoring_rpc.py): Unix socket path or host:port, off when unset
+SCORING_RPC_ADDRESS = os.environ.get('SCORING_RPC_ADDRESS')
+
+# Default churn field order / account_status codes; churn-model.py persists the
+# actual ones in churn_features.json next to churn_model.pkl
+CHURN_FEATURES = [
+    'customer_tenure',
+    'number_of_services_or_products',
+    'average_monthly_usage',
+    'days_since_last_interaction',
+    'complaints_resolved_ratio',
+    'total_spent',
+    'average_transaction_value',
+    'discount_or_offer_received',
+    'account_status'
+]
+
+ACCOUNT_STATUS_CODES = {'Active': 0, 'Closed': 1, 'Suspended': 2}
+
+# Rows scored / serialized per NDJSON chunk in /predict-churn-batch
+CHURN_BATCH_CHUNK = 10000
+
+CHURN_DATA = 'churndata.csv'
+
+# Product recommender inputs (see recommendatrion-model.py) and default top-k size
+PRODUCT_FEATURES = [
+    'region',
+    'gender',
+    'user_age_group',
+    'user_preferences',
+    'season',
+    'product_keywords',
+    'previous_buy'
+]
+PRODUCT_TOP_K = 3
+PRODUCT_DATA = 'customer_recommendations_better.csv'
+PRODUCT_LOOKUP = 'product_lookup.npz'
+
+CHURN_ZONES = np.array(["🟢 Green", "🔵 Blue", "🟠 Orange", "🔴 Red"])
+
 # ========================== MODEL LOADING ==========================
 
-# Load churn model and scaler
-try:
-    with open('churn_model.pkl', 'rb') as f:
-        churn_model, churn_scaler = pickle.load(f)
-    logging.info("✅ Churn model and scaler loaded")
-except Exception as e:
-    logging.error(f"❌ Failed to load churn model: {e}")
-    churn_model, churn_scaler = None, None
-
-# Load product recommendation model and label encoder
-try:
-    with open('product_recommendation_model.pkl', 'rb') as f:
-        product_model, label_encoder = pickle.load(f)
-    logging.info("✅ Product recommendation model and encoder loaded")
-except Exception as e:
-    logging.error(f"❌ Failed to load product model: {e}")
-    product_model, label_encoder = None, None
+def load_churn():
+    # Versioned artifact (models/churn/) first, pickle as fallback; None if neither loads
+    try:
+        artifact = ChurnArtifact(CHURN_ARTIFACT)
+        model, scaler = artifact.sklearn()
+        logging.info(f"✅ Churn model {artifact.version} loaded from {CHURN_ARTIFACT}/")
+        return SimpleNamespace(version=artifact.version, model=model, scaler=scaler, kernel=artifact.kernel(),
+                               features=artifact.features, status_codes=artifact.status_codes)
+    except Exception as e:
+        logging.info(f"ℹ️ No churn artifact ({e}), loading churn_model.pkl")
+
+    try:
+        with open('churn_model.pkl', 'rb') as f:
+            model, scaler = pickle.load(f)
+        logging.info("✅ Churn model and scaler loaded")
+    except Exception as e:
+        logging.error(f"❌ Failed to load churn model: {e}")
+        return None
+
+    features, status_codes = load_feature_spec('churn_features.json', CHURN_FEATURES, ACCOUNT_STATUS_CODES)
+
+    # Fold the scaler into the logistic coefficients and check it against sklearn
+    kernel = None
+    try:
+        candidate = ChurnKernel.from_sklearn(model, scaler, features, status_codes)
+        probe = pd.read_csv(CHURN_DATA, usecols=features)[features].dropna()
+        probe['account_status'] = probe['account_status'].map(status_codes)
+        parity = candidate.max_parity_error(model, scaler, probe.dropna())
+        if parity <= 1e-9:
+            kernel = candidate
+            logging.info(f"✅ Churn scoring kernel ready (max |Δp| vs sklearn = {parity:.2e})")
+        else:
+            logging.error(f"❌ Churn kernel parity {parity:.2e} > 1e-9, serving from sklearn")
+    except Exception as e:
+        logging.error(f"❌ Failed to build churn kernel, serving from sklearn: {e}")
+
+    version = f"pickle-{file_digest('churn_model.pkl')[:12]}"
+    return SimpleNamespace(version=version, model=model, scaler=scaler, kernel=kernel,
+                           features=features, status_codes=status_codes)
+
+def smoke_churn(churn):
+    # One prediction through every path the endpoints use, on a mid-range customer
+    row = pd.DataFrame([dict.fromkeys(churn.features, 1)])
+    reference = churn.model.predict_proba(churn.scaler.transform(row))[0][1]
+    if not 0.0 <= reference <= 1.0:
+        raise ValueError(f"churn smoke prediction out of range: {reference}")
+    if churn.kernel is not None and abs(churn.kernel.score(row.to_numpy(dtype=np.float64)[0]) - reference) > 1e-9:
+        raise ValueError("churn kernel disagrees with the sklearn model")
+
+def share_lookup_stats(product):
+    # Under serve.py the lookup hit/miss counters of every worker are dumped per model version,
+    # so /product-lookup/stats reports all workers and a reloaded model starts from zero
+    if product.lookup is not None and API_METRICS_DIR:
+        product.lookup.counters.state_dir = os.path.join(API_METRICS_DIR, 'lookup', product.version)
+    return product
+
+def load_product():
+    # Versioned artifact (models/product/, booster + lookup table) first, pickle as fallback
+    try:
+        artifact = ProductArtifact(PRODUCT_ARTIFACT)
+        if artifact.features != PRODUCT_FEATURES:
+            raise ValueError(f"artifact features {artifact.features} != {PRODUCT_FEATURES}")
+        logging.info(f"✅ Product model {artifact.version} loaded from {PRODUCT_ARTIFACT}/")
+        return share_lookup_stats(SimpleNamespace(version=artifact.version, model=artifact.model,
+                                                  trees=artifact.trees, label_encoder=artifact.label_encoder,
+                                                  lookup=artifact.lookup()))
+    except Exception as e:
+        logging.info(f"ℹ️ No product artifact ({e}), loading product_recommendation_model.pkl")
+
+    try:
+        with open('product_recommendation_model.pkl', 'rb') as f:
+            model, label_encoder = pickle.load(f)
+        logging.info("✅ Product recommendation model and encoder loaded")
+    except Exception as e:
+        logging.error(f"❌ Failed to load product model: {e}")
+        return None
+
+    # Precomputed predictions for every observed input combination (written by
+    # recommendatrion-model.py, otherwise built here from the training data)
+    digest = file_digest('product_recommendation_model.pkl')
+    lookup = None
+    try:
+        if os.path.exists(PRODUCT_LOOKUP):
+            table = ProductLookup.load(PRODUCT_LOOKUP)
+            if table.model_digest == digest and table.features == PRODUCT_FEATURES:
+                lookup = table
+        if lookup is None:
+            lookup = ProductLookup.build(model, pd.read_csv(PRODUCT_DATA), PRODUCT_FEATURES, digest)
+        logging.info(f"✅ Product lookup table ready ({len(lookup.keys)} combinations)")
+    except Exception as e:
+        logging.error(f"❌ Failed to build product lookup table, serving from the model: {e}")
+
+    return share_lookup_stats(SimpleNamespace(version=f"pickle-{digest[:12]}", model=model, trees=None,
+                                              label_encoder=label_encoder, lookup=lookup))
+
+def smoke_product(product):
+    row = pd.DataFrame([dict(zip(PRODUCT_FEATURES, ['UAE', 'Male', '18-25', 'party wear', 'Summer', '', 'jeans']))])
+    proba = product.model.predict_proba(row)
+    if proba.shape != (1, len(product.label_encoder.classes_)) or not np.isfinite(proba).all():
+        raise ValueError(f"product smoke prediction has shape {proba.shape}")
+
+# Active model versions; retrained files are picked up without a restart (see model_registry.py)
+models = ModelRegistry({
+    "churn": (load_churn, smoke_churn,
+              [os.path.join(CHURN_ARTIFACT, MANIFEST), 'churn_model.pkl', 'churn_features.json']),
+    "product": (load_product, smoke_product,
+                [os.path.join(PRODUCT_ARTIFACT, MANIFEST), 'product_recommendation_model.pkl'])
+}, poll_interval=MODEL_POLL_INTERVAL)
+
+# Packed-vector scoring on the same models; under serve.py every worker serves it on the master's socket
+scoring_service = ScoringService(models.get, PRODUCT_FEATURES, PRODUCT_TOP_K)
+
+stage_metrics = StageHistograms(API_METRICS_DIR)
+
+# Set up by create_app()
+churn_aggregates = churn_segments = forecast_cache = forecast_jobs = churn_drift = None
+
+# Input drift of /predict-churn against the training data, baseline computed once at startup
+def load_churn_drift():
+    churn = models.get('churn')
+    features, status_codes = (churn.features, churn.status_codes) if churn is not None else \
+        (CHURN_FEATURES, ACCOUNT_STATUS_CODES)
+    try:
+        baseline = DriftBaseline.from_csv(CHURN_DATA, features)
+    except Exception as e:
+        logging.error(f"❌ Failed to build the churn drift baseline: {e}")
+        return None
+    logging.info(f"✅ Churn drift baseline {baseline.version} built from {baseline.rows} rows")
+    state_dir = os.path.join(API_METRICS_DIR, 'drift') if API_METRICS_DIR else None
+    return DriftSketch(baseline, status_codes, state_dir)
+
+def create_app():
+    # Startup work of the serving process: models, watcher, caches, job queue, RPC server.
+    # Runs once on import (python app.py, serve.py's master, benchmarks), but not in the
+    # forecast pool's spawn workers: they re-import this file as __mp_main__ and only
+    # need forcast_jobs.run_forecast_job
+    global churn_aggregates, churn_segments, forecast_cache, forecast_jobs, churn_drift
+    models.load_all()
+
+    # serve.py sets API_PREFORK: its master watches the files and recycles the workers instead
+    if os.environ.get('API_PREFORK') != '1':
+        models.start_watcher()
+
+    # With `python app.py` only the debug reloader's child binds the RPC socket, it is the one serving
+    in_reloader_parent = __name__ == '__main__' and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+    if SCORING_RPC_ADDRESS and os.environ.get('API_PREFORK') != '1' and not in_reloader_parent:
+        start_rpc_server(scoring_service, listen(SCORING_RPC_ADDRESS))
+
+    # Churn aggregates for /metrics, refreshed only when churndata.csv changes
+    churn_aggregates = ChurnAggregateCache(CHURN_DATA)
+
+    # Segment cube for /metrics/segments, built once and extended as churndata.csv grows
+    churn_segments = ChurnSegmentCube(CHURN_DATA)
+
+    forecast_cache = ForecastCache(FORECAST_CACHE_FOLDER, FORECAST_CACHE_MAX_ENTRIES, FORECAST_CACHE_MAX_BYTES)
+
+    # Finished jobs populate the forecast cache, so a re-upload is served directly
+    forecast_jobs = ForecastJobQueue(FORECAST_WORKERS, FORECAST_MAX_PENDING, on_done=forecast_cache.put,
+                                     state_dir=FORECAST_JOBS_FOLDER)
+
+    churn_drift = load_churn_drift()
+    return app
+
+# ========================== HELPERS ==========================
+
+def churn_zone(percentage):
+    if percentage <= 25:
+        return "🟢 Green"
+    elif percentage <= 50:
+        return "🔵 Blue"
+    elif percentage <= 75:
+        return "🟠 Orange"
+    return "🔴 Red"
+
+def churn_batch_matrix(churn, df):
+    # account_status names and known codes map to the training codes; unknown ones make the row invalid
+    frame = df[churn.features].copy()
+    frame['account_status'] = status_column(churn.status_codes, df['account_status'])
+    frame = frame.apply(pd.to_numeric, errors='coerce').astype('float64')
+    valid = np.isfinite(frame.to_numpy()).all(axis=1)
+    return frame, valid
+
+def score_churn_batch(churn, df):
+    frame, valid = churn_batch_matrix(churn, df)
+    proba = np.full(len(frame), np.nan)
+    if valid.any():
+        if churn.kernel is not None:
+            proba[valid] = churn.kernel.predict_proba(frame.to_numpy()[valid])
+        else:
+            # One transform + one predict_proba for the whole block
+            scaled = churn.scaler.transform(frame[valid])
+            proba[valid] = churn.model.predict_proba(scaled)[:, 1]
+    return proba, valid
+
+def churn_batch_ndjson(df, proba, valid, offset=0):
+    percentage = proba * 100
+    labels = np.where(proba > 0.5, "Churn", "No Churn")
+    zones = CHURN_ZONES[np.searchsorted([25, 50, 75], np.nan_to_num(percentage), side='left')]
+    ids = df['customer_id'].tolist() if 'customer_id' in df.columns else None
+
+    lines = []
+    for i in range(len(proba)):
+        row = {"row": offset + i}
+        if ids is not None:
+            row["customer_id"] = ids[i]
+        if valid[i]:
+            row["prediction"] = str(labels[i])
+            row["probability"] = f"{percentage[i]:.2f}%"
+            row["churn_zone"] = str(zones[i])
+        else:
+            row["error"] = "Invalid or unknown feature values"
+        lines.append(json.dumps(row, ensure_ascii=False))
+    return "\n".join(lines) + "\n" if lines else ""
+
+def product_top_k(classes, proba, k):
+    # argpartition picks the k best classes per row, then only those k get sorted
+    k = max(1, min(k, proba.shape[1]))
+    idx = np.argpartition(-proba, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(proba, idx, axis=1), axis=1, kind='stable')
+    idx = np.take_along_axis(idx, order, axis=1)
+    return classes[idx], np.take_along_axis(proba, idx, axis=1)
+
+def use_model(name):
+    # Fetch the active version once per request; a reload mid-request does not affect it
+    loaded = models.get(name)
+    if loaded is not None:
+        g.model_versions = getattr(g, 'model_versions', []) + [f"{name}={loaded.version}"]
+    return loaded
 
 # ========================== ROUTES ==========================
 
+@app.after_request
+def add_model_version(response):
+    versions = getattr(g, 'model_versions', None)
+    if versions:
+        response.headers['X-Model-Version'] = ", ".join(versions)
+    return response
+
 @app.route('/')
 def home():
-    return "🚀 Combined API is running! Endpoints: /predict-churn, /metrics, /predict-file, /predict-product"
+    return "🚀 Combined API is running! Endpoints: /ready, /predict-churn, /predict-churn-batch, /metrics, /metrics/breakdown, /metrics/segments, /metrics/drift, /predict-file, /jobs/<id>, /predict-product, /predict-product-batch, /product-lookup/stats, /internal/metrics, /admin/reload"
+
+@app.route('/ready')
+def ready():
+    # Readiness: models are loaded at import, before serve.py forks its workers
+    churn, product = models.get('churn'), models.get('product')
+    loaded = {
+        "churn_model": churn is not None,
+        "churn_kernel": churn is not None and churn.kernel is not None,
+        "product_model": product is not None,
+        "product_lookup": product is not None and product.lookup is not None
+    }
+    is_ready = loaded["churn_model"] and loaded["product_model"]
+    return json_response({"ready": is_ready, "pid": os.getpid(), "models": loaded, "versions": models.versions()},
+                         200 if is_ready else 503)
 
 # ---------- 1. Churn Prediction ----------
 @app.route('/predict-churn', methods=['POST'])
+@instrumented(stage_metrics, 'predict-churn')
 def predict_churn():
-    if churn_model is None or churn_scaler is None:
-        return jsonify({'error': 'Churn model not available'}), 500
-
-    data = request.json
-    required_fields = [
-        'customer_tenure',
-        'number_of_services_or_products',
-        'average_monthly_usage',
-        'days_since_last_interaction',
-        'complaints_resolved_ratio',
-        'total_spent',
-        'average_transaction_value',
-        'discount_or_offer_received',
-        'account_status'
-    ]
-
-    missing = [field for field in required_fields if field not in data]
-    if missing:
-        return jsonify({'error': f'Missing fields: {missing}'}), 400
-
-    try:
-        input_df = pd.DataFrame([data])
-        if input_df['account_status'].dtype == 'object':
-            input_df['account_status'] = input_df['account_status'].astype('category').cat.codes
-
-        scaled_input = churn_scaler.transform(input_df)
-        prediction = churn_model.predict(scaled_input)[0]
-        proba = churn_model.predict_proba(scaled_input)[0][1]
-
-        result = "Churn" if prediction == 1 else "No Churn"
-        percentage = proba * 100
+    churn = use_model('churn')
+    if churn is None:
+        return json_response({'error': 'Churn model not available'}, 500)
+
+    timer = g.stage_timer
+    try:
+        data = decode(churn_decoder, request.get_data())
+    except SchemaError as e:
+        return json_response({'error': str(e)}, 400)
+    timer.mark('parse')
+    if churn_drift is not None and churn_drift.baseline.features == churn.features:
+        churn_drift.observe(values(data, churn.features))
+        timer.mark('drift')
+
+    # Same validation for both engines: an unknown account_status is a 400 either way
+    row = values(data, churn.features)
+    status_index = churn.features.index('account_status')
+    try:
+        row[status_index] = status_code(churn.status_codes, row[status_index])
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
 
-        if percentage <= 25:
-            zone = "🟢 Green"
-        elif percentage <= 50:
-            zone = "🔵 Blue"
-        elif percentage <= 75:
-            zone = "🟠 Orange"
+    try:
+        if churn.kernel is not None and request.args.get('engine') != 'sklearn':
+            x = churn.kernel.encode_values(row)
+            timer.mark('encode')
+            proba = churn.kernel.score(x)
+            timer.mark('predict')
         else:
-            zone = "🔴 Red"
+            # Reference path through the pickled scaler + LogisticRegression
+            input_df = pd.DataFrame([row], columns=churn.features)
+            timer.mark('encode')
+
+            scaled_input = churn.scaler.transform(input_df)
+            timer.mark('transform')
+            proba = churn.model.predict_proba(scaled_input)[0][1]
+            timer.mark('predict')
 
-        return jsonify({
+        result = "Churn" if proba > 0.5 else "No Churn"
+        percentage = proba * 100
+        zone = churn_zone(percentage)
+
+        response = json_response({
             "prediction": result,
             "probability": f"{percentage:.2f}%",
             "churn_zone": zone
         })
+        timer.mark('serialize')
+        return response
 
     except Exception as e:
         logging.error(f"❌ Prediction error: {e}")
-        return jsonify({'error': 'Internal Server Error'}), 500
+        return json_response({'error': 'Internal Server Error'}, 500)
+
+# ---------- 1b. Batch Churn Scoring (JSON array or CSV -> NDJSON) ----------
+@app.route('/predict-churn-batch', methods=['POST'])
+def predict_churn_batch():
+    churn = use_model('churn')
+    if churn is None:
+        return json_response({'error': 'Churn model not available'}, 500)
+
+    chunk = request.args.get('chunk', CHURN_BATCH_CHUNK, type=int)
+    if chunk is None or chunk <= 0:
+        return json_response({'error': 'chunk must be a positive integer'}, 400)
+
+    try:
+        if request.mimetype in ('text/csv', 'application/csv'):
+            try:
+                reader = pd.read_csv(request.stream, chunksize=chunk)
+                first = next(reader, None)
+            except pd.errors.EmptyDataError:
+                first = None
+            except pd.errors.ParserError as e:
+                return json_response({'error': f'Malformed CSV: {e}'}, 400)
+            if first is None:
+                return json_response({'error': 'Empty CSV body'}, 400)
+            missing = [field for field in churn.features if field not in first.columns]
+            if missing:
+                return json_response({'error': f'Missing fields: {missing}'}, 400)
+
+            def generate():
+                offset = 0
+                blocks = itertools.chain([first], reader)
+                while True:
+                    try:
+                        block = next(blocks, None)
+                    except pd.errors.ParserError as e:
+                        # Past the first chunk the 200 is already sent: end the stream with an error line
+                        yield json.dumps({"row": offset, "error": f"Malformed CSV: {e}"}) + "\n"
+                        return
+                    if block is None:
+                        return
+                    proba, valid = score_churn_batch(churn, block)
+                    yield churn_batch_ndjson(block, proba, valid, offset)
+                    offset += len(block)
+        else:
+            try:
+                data = decode(churn_batch_decoder, request.get_data())
+            except SchemaError as e:
+                return json_response({'error': f'Expected a JSON array of customers or a text/csv body ({e})'}, 400)
+            df = pd.DataFrame.from_records(data)
+            missing = [field for field in churn.features if field not in df.columns]
+            if missing:
+                return json_response({'error': f'Missing fields: {missing}'}, 400)
+
+            proba, valid = score_churn_batch(churn, df)
+
+            def generate():
+                for start in range(0, len(df), chunk):
+                    end = start + chunk
+                    yield churn_batch_ndjson(df.iloc[start:end], proba[start:end], valid[start:end], start)
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    except Exception as e:
+        logging.error(f"❌ Batch prediction error: {e}")
+        return json_response({'error': 'Internal Server Error'}, 500)
 
 @app.route('/metrics', methods=['GET'])
+@instrumented(stage_metrics, 'metrics')
 def metrics():
+    timer = g.stage_timer
     try:
-        df = pd.read_csv('churndata.csv')
-        churn_flag = pd.to_numeric(df['churn_flag'], errors='coerce').dropna()
-
-        total = len(churn_flag)
-        churned = churn_flag.sum()
+        agg = churn_aggregates.get()
+        total = agg['total']
+        churned = agg['churned']
         churn_percent = (churned / total) * 100
-
-        if churn_percent <= 25:
-            zone = "🟢 Green"
-        elif churn_percent <= 50:
-            zone = "🔵 Blue"
-        elif churn_percent <= 75:
-            zone = "🟠 Orange"
-        else:
-            zone = "🔴 Red"
+        zone = churn_zone(churn_percent)
 
         status = "Churn" if churn_percent > 50 else "No Churn"
+        timer.mark('aggregate')
 
-        return jsonify({
+        response = json_response({
             "📉 Churn Percentage": f"{churn_percent:.2f}%",
             "🔮 Churn Status": status,
             "🟢 Churn Zone": zone
         })
+        timer.mark('serialize')
+        return response
 
     except Exception as e:
         logging.error(f"❌ Metrics error: {e}")
-        return jsonify({"error": "Metrics calculation failed"}), 500
+        return json_response({"error": "Metrics calculation failed"}, 500)
 
-# ---------- 2. File Upload Prediction ----------
-@app.route('/predict-file', methods=['POST'])
-def predict_file():
+@app.route('/metrics/breakdown', methods=['GET'])
+def metrics_breakdown():
     try:
-        file = request.files['file']
-        if not file:
-            return jsonify({"error": "No file uploaded"}), 400
+        agg = churn_aggregates.get()
+        return json_response({
+            "total": agg['total'],
+            "churned": int(agg['churned']),
+            "breakdown": agg['breakdown']
+        })
+
+    except Exception as e:
+        logging.error(f"❌ Metrics breakdown error: {e}")
+        return json_response({"error": "Metrics calculation failed"}, 500)
+
+@app.route('/metrics/segments', methods=['GET'])
+def metrics_segments():
+    # ?account_status=Active,Closed&tenure_bucket=0-12&group_by=payment_frequency,usage_bucket
+    # Filters may repeat or list values comma-separated; without group_by only the total is returned
+    def values(name):
+        return [v for arg in request.args.getlist(name) for v in arg.split(',') if v]
+
+    unknown = [name for name in request.args if name not in SEGMENT_DIMENSIONS and name != 'group_by']
+    group_by = values('group_by')
+    unknown += [name for name in group_by if name not in SEGMENT_DIMENSIONS]
+    if unknown:
+        return json_response({"error": f"Unknown dimensions: {unknown}", "dimensions": SEGMENT_DIMENSIONS}, 400)
+    if len(set(group_by)) != len(group_by):
+        return json_response({"error": "group_by lists a dimension twice"}, 400)
 
-        path = os.path.join(UPLOAD_FOLDER, file.filename)
-        file.save(path)
-        df = pd.read_csv(path)
+    try:
+        filters = {name: values(name) for name in SEGMENT_DIMENSIONS if name in request.args}
+        result = churn_segments.get().query(filters, group_by)
+        return json_response(dict(result, filters=filters, group_by=group_by))
+
+    except Exception as e:
+        logging.error(f"❌ Metrics segments error: {e}")
+        return json_response({"error": "Metrics calculation failed"}, 500)
+
+@app.route('/metrics/drift', methods=['GET'])
+def metrics_drift():
+    # PSI / KS of the /predict-churn inputs since startup against the churndata.csv baseline
+    if churn_drift is None:
+        return json_response({"error": "Drift baseline not available"}, 503)
+    try:
+        return json_response(churn_drift.report())
 
-        # Call the actual forecast model
-        results = train_and_predict(df)
+    except Exception as e:
+        logging.error(f"❌ Drift report error: {e}")
+        return json_response({"error": "Drift calculation failed"}, 500)
 
-        return jsonify(results)
+# ---------- 2. File Upload Prediction ----------
+@app.route('/predict-file', methods=['POST'])
+@instrumented(stage_metrics, 'predict-file')
+def predict_file():
+    timer = g.stage_timer
+    try:
+        # ?series=<name> continues a stored model, ?aggregate=1 fits on monthly cells (fresh fits only)
+        try:
+            params = decode_args(request.args, ForecastParams)
+        except SchemaError as e:
+            return json_response({"error": str(e)}, 400)
+        series, aggregate = params.series, params.aggregate
+        if aggregate and series is not None:
+            return json_response({"error": "aggregate applies to fresh fits, not to a series"}, 400)
+
+        # Multipart form upload (dashboard) or a raw text/csv request body
+        if request.mimetype == 'multipart/form-data':
+            file = request.files.get('file')
+            if not file:
+                return json_response({"error": "No file uploaded"}, 400)
+            stream = file.stream
+        else:
+            stream = request.stream
+
+        # Read in chunks: header checked on the first chunk, hash computed on the fly
+        try:
+            spool = spool_upload(stream, UPLOAD_FOLDER)
+        except IngestError as e:
+            return json_response({"error": str(e)}, 400)
+
+        timer.mark('parse')
+
+        # Same upload into a series can give a different result than a fresh fit, and than the
+        # same upload into an older state of that series
+        model_dir = os.path.join(FORECAST_STATE_FOLDER, series) if series is not None else None
+        key = spool.key if series is None else f"{spool.key}-{series}-{state_version(model_dir)}"
+        if aggregate:
+            key = f"{spool.key}-cells"
+        results = forecast_cache.get(key)
+        timer.mark('cache')
+        if results is not None:
+            spool.discard()
+            response = json_response(results, headers={'X-Forecast-Cache': "HIT", 'X-Forecast-Cache-Key': key})
+            timer.mark('serialize')
+            return response
+
+        # Small uploads go to the worker as bytes; large ones were spilled to disk
+        # and are passed by path, which the job queue deletes once the job is done
+        source = spool.source()
+
+        # Train in the background; the client polls /jobs/<id> for the result
+        try:
+            job_id = forecast_jobs.submit(key, source, model_dir, aggregate)
+        except QueueFull as e:
+            return json_response({"error": f"Forecast queue is full, retry later ({e})"}, 503,
+                                 headers={'Retry-After': '5'})
+        timer.mark('submit')
+
+        status_url = f"/jobs/{job_id}"
+        return json_response({"job_id": job_id, "status": "queued", "status_url": status_url}, 202,
+                             headers={'Location': status_url, 'X-Forecast-Cache': "MISS",
+                                      'X-Forecast-Cache-Key': key})
 
     except Exception as e:
         logging.error(f"❌ File prediction error: {e}")
-        return jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}, 500)
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    info = forecast_jobs.status(job_id)
+    if info is None:
+        return json_response({"error": "Unknown job id"}, 404)
+    return json_response(info)
 
 # ---------- 3. Product Recommendation ----------
 @app.route('/predict-product', methods=['POST'])
+@instrumented(stage_metrics, 'predict-product')
 def predict_product():
-    if product_model is None or label_encoder is None:
-        return jsonify({'error': 'Product model not available'}), 500
+    product = use_model('product')
+    if product is None:
+        return json_response({'error': 'Product model not available'}, 500)
+
+    timer = g.stage_timer
+    try:
+        data = decode(product_decoder, request.get_data())
+    except SchemaError as e:
+        return json_response({'error': str(e)}, 400)
+    timer.mark('parse')
 
     try:
-        data = request.get_json()
-        df = pd.DataFrame([data])
-        pred_encoded = product_model.predict(df)
-        pred_label = label_encoder.inverse_transform(pred_encoded)
+        features = values(data, PRODUCT_FEATURES)
+        lookup = product.lookup
+        row = lookup.find_values(features) if lookup is not None else None
+        timer.mark('lookup')
+        if row is not None:
+            response = json_response({'predicted_product': product.label_encoder.classes_[lookup.pred[row]]})
+            timer.mark('serialize')
+            return response
+
+        # Unseen combination: compiled trees straight from the decoded values, or the live pipeline
+        if product.trees is not None:
+            codes = product.trees.encode_rows([features])
+            timer.mark('encode')
+            pred_encoded = np.argmax(product.trees.margins(codes), axis=1)
+        else:
+            df = pd.DataFrame([features], columns=PRODUCT_FEATURES)
+            timer.mark('encode')
+            pred_encoded = product.model.predict(df)
+        timer.mark('predict')
+        pred_label = product.label_encoder.inverse_transform(pred_encoded)
 
-        return jsonify({'predicted_product': pred_label[0]})
+        response = json_response({'predicted_product': pred_label[0]})
+        timer.mark('serialize')
+        return response
 
     except Exception as e:
         logging.error(f"❌ Product prediction error: {e}")
-        return jsonify({'error': str(e)}), 400
+        return json_response({'error': str(e)}, 400)
+
+@app.route('/predict-product-batch', methods=['POST'])
+def predict_product_batch():
+    product = use_model('product')
+    if product is None:
+        return json_response({'error': 'Product model not available'}, 500)
+
+    # A JSON array of customers or {"records": [...], "k": n}
+    try:
+        data = decode(product_batch_decoder, request.get_data())
+        k = decode_args(request.args, ProductBatchParams).k
+    except SchemaError as e:
+        return json_response({'error': str(e)}, 400)
+    records = data
+    if isinstance(data, ProductBatchRequest):
+        records, k = data.records, data.k if data.k is not None else k
+    if not records:
+        return json_response({'error': 'Expected at least one customer'}, 400)
+    if k is None:
+        k = PRODUCT_TOP_K
+    if k <= 0:
+        return json_response({'error': 'k must be a positive integer'}, 400)
+
+    try:
+        # Known combinations come from the lookup table, the rest go through one
+        # predict_proba on the compiled trees (or the OneHotEncoder + XGBClassifier pipeline)
+        rows = [values(record, PRODUCT_FEATURES) for record in records]
+        lookup = product.lookup
+        found = lookup.find_rows(rows) if lookup is not None else np.full(len(rows), -1)
+        hit = found >= 0
+        proba = np.empty((len(rows), len(product.label_encoder.classes_)), dtype=np.float32)
+        if hit.any():
+            proba[hit] = lookup.proba[found[hit]]
+        if not hit.all():
+            unseen = [rows[i] for i in np.flatnonzero(~hit)]
+            if product.trees is not None:
+                proba[~hit] = product.trees.predict_proba_codes(product.trees.encode_rows(unseen))
+            else:
+                proba[~hit] = product.model.predict_proba(pd.DataFrame(unseen, columns=PRODUCT_FEATURES))
+        products, probabilities = product_top_k(product.label_encoder.classes_, proba, k)
+
+        with_ids = any(record.user_id is not None for record in records)
+        results = []
+        for i, (names, scores) in enumerate(zip(products.tolist(), probabilities.tolist())):
+            row = {"row": i}
+            if with_ids:
+                row["user_id"] = records[i].user_id
+            row["top_k"] = [{"product": name, "probability": round(score, 4)} for name, score in zip(names, scores)]
+            results.append(row)
+
+        return json_response({"k": products.shape[1], "results": results})
+
+    except Exception as e:
+        logging.error(f"❌ Product batch prediction error: {e}")
+        return json_response({'error': str(e)}, 400)
+
+@app.route('/product-lookup/stats', methods=['GET'])
+def product_lookup_stats():
+    product = use_model('product')
+    if product is None or product.lookup is None:
+        return json_response({'error': 'Product lookup table not available'}, 404)
+    return json_response(product.lookup.stats())
+
+# ---------- Internal: per-stage latency histograms (Prometheus text format) ----------
+@app.route('/internal/metrics', methods=['GET'])
+def internal_metrics():
+    return Response(stage_metrics.prometheus_text(), mimetype='text/plain; version=0.0.4')
+
+# ---------- Admin: reload retrained models without a restart ----------
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    if API_ADMIN_TOKEN:
+        if request.headers.get('X-Admin-Token') != API_ADMIN_TOKEN:
+            return json_response({'error': 'Invalid admin token'}, 403)
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        return json_response({'error': 'Set API_ADMIN_TOKEN to reload from another host'}, 403)
+
+    names = request.args.getlist('model') or None
+    unknown = [name for name in names or [] if name not in models.loaders]
+    if unknown:
+        return json_response({'error': f'Unknown models: {unknown}'}, 400)
+    force = request.args.get('force', '').lower() in ('1', 'true', 'yes')
+
+    if os.environ.get('API_PREFORK') == '1':
+        # The serve.py master reloads and then recycles every worker onto the new models
+        os.kill(os.getppid(), signal.SIGHUP)
+        return json_response({'status': 'reload scheduled', 'versions': models.versions()}, 202)
+
+    reloaded = models.reload(names, force=force)
+    return json_response({
+        'reloaded': reloaded,
+        'versions': models.versions(),
+        'status': {name: models.status.get(name) for name in names or models.loaders}
+    })
 
 # ========================== START SERVER ==========================
+if __name__ != '__mp_main__':
+    create_app()
+
 if __name__ == '__main__':
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    app.run(host="0.0.0.0", port=int(os.environ.get('API_PORT', 5000)), debug=True)
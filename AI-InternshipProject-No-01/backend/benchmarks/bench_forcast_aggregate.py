@@ -0,0 +1,110 @@
+import argparse
+import multiprocessing
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, BENCHMARKS)
+from bench_forcast_incremental import sales_history
+
+# train_and_predict on transaction rows vs on monthly cells (aggregate=True):
+# wall time and peak memory of the fit, and how far the two responses differ.
+# Each fit runs in a fresh spawn process that loads the pickled history and
+# samples its RSS every few milliseconds, so the peak includes XGBoost's native
+# allocations (DMatrix, histograms) and not the data generation.
+# Histories are synthetic retail_sales_data.csv rows (benchmarks/inflate_data.py).
+#
+#   python benchmarks/bench_forcast_aggregate.py --sizes 100000,1000000,5000000
+
+PAGE = os.sysconf('SC_PAGE_SIZE')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Row-level vs pre-aggregated forecast training")
+    parser.add_argument('--sizes', default='100000,1000000', help="Comma-separated history sizes (rows)")
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+def rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * PAGE
+
+
+def fit_in_child(path, aggregate, out):
+    # Child process: load the history, then train while a thread tracks the peak RSS
+    sys.path.insert(0, BACKEND)
+    from forcast_model import train_and_predict
+
+    with open(path, 'rb') as f:
+        df = pickle.load(f)
+    baseline = rss()
+    peak = [baseline]
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            peak[0] = max(peak[0], rss())
+            time.sleep(0.005)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    results = train_and_predict(df, aggregate=aggregate)
+    seconds = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    out.put((results, seconds, max(peak[0], rss()) - baseline))
+
+
+def run(path, aggregate):
+    ctx = multiprocessing.get_context('spawn')
+    out = ctx.Queue()
+    proc = ctx.Process(target=fit_in_child, args=(path, aggregate, out))
+    proc.start()
+    result = out.get()
+    proc.join()
+    return result
+
+
+def difference(rows, cells):
+    # Largest absolute difference over the forecast totals and grouped forecasts
+    forecast = max(abs(a['predicted_total'] - b['predicted_total'])
+                   for a, b in zip(rows['forecast'], cells['forecast']))
+    grouped = max(abs(rows['grouped'][k] - cells['grouped'].get(k, np.nan)) for k in rows['grouped'])
+    return max(forecast, grouped)
+
+
+def main():
+    args = parse_args()
+    print(f"{'rows':>10} {'cells':>7} {'rows fit':>9} {'peak':>8} {'cells fit':>10} {'peak':>8} "
+          f"{'speedup':>8} {'r2 rows':>8} {'r2 cells':>9} {'max |Δ|':>9}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        df = sales_history(size, args.seed)
+        n_cells = len(df.groupby(['Category', 'Gender', 'Region', 'Season', df['Date'].dt.to_period('M')],
+                                 observed=True))
+        with tempfile.NamedTemporaryFile(suffix='.pkl', delete=False) as f:
+            pickle.dump(df, f)
+            path = f.name
+        del df
+        try:
+            rows, rows_seconds, rows_peak = run(path, aggregate=False)
+            cells, cells_seconds, cells_peak = run(path, aggregate=True)
+        finally:
+            os.remove(path)
+
+        print(f"{size:>10} {n_cells:>7} {rows_seconds:>8.2f}s {rows_peak / 2**20:>6.0f}MB "
+              f"{cells_seconds:>9.2f}s {cells_peak / 2**20:>6.0f}MB {rows_seconds / cells_seconds:>7.1f}x "
+              f"{rows['accuracy']:>8.2f} {cells['accuracy']:>9.2f} {difference(rows, cells):>9.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, BACKEND)
+from forcast_model import train_and_predict, train_incremental
+from inflate_data import chunk_rng, fit, sample_chunk
+
+# Retrain cost when one month is added to the sales history: train_and_predict
+# on everything (what /predict-file does) vs train_incremental continuing the
+# booster saved after the previous upload (/predict-file?series=...).
+# Histories are synthetic retail_sales_data.csv rows (benchmarks/inflate_data.py);
+# the newest calendar month is the "new upload", the rest the stored history.
+#
+#   python benchmarks/bench_forcast_incremental.py --sizes 100000,1000000,5000000
+#   python benchmarks/bench_forcast_incremental.py --window 0    # train on the new month only
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Full vs incremental forecast retraining")
+    parser.add_argument('--sizes', default='100000,1000000', help="Comma-separated history sizes (rows)")
+    parser.add_argument('--window', type=int, default=3, help="Months of history an update trains on")
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+def sales_history(rows, seed):
+    source = pd.read_csv(os.path.join(BACKEND, 'retail_sales_data.csv'))
+    df = sample_chunk(fit(source, 'Category'), chunk_rng(seed, 0), 0, rows)
+    df['Date'] = pd.to_datetime(df['Date'])
+    for col in ['Product_ID', 'Category', 'Gender', 'Region', 'Season']:
+        df[col] = df[col].astype('category')
+    return df
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    args = parse_args()
+    print(f"{'rows':>10} {'new rows':>9} {'full fit':>9} {'r2':>6} {'increment':>10} {'r2':>6} {'trained on':>10} {'speedup':>8}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        df = sales_history(size, args.seed)
+        last_month = df['Date'].max().to_period('M').start_time
+        history = df[df['Date'] < last_month]
+
+        state_dir = tempfile.mkdtemp(prefix='forcast_state_')
+        try:
+            train_incremental(history.copy(), state_dir, window_months=args.window)
+            full, full_seconds = timed(train_and_predict, df.copy())
+            update, update_seconds = timed(train_incremental, df.copy(), state_dir, window_months=args.window)
+        finally:
+            shutil.rmtree(state_dir, ignore_errors=True)
+
+        training = update['training']
+        print(f"{size:>10} {len(df) - len(history):>9} {full_seconds:>8.2f}s {full['accuracy']:>6.1f} "
+              f"{update_seconds:>9.2f}s {update['accuracy']:>6.1f} {training['rows']:>10} "
+              f"{full_seconds / update_seconds:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import argparse
+import calendar
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from forcast_model import postprocess, season_for_month
+from sklearn.preprocessing import LabelEncoder
+from xgboost import XGBRegressor
+
+# Post-processing cost of forcast_model.train_and_predict (everything after the fit)
+# at growing history sizes: the previous per-month / iterrows implementation vs the
+# stacked + vectorized postprocess(). The fit itself is excluded from the timings.
+#
+#   python benchmarks/bench_forcast_postprocess.py --sizes 10000,100000,1000000,10000000
+
+FEATURES = ['Category', 'Gender', 'Region', 'Season', 'Month', 'Year']
+
+
+def legacy_postprocess(df, X, model, label_encoders):
+    # Steps 4-5 as they were before the vectorized rewrite, kept for comparison
+    category_encoder = label_encoders['Category']
+
+    actual_monthly = df.groupby(['Year', 'Month'])['Quantity_Sold'].sum().reset_index()
+    actual_monthly['label'] = actual_monthly.apply(
+        lambda row: f"{calendar.month_name[row['Month']]} {row['Year']}", axis=1
+    )
+    actual_sales = actual_monthly[['label', 'Quantity_Sold']].to_dict(orient='records')
+
+    latest_date = df['Date'].max()
+    base = X.drop_duplicates(subset=['Category', 'Gender', 'Region', 'Season']).copy()
+
+    forecast = []
+    forecast_grouped = {}
+    all_preds = []
+
+    for i in range(1, 4):
+        forecast_date = (latest_date + pd.DateOffset(months=i))
+        temp = base.copy()
+        temp['Month'] = forecast_date.month
+        temp['Year'] = forecast_date.year
+        temp['Season'] = label_encoders['Season'].transform([season_for_month(forecast_date.month)])[0]
+
+        preds = model.predict(temp)
+        all_preds.extend(preds.tolist())
+        forecast.append({
+            "month": f"{calendar.month_name[forecast_date.month]} {forecast_date.year}",
+            "predicted_total": float(round(preds.sum(), 2))
+        })
+
+        temp['preds'] = preds
+        grouped = temp.groupby(['Category', 'Gender', 'Region'])['preds'].sum().reset_index()
+        for _, row in grouped.iterrows():
+            key = f"{label_encoders['Category'].inverse_transform([int(row['Category'])])[0]}_" + \
+                  f"{label_encoders['Gender'].inverse_transform([int(row['Gender'])])[0]}_" + \
+                  f"{label_encoders['Region'].inverse_transform([int(row['Region'])])[0]}"
+            forecast_grouped[key] = forecast_grouped.get(key, 0) + float(row['preds'])
+
+    past_category_avg = df.groupby('Category')['Quantity_Sold'].mean().to_dict()
+    predicted_cats = base.copy()
+    predicted_cats['preds'] = all_preds[:len(base)]
+    predicted_avg = predicted_cats.groupby('Category')['preds'].mean().to_dict()
+
+    category_changes = []
+    for cat, past_avg in past_category_avg.items():
+        if cat in predicted_avg:
+            change = ((predicted_avg[cat] - past_avg) / past_avg) * 100
+            category_changes.append({
+                "category": category_encoder.inverse_transform([int(cat)])[0],
+                "change": round(float(change), 2)
+            })
+
+    return actual_sales, forecast, forecast_grouped, category_changes
+
+
+def synthetic_sales(n_rows, seed=42):
+    # Sales history with the retail_sales_data.csv schema and a wider category mix
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 3 * 365, n_rows), unit='D')
+    months = dates.month.to_numpy()
+    seasons = np.select([np.isin(months, [12, 1, 2]), np.isin(months, [3, 4, 5]), np.isin(months, [6, 7, 8])],
+                        ['Winter', 'Spring', 'Summer'], 'Autumn')
+    return pd.DataFrame({
+        'Category': rng.choice(['Clothing', 'Electronics', 'Grocery', 'Furniture', 'Cosmetics', 'Toys', 'Sports'], n_rows),
+        'Gender': rng.choice(['Male', 'Female'], n_rows),
+        'Region': rng.choice(['Karachi', 'Lahore', 'Islamabad', 'Peshawar', 'Quetta', 'Multan'], n_rows),
+        'Season': seasons,
+        'Date': dates,
+        'Quantity_Sold': rng.integers(10, 500, n_rows),
+    })
+
+
+def prepare(df):
+    # Same feature preparation as train_and_predict, minus the fit
+    df['Month'] = df['Date'].dt.month
+    df['Year'] = df['Date'].dt.year
+    label_encoders = {}
+    for col in ['Category', 'Gender', 'Region', 'Season']:
+        le = LabelEncoder()
+        df[col] = le.fit_transform(df[col])
+        label_encoders[col] = le
+    return df, df[FEATURES], label_encoders
+
+
+def timed(fn, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10000,100000,1000000,10000000')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    results = []
+    for n_rows in [int(s) for s in args.sizes.split(',')]:
+        df, X, label_encoders = prepare(synthetic_sales(n_rows))
+        sample = X.sample(min(n_rows, 20000), random_state=0)
+        model = XGBRegressor(n_estimators=100, max_depth=3, learning_rate=0.1)
+        model.fit(sample, df.loc[sample.index, 'Quantity_Sold'])
+
+        legacy_s, legacy_out = timed(legacy_postprocess, df, X, model, label_encoders, repeat=args.repeat)
+        new_s, new_out = timed(postprocess, df, X, model, label_encoders, repeat=args.repeat)
+        same = json.dumps(legacy_out, default=str) == json.dumps(new_out, default=str)
+
+        row = {"rows": n_rows, "legacy_s": round(legacy_s, 4), "vectorized_s": round(new_s, 4),
+               "speedup": round(legacy_s / new_s, 2), "identical_output": same}
+        results.append(row)
+        print(f"{n_rows:>10,} rows | legacy {legacy_s:8.4f}s | vectorized {new_s:8.4f}s | "
+              f"x{legacy_s / new_s:5.2f} | identical={same}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+import argparse
+import gc
+import json
+import os
+import pickle
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+# Cold start and per-worker memory of the two model formats app.py can load:
+# the pickled (model, scaler) / (pipeline, label_encoder) tuples, and the
+# versioned artifacts in models/ (npy + JSON manifest + XGBoost UBJ).
+#
+# Each format is loaded in a fresh interpreter (after the shared numpy / pandas /
+# sklearn / xgboost imports), then a forked child - like a serve.py worker -
+# runs a full GC and then scores a few requests; its private memory at both
+# points is what that worker costs on top of the shared pages.
+#
+#   python model_artifacts.py                  # write models/ first
+#   python benchmarks/bench_model_load.py --repeat 5
+
+PRODUCT_FEATURES = ['region', 'gender', 'user_age_group', 'user_preferences', 'season', 'product_keywords', 'previous_buy']
+
+
+def memory_kb():
+    # Rss and Private_* (clean + dirty) of this process from /proc
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0].rstrip(':') in ('Rss', 'Private_Clean', 'Private_Dirty'):
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return values['Rss'], values['Private_Clean'] + values['Private_Dirty']
+
+
+def load_pickle():
+    import pandas as pd
+    from churn_kernel import ChurnKernel, load_feature_spec
+    from product_lookup import ProductLookup, file_digest
+
+    # What app.py does without artifacts: unpickle, probe the kernel, build the lookup table
+    with open('churn_model.pkl', 'rb') as f:
+        churn_model, churn_scaler = pickle.load(f)
+    features, codes = load_feature_spec('churn_features.json', [], {})
+    kernel = ChurnKernel.from_sklearn(churn_model, churn_scaler, features, codes)
+    probe = pd.read_csv('churndata.csv', usecols=features)[features].dropna()
+    probe['account_status'] = probe['account_status'].map(codes)
+    kernel.max_parity_error(churn_model, churn_scaler, probe.dropna())
+
+    with open('product_recommendation_model.pkl', 'rb') as f:
+        product_model, label_encoder = pickle.load(f)
+    lookup = ProductLookup.build(product_model, pd.read_csv('customer_recommendations_better.csv'),
+                                 PRODUCT_FEATURES, file_digest('product_recommendation_model.pkl'))
+    return kernel, product_model, lookup
+
+
+def load_artifact():
+    from model_artifacts import CHURN_ARTIFACT, PRODUCT_ARTIFACT, ChurnArtifact, ProductArtifact
+
+    churn = ChurnArtifact(CHURN_ARTIFACT)
+    churn.sklearn()
+    product = ProductArtifact(PRODUCT_ARTIFACT)
+    return churn.kernel(), product.model, product.lookup()
+
+
+def child(fmt):
+    # Runs in a fresh interpreter: time the load, then fork one "worker"
+    import numpy as np
+    import pandas as pd
+    import sklearn.linear_model  # noqa: F401 - shared imports are not part of the comparison
+    import xgboost  # noqa: F401
+
+    os.chdir(BACKEND)
+    gc.collect()
+    rss_before, _ = memory_kb()
+    start = time.perf_counter()
+    kernel, product_model, lookup = load_pickle() if fmt == 'pickle' else load_artifact()
+    load_seconds = time.perf_counter() - start
+    rss_after, _ = memory_kb()
+
+    gc.collect()
+    gc.freeze()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        record = pd.DataFrame([dict(zip(PRODUCT_FEATURES, ['UAE', 'Male', '18-25', 'party wear', 'Summer', 'unseen', 'jeans']))])
+        gc.unfreeze()
+        gc.collect()
+        _, idle = memory_kb()
+        for _ in range(50):
+            kernel.score(np.ones(len(kernel.features)))
+            product_model.predict_proba(record)
+            lookup.find(record.iloc[0].to_dict())
+        gc.collect()
+        _, private = memory_kb()
+        os.write(write_fd, f"{idle} {private}".encode())
+        os._exit(0)
+    os.close(write_fd)
+    idle, busy = (int(v) for v in os.read(read_fd, 64).split())
+    os.waitpid(pid, 0)
+
+    print(json.dumps({"load_seconds": load_seconds, "load_rss_mb": (rss_after - rss_before) / 1024,
+                      "worker_gc_mb": idle / 1024, "worker_busy_mb": busy / 1024}))
+
+
+def run(fmt):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', fmt],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model load time / memory: pickle vs versioned artifacts")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    parser.add_argument('--child', choices=['pickle', 'artifact'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    results = {}
+    for fmt in ('pickle', 'artifact'):
+        runs = [run(fmt) for _ in range(args.repeat)]
+        results[fmt] = {key: min(r[key] for r in runs) for key in runs[0]}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'format':>10} {'load (ms)':>10} {'load RSS (MB)':>14} {'worker after GC (MB)':>21} {'after requests (MB)':>20}")
+    for fmt, r in results.items():
+        print(f"{fmt:>10} {r['load_seconds'] * 1000:>10.1f} {r['load_rss_mb']:>14.1f} "
+              f"{r['worker_gc_mb']:>21.1f} {r['worker_busy_mb']:>20.1f}")
+
+
+if __name__ == '__main__':
+    main()
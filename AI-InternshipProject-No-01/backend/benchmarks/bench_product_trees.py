@@ -0,0 +1,119 @@
+import argparse
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+from model_artifacts import PRODUCT_ARTIFACT, ProductArtifact
+
+# Parity and latency of the product recommender's inference paths:
+#
+#   pipeline   the pickled sklearn Pipeline (OneHotEncoder + XGBClassifier)
+#   booster    ProductModel: sparse one-hot from the manifest + Booster.inplace_predict
+#   trees      TreeEnsemble (product_trees.py) on a DataFrame
+#   records    TreeEnsemble on request dicts (encode_records), as /predict-product does
+#
+# Rows are real customers from customer_recommendations_better.csv mixed with
+# random combinations, a share of them with values the encoder has never seen
+# (those take XGBoost's missing-value branches). Parity is checked against the
+# pipeline on every row before timing; exit status 1 if it fails.
+#
+#   python benchmarks/bench_product_trees.py --batches 1,64,10000
+
+PARITY_TOLERANCE = 1e-5
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compiled trees vs XGBoost for the product model")
+    parser.add_argument('--batches', default='1,10000', help="Comma-separated batch sizes")
+    parser.add_argument('--rows', type=int, default=20000, help="Rows for the parity check")
+    parser.add_argument('--unknown', type=float, default=0.1, help="Share of values replaced by unseen ones")
+    parser.add_argument('--seconds', type=float, default=2.0, help="Minimum timing per path and batch size")
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+def make_rows(artifact, n, unknown, seed):
+    rng = np.random.default_rng(seed)
+    real = pd.read_csv(os.path.join(BACKEND, 'customer_recommendations_better.csv'))[artifact.features].dropna()
+    rows = real.sample(n, replace=True, random_state=seed).reset_index(drop=True)
+    # Half the rows get random (mostly unseen) combinations of known values
+    shuffled = rng.random(n) < 0.5
+    for f in artifact.features:
+        values = np.asarray(artifact.manifest['categories'][f], dtype=object)
+        rows.loc[shuffled, f] = values[rng.integers(0, len(values), shuffled.sum())]
+        rows.loc[rng.random(n) < unknown / len(artifact.features), f] = 'unseen'
+    return rows
+
+
+def timed(fn, arg, seconds):
+    # Median seconds per call over repeated calls
+    fn(arg)
+    times = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline or len(times) < 5:
+        start = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def main():
+    args = parse_args()
+    artifact = ProductArtifact(os.path.join(BACKEND, PRODUCT_ARTIFACT))
+    if artifact.trees is None:
+        sys.exit(f"{PRODUCT_ARTIFACT} has no compiled trees; re-export it with python model_artifacts.py")
+    with open(os.path.join(BACKEND, 'product_recommendation_model.pkl'), 'rb') as f:
+        pipeline, _ = pickle.load(f)
+    trees = artifact.trees
+
+    rows = make_rows(artifact, args.rows, args.unknown, args.seed)
+    reference = pipeline.predict_proba(rows)
+    codes = trees.encode(rows)
+    checks = {
+        "booster": artifact.booster_model.predict_proba(rows),
+        "trees": trees.predict_proba(rows),
+        "records": trees.predict_proba_codes(trees.encode_records(rows.to_dict(orient='records'))),
+        "node walk": softmax(trees.traverse(codes))
+    }
+    failed = False
+    print(f"Parity vs pipeline on {len(rows)} rows ({(codes < 0).any(axis=1).mean() * 100:.0f}% with unseen values):")
+    for name, proba in checks.items():
+        error = float(np.abs(proba - reference).max())
+        agree = float((proba.argmax(axis=1) == reference.argmax(axis=1)).mean())
+        failed |= error > PARITY_TOLERANCE
+        print(f"  {name:>9}: max |Δp| {error:.2e}, same class {agree * 100:.2f}%")
+
+    paths = {
+        "pipeline": pipeline.predict_proba,
+        "booster": artifact.booster_model.predict_proba,
+        "trees": trees.predict_proba,
+        "records": lambda records: trees.predict_proba_codes(trees.encode_records(records))
+    }
+    print(f"\n{'batch':>7}" + ''.join(f"{name:>12}" for name in paths) + f"{'speedup':>10}")
+    for batch in [int(b) for b in args.batches.split(',')]:
+        sample = rows.iloc[:batch]
+        inputs = {name: sample.to_dict(orient='records') if name == 'records' else sample for name in paths}
+        seconds = {name: timed(fn, inputs[name], args.seconds) for name, fn in paths.items()}
+        fastest_trees = min(seconds['trees'], seconds['records'])
+        print(f"{batch:>7}" + ''.join(f"{format_time(s):>12}" for s in seconds.values()) +
+              f"{seconds['booster'] / fastest_trees:>9.1f}x")
+    sys.exit(1 if failed else 0)
+
+
+def softmax(margins):
+    exp = np.exp(margins - margins.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def format_time(seconds):
+    return f"{seconds * 1e6:.0f} µs" if seconds < 1e-3 else f"{seconds * 1e3:.1f} ms"
+
+
+if __name__ == '__main__':
+    main()
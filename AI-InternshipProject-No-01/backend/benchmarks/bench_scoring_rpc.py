@@ -0,0 +1,143 @@
+import argparse
+import http.client
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, BENCHMARKS)
+from loadtest import CHURN_FEATURES, HOST, PRODUCT_FEATURES, free_port, start_inprocess, start_subprocess, wait_ready
+from scoring_rpc import RpcClient
+
+# Throughput of the binary scoring RPC (scoring_rpc.py) vs the JSON routes, per batch size:
+#
+#   churn    JSON: /predict-churn (batch 1) or /predict-churn-batch     RPC: packed float64 matrix
+#   product  JSON: /predict-product (batch 1) or /predict-product-batch RPC: packed int32 category codes
+#
+# One client, one request in flight, keep-alive connections. Request bodies are
+# built before timing (JSON text, or feature matrices already encoded with the
+# RPC schema, as an internal caller would hold them); decoding the response is
+# timed. Rows are real customers from the CSVs. Before timing, RPC churn
+# probabilities are checked against the JSON batch route.
+#
+#   python benchmarks/bench_scoring_rpc.py --batches 1,64,4096
+#   python benchmarks/bench_scoring_rpc.py --server subprocess --workers 2
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Binary scoring RPC vs the JSON routes")
+    parser.add_argument('--server', choices=['inprocess', 'subprocess'], default='inprocess')
+    parser.add_argument('--workers', type=int, default=1, help="serve.py worker processes (subprocess mode)")
+    parser.add_argument('--batches', default='1,64,4096', help="Comma-separated batch sizes")
+    parser.add_argument('--seconds', type=float, default=3.0, help="Timing per model, path and batch size")
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+def load_rows(seed, n):
+    churn = pd.read_csv(os.path.join(BACKEND, 'churndata.csv'), usecols=CHURN_FEATURES)[CHURN_FEATURES].dropna()
+    product = pd.read_csv(os.path.join(BACKEND, 'customer_recommendations_better.csv'),
+                          usecols=PRODUCT_FEATURES)[PRODUCT_FEATURES].dropna()
+    return (churn.sample(n, replace=True, random_state=seed).reset_index(drop=True),
+            product.sample(n, replace=True, random_state=seed).reset_index(drop=True))
+
+
+def encode(schema, churn, product):
+    # Client-side packing with the server's schema: feature order, status codes, category codes
+    spec = schema['churn']
+    X = churn[spec['features']].copy()
+    X['account_status'] = X['account_status'].map(spec['account_status_codes'])
+    categories = schema['product']['categories']
+    codes = np.stack([pd.Index(categories[f]).get_indexer(product[f]) for f in schema['product']['features']], axis=1)
+    return X.to_numpy(dtype=np.float64), codes.astype(np.int32)
+
+
+def json_caller(port, model, records):
+    conn = http.client.HTTPConnection(HOST, port, timeout=60)
+    if len(records) == 1:
+        path, body = f'/predict-{model}', json.dumps(records[0])
+    else:
+        path, body = f'/predict-{model}-batch', json.dumps(records)
+    body = body.encode()
+    headers = {'Content-Type': 'application/json'}
+
+    def call():
+        conn.request('POST', path, body=body, headers=headers)
+        response = conn.getresponse()
+        data = response.read()
+        if response.status != 200:
+            raise RuntimeError(f"{path}: HTTP {response.status} {data[:200]!r}")
+        if model == 'churn' and len(records) > 1:
+            return [json.loads(line) for line in data.splitlines()]
+        return json.loads(data)
+    return call
+
+
+def rpc_caller(client, model, matrix):
+    if model == 'churn':
+        return lambda: client.churn(matrix)
+    return lambda: client.product(matrix)
+
+
+def throughput(call, rows, seconds):
+    # (requests/s, rows/s) over repeated sequential calls
+    call()
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds or calls < 3:
+        call()
+        calls += 1
+    elapsed = time.perf_counter() - start
+    return calls / elapsed, calls * rows / elapsed
+
+
+def check_parity(port, client, churn, X):
+    ndjson = json_caller(port, 'churn', churn.head(256).to_dict(orient='records'))()
+    reference = np.array([float(line['probability'].rstrip('%')) for line in ndjson])
+    error = np.abs(client.churn(X[:256]) * 100 - reference).max()
+    if error > 0.006:
+        sys.exit(f"RPC churn probabilities differ from /predict-churn-batch by {error:.4f} points")
+    print(f"Parity: RPC vs /predict-churn-batch max |Δ| {error:.4f} percentage points (JSON rounds to 0.01)")
+
+
+def main():
+    args = parse_args()
+    batches = [int(b) for b in args.batches.split(',')]
+    churn, product = load_rows(args.seed, max(batches))
+
+    rpc_address = os.path.join(tempfile.mkdtemp(prefix='scoring_rpc_'), 'rpc.sock')
+    os.environ['SCORING_RPC_ADDRESS'] = rpc_address
+    port = free_port()
+    if args.server == 'inprocess':
+        stop = start_inprocess(port)
+    else:
+        stop = start_subprocess(port, args.workers, extra_args=['--rpc', rpc_address])
+    try:
+        wait_ready(port)
+        client = RpcClient(rpc_address)
+        X, codes = encode(client.call('schema'), churn, product)
+        check_parity(port, client, churn, X)
+
+        print(f"\n{'model':>8} {'batch':>6} {'JSON req/s':>11} {'RPC req/s':>10} {'JSON rows/s':>12} "
+              f"{'RPC rows/s':>11} {'speedup':>8}")
+        for model, frame, matrix in (('churn', churn, X), ('product', product, codes)):
+            for batch in batches:
+                records = frame.head(batch).to_dict(orient='records')
+                json_rps, json_rows = throughput(json_caller(port, model, records), batch, args.seconds)
+                rpc_rps, rpc_rows = throughput(rpc_caller(client, model, matrix[:batch]), batch, args.seconds)
+                print(f"{model:>8} {batch:>6} {json_rps:>11,.0f} {rpc_rps:>10,.0f} {json_rows:>12,.0f} "
+                      f"{rpc_rows:>11,.0f} {rpc_rps / json_rps:>7.1f}x")
+        client.close()
+    finally:
+        stop()
+
+
+if __name__ == '__main__':
+    main()
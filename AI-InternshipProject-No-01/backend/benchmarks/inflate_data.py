@@ -0,0 +1,344 @@
+import argparse
+import collections
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Synthetic, distribution-preserving copies of the No-01 datasets at 1M-100M rows,
+# for benchmarking churn-model.py, recommendatrion-model.py and train_and_predict
+# at production scale.
+#
+#   python benchmarks/inflate_data.py --dataset churn --rows 10000000
+#   python benchmarks/inflate_data.py --dataset all --rows 1000000 --format parquet --processes 4
+#   python churn-model.py --mode stream --path synthetic/churndata_10000000.csv
+#
+# What is learned from each CSV (same columns, order and value formats as the source):
+# - one conditioning column per dataset (the model target, or Category for the
+#   sales data) is drawn from its marginal distribution;
+# - every other column is drawn from its distribution given that column, so the
+#   feature / target relationship the models learn survives the inflation:
+#   text and low-cardinality integer columns from the observed frequencies,
+#   numeric and date columns from the empirical quantile function (linear
+#   between observed values, rounded to the source precision, within its range);
+# - free-text columns where most rows hold a value seen only once
+#   (product_keywords) are drawn from their marginal instead: conditioned on
+#   the target, a near-unique value would give away the label;
+# - unique ID columns (customer_id, user_id) keep their format and stay unique:
+#   the row number goes through a bijective bit mixer into the hex digits;
+# - an integer column that is a fixed offset of a date column
+#   (days_since_last_interaction vs last_interaction_date) is derived from it.
+#
+# Rows are generated in chunks of --chunk-rows by a spawn process pool. Chunk i
+# draws from SeedSequence(seed, spawn_key=(i,)), so the output depends on --seed
+# and --chunk-rows only, not on --processes. (Not default_rng([seed, i]): that is
+# the holdout RNG of churn-model.py --mode stream, and the holdout rows would
+# then be exactly the rows drawn with the first values of the target.) CSV chunks come back to the parent and are appended
+# in order (at most 2 x processes chunks in flight); Parquet chunks are written
+# by the workers as part files of a dataset directory (needs pyarrow), readable
+# with pd.read_parquet(<dir>).
+
+DATASETS = {
+    'churn': ('churndata.csv', 'churn_flag'),
+    'product': ('customer_recommendations_better.csv', 'suggested_product'),
+    'sales': ('retail_sales_data.csv', 'Category')
+}
+MAX_CATEGORY_INTEGERS = 32  # integer columns with at most this many values are sampled as categories
+HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype='S1')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Write large synthetic versions of the No-01 datasets")
+    parser.add_argument('--dataset', choices=list(DATASETS) + ['all'], default='all')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--chunk-rows', type=int, default=250000)
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=os.path.join(BACKEND, 'synthetic'))
+    return parser.parse_args()
+
+
+# ---------- fitting ----------
+
+def decimals(values):
+    # Digits after the point needed to print every value exactly (at most 6)
+    for d in range(7):
+        if np.allclose(values, np.round(values, d), rtol=0, atol=1e-9):
+            return d
+    return 6
+
+
+def id_template(values):
+    # Fixed characters (separators, the UUID version nibble) and the positions that vary
+    if not len(values) or values.str.len().nunique() != 1 or not values.str.fullmatch(r'[0-9a-f-]+').all():
+        return None
+    chars = np.array([list(v) for v in values])
+    fixed = (chars == chars[0]).all(axis=0)
+    return {'template': np.array(list(values.iloc[0]), dtype='S1'), 'positions': np.flatnonzero(~fixed)}
+
+
+def column_kind(series):
+    if series.dtype == object:
+        if series.is_unique and id_template(series.dropna()) is not None:
+            return 'id'
+        parsed = pd.to_datetime(series, format='%Y-%m-%d', errors='coerce')
+        if parsed.notna().all():
+            return 'date'
+        counts = series.value_counts()
+        return 'text' if counts[counts == 1].sum() > 0.5 * len(series) else 'category'
+    if pd.api.types.is_integer_dtype(series) and series.nunique() <= MAX_CATEGORY_INTEGERS:
+        return 'category'
+    return 'numeric'
+
+
+def day_numbers(series):
+    return pd.to_datetime(series, format='%Y-%m-%d').to_numpy().astype('datetime64[D]').astype(np.int64)
+
+
+def find_offsets(df, kinds):
+    # int column == constant - date column (in days), e.g. days since a snapshot date
+    offsets = {}
+    for date_col in [c for c, k in kinds.items() if k == 'date']:
+        days = day_numbers(df[date_col])
+        for col in [c for c, k in kinds.items() if k in ('numeric', 'category')]:
+            if col in offsets or not pd.api.types.is_integer_dtype(df[col]):
+                continue
+            total = days + df[col].to_numpy()
+            if (total == total[0]).all():
+                offsets[col] = (date_col, int(total[0]))
+    return offsets
+
+
+def fit(df, condition):
+    # Per-column sampling tables, keyed by the code of the conditioning column
+    df = df.dropna(subset=[condition])
+    cond_values, cond_codes = np.unique(df[condition].to_numpy(), return_inverse=True)
+    cond_counts = np.bincount(cond_codes, minlength=len(cond_values))
+    kinds = {col: column_kind(df[col]) for col in df.columns}
+    offsets = find_offsets(df, kinds)
+
+    columns = {}
+    for col in df.columns:
+        if col == condition:
+            continue
+        if col in offsets:
+            columns[col] = {'kind': 'offset', 'date': offsets[col][0], 'total': offsets[col][1],
+                            'dtype': df[col].dtype}
+            continue
+        kind = kinds[col]
+        if kind == 'id':
+            columns[col] = dict(id_template(df[col]), kind='id')
+            continue
+        if kind == 'text':
+            values, counts = np.unique(df[col].astype(str).to_numpy(), return_counts=True)
+            columns[col] = {'kind': 'text', 'values': values.astype(object), 'cum': np.cumsum(counts) / counts.sum()}
+            continue
+
+        groups = []
+        for g in range(len(cond_values)):
+            part = df[col].to_numpy()[cond_codes == g]
+            if kind == 'category':
+                values, counts = np.unique(part.astype(str) if part.dtype == object else part, return_counts=True)
+                if part.dtype == object:
+                    values = values.astype(object)
+                groups.append({'values': values, 'cum': np.cumsum(counts) / counts.sum()})
+            else:
+                numbers = day_numbers(pd.Series(part)) if kind == 'date' else part.astype(np.float64)
+                observed = np.sort(numbers[np.isfinite(numbers)])
+                groups.append({'sorted': observed, 'null_rate': 1 - len(observed) / max(len(numbers), 1)})
+        spec = {'kind': kind, 'groups': groups, 'dtype': df[col].dtype}
+        if kind == 'numeric':
+            spec['decimals'] = 0 if pd.api.types.is_integer_dtype(df[col]) else decimals(df[col].dropna().to_numpy())
+        columns[col] = spec
+
+    return {
+        'order': list(df.columns),
+        'condition': condition,
+        'condition_values': cond_values.astype(object) if cond_values.dtype.kind in 'OU' else cond_values,
+        'condition_cum': np.cumsum(cond_counts) / cond_counts.sum(),
+        'columns': columns
+    }
+
+
+# ---------- sampling ----------
+
+def draw(cum, rng, n):
+    return np.minimum(np.searchsorted(cum, rng.random(n), side='right'), len(cum) - 1)
+
+
+def mix_bits(index, bits):
+    # Bijection on [0, 2**bits): odd multipliers and xor-shifts, so distinct rows get distinct IDs
+    mask = np.uint64((1 << bits) - 1)
+    shift = np.uint64(max(bits // 2, 1))
+    x = (index.astype(np.uint64) + np.uint64(0x2545F4914F6CDD1D)) & mask  # row 0 is not all zeros
+    for multiplier in (0x9E3779B97F4A7C15, 0xBF58476D1CE4E5B9):
+        x = (x * np.uint64(multiplier)) & mask
+        x ^= x >> shift
+    return x
+
+
+def sample_ids(spec, rng, start, n):
+    positions = spec['positions']
+    chars = np.tile(spec['template'], (n, 1))
+    unique = positions[-16:]  # up to 64 bits from the row number, the rest random
+    mixed = mix_bits(np.arange(start, start + n, dtype=np.uint64), 4 * len(unique))
+    for j, pos in enumerate(unique):
+        chars[:, pos] = HEX_DIGITS[(mixed >> np.uint64(4 * (len(unique) - 1 - j))) & np.uint64(15)]
+    for pos in positions[:-16]:
+        chars[:, pos] = HEX_DIGITS[rng.integers(0, 16, n)]
+    return chars.view(f'S{chars.shape[1]}').ravel().astype(str).astype(object)
+
+
+def sample_numbers(group, rng, n):
+    observed = group['sorted']
+    if not len(observed):
+        return np.full(n, np.nan)
+    # Empirical quantile function, linear between neighbouring observations
+    out = np.interp(rng.random(n) * (len(observed) - 1), np.arange(len(observed)), observed)
+    if group['null_rate']:
+        out[rng.random(n) < group['null_rate']] = np.nan
+    return out
+
+
+def sample_chunk(model, rng, start, n):
+    cond = draw(model['condition_cum'], rng, n)
+    by_group = [np.flatnonzero(cond == g) for g in range(len(model['condition_cum']))]
+    data = {model['condition']: model['condition_values'][cond]}
+    days = {}
+
+    for col, spec in model['columns'].items():
+        kind = spec['kind']
+        if kind == 'offset':
+            continue
+        if kind == 'id':
+            data[col] = sample_ids(spec, rng, start, n)
+            continue
+        if kind == 'text':
+            data[col] = spec['values'][draw(spec['cum'], rng, n)]
+            continue
+        out = np.empty(n, dtype=object if kind == 'category' else np.float64)
+        if kind == 'category' and spec['dtype'] != object:
+            out = np.empty(n, dtype=spec['dtype'])
+        for group, idx in zip(spec['groups'], by_group):
+            if kind == 'category':
+                out[idx] = group['values'][draw(group['cum'], rng, len(idx))]
+            else:
+                out[idx] = sample_numbers(group, rng, len(idx))
+        if kind == 'date':
+            days[col] = np.rint(out)
+            data[col] = np.datetime_as_string(days[col].astype('datetime64[D]')).astype(object)
+        elif kind == 'numeric':
+            out = np.round(out, spec['decimals'])
+            data[col] = out.astype(spec['dtype']) if spec['decimals'] == 0 and np.isfinite(out).all() else out
+        else:
+            data[col] = out
+
+    for col, spec in model['columns'].items():
+        if spec['kind'] == 'offset':
+            data[col] = (spec['total'] - days[spec['date']]).astype(spec['dtype'])
+    return pd.DataFrame(data, columns=model['order'])
+
+
+def chunk_rng(seed, chunk_no):
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(chunk_no,)))
+
+
+def write_chunk(model, seed, chunk_no, start, n, fmt, folder):
+    # Worker entry point: CSV text (no header) back to the parent, or a Parquet part file
+    df = sample_chunk(model, chunk_rng(seed, chunk_no), start, n)
+    if fmt == 'parquet':
+        df.to_parquet(os.path.join(folder, f'part-{chunk_no:05d}.parquet'), index=False)
+        return n
+    return df.to_csv(index=False, header=False).encode()
+
+
+# ---------- driver ----------
+
+def check_sample(source, sample):
+    # Largest deviation of the synthetic marginals from the source, per column
+    lines = []
+    for col in source.columns:
+        kind = column_kind(source[col])
+        if kind == 'id':
+            continue
+        if kind in ('category', 'text'):
+            a = source[col].value_counts(normalize=True)
+            b = sample[col].value_counts(normalize=True).reindex(a.index, fill_value=0)
+            lines.append(f"{col}: max frequency diff {np.abs(a - b).max():.4f}")
+        else:
+            a, b = [day_numbers(s) if kind == 'date' else s.astype(float) for s in (source[col], sample[col])]
+            a, b = pd.Series(a, dtype=float), pd.Series(b, dtype=float)
+            lines.append(f"{col}: mean {a.mean():.4g} / {b.mean():.4g}, std {a.std():.4g} / {b.std():.4g}")
+    return lines
+
+
+def inflate(name, args):
+    filename, condition = DATASETS[name]
+    source = pd.read_csv(os.path.join(BACKEND, filename))
+    model = fit(source, condition)
+    for line in check_sample(source, sample_chunk(model, chunk_rng(args.seed, 0), 0,
+                                                    min(args.rows, args.chunk_rows))):
+        print(f"   {line}")
+
+    stem = os.path.splitext(filename)[0]
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f'{stem}_{args.rows}.{args.format}')
+    if args.format == 'parquet':
+        os.makedirs(path, exist_ok=True)
+        for old in os.listdir(path):
+            if old.startswith('part-'):
+                os.remove(os.path.join(path, old))
+
+    chunks = [(i, start, min(args.chunk_rows, args.rows - start))
+              for i, start in enumerate(range(0, args.rows, args.chunk_rows))]
+    started = time.perf_counter()
+    pending = collections.deque()
+    out = None
+    with ProcessPoolExecutor(max_workers=args.processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+        try:
+            if args.format == 'csv':
+                out = open(path, 'wb')
+                out.write((','.join(source.columns) + '\n').encode())
+            for chunk_no, start, n in chunks:
+                pending.append(pool.submit(write_chunk, model, args.seed, chunk_no, start, n, args.format, path))
+                if len(pending) >= 2 * args.processes:
+                    done = pending.popleft().result()
+                    if out is not None:
+                        out.write(done)
+            while pending:
+                done = pending.popleft().result()
+                if out is not None:
+                    out.write(done)
+        finally:
+            if out is not None:
+                out.close()
+
+    seconds = time.perf_counter() - started
+    print(f"✅ {name}: {args.rows:,} rows in {len(chunks)} chunks -> {path} "
+          f"({seconds:.1f}s, {args.rows / seconds:,.0f} rows/s)")
+
+
+def main():
+    args = parse_args()
+    if args.rows < 1 or args.chunk_rows < 1 or args.processes < 1:
+        sys.exit("--rows, --chunk-rows and --processes must be positive")
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            sys.exit("--format parquet needs pyarrow (pip install -r req.txt)")
+
+    for name in (list(DATASETS) if args.dataset == 'all' else [args.dataset]):
+        print(f"🧪 {name}: fitting on {DATASETS[name][0]}, conditioned on {DATASETS[name][1]}")
+        inflate(name, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+# Localhost load test for the combined API: throughput and tail latency of
+# /predict-churn, /predict-product and /metrics (--endpoints also offers
+# /predict-product-batch with 64 customers per request, and /predict-file).
+#
+# The API runs either in this process (werkzeug threaded server on a free port)
+# or as a subprocess through serve.py, the production entry point. Payloads are
+# real rows of churndata.csv / customer_recommendations_better.csv. Each client
+# thread keeps one connection and sends requests back to back, so --concurrency
+# is the number of requests in flight. In-process mode shares the GIL with the
+# client threads; use --server subprocess for numbers comparable to production.
+#
+#   python benchmarks/loadtest.py --server subprocess --workers 4 --concurrency 16 --duration 20
+#   python benchmarks/loadtest.py --output results.json
+#   python benchmarks/loadtest.py --thresholds thresholds.json       # absolute limits
+#   python benchmarks/loadtest.py --baseline results.json --tolerance 0.15
+#
+# thresholds.json: {"predict-churn": {"p99_ms": 25, "min_rps": 300}, "total": {"max_error_rate": 0}}
+# Exit status is 1 when a threshold or the baseline comparison fails.
+
+HOST = '127.0.0.1'
+ENDPOINTS = {
+    'predict-churn': ('POST', '/predict-churn', 'application/json'),
+    'predict-product': ('POST', '/predict-product', 'application/json'),
+    'predict-product-batch': ('POST', '/predict-product-batch', 'application/json'),
+    'predict-file': ('POST', '/predict-file', 'text/csv'),
+    'metrics': ('GET', '/metrics', None)
+}
+DEFAULT_ENDPOINTS = ['predict-churn', 'predict-product', 'metrics']
+PRODUCT_BATCH_ROWS = 64
+CHURN_FEATURES = [
+    'customer_tenure', 'number_of_services_or_products', 'average_monthly_usage',
+    'days_since_last_interaction', 'complaints_resolved_ratio', 'total_spent',
+    'average_transaction_value', 'discount_or_offer_received', 'account_status'
+]
+PRODUCT_FEATURES = ['region', 'gender', 'user_age_group', 'user_preferences', 'season', 'product_keywords', 'previous_buy']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Localhost load test for the combined API")
+    parser.add_argument('--server', choices=['inprocess', 'subprocess'], default='inprocess')
+    parser.add_argument('--workers', type=int, default=2, help="serve.py worker processes (subprocess mode)")
+    parser.add_argument('--port', type=int, default=0, help="0 = pick a free port")
+    parser.add_argument('--endpoints', default=','.join(DEFAULT_ENDPOINTS),
+                        help="Comma-separated, from: " + ', '.join(ENDPOINTS))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds of measurement per endpoint")
+    parser.add_argument('--warmup', type=float, default=2.0, help="Seconds of unmeasured load per endpoint")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write the JSON result here as well")
+    parser.add_argument('--thresholds', help="JSON file of per-endpoint limits")
+    parser.add_argument('--baseline', help="Earlier --output file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative regression vs --baseline")
+    return parser.parse_args()
+
+
+# ---------- payloads ----------
+
+def load_payloads(seed):
+    # JSON bodies from the real datasets, shuffled so requests are not cache-friendly by order
+    churn = pd.read_csv(os.path.join(BACKEND, 'churndata.csv'), usecols=CHURN_FEATURES)[CHURN_FEATURES].dropna()
+    product = pd.read_csv(os.path.join(BACKEND, 'customer_recommendations_better.csv'),
+                          usecols=PRODUCT_FEATURES)[PRODUCT_FEATURES].dropna()
+    rng = random.Random(seed)
+    product_records = product.to_dict(orient='records')
+    # /predict-file gets the same upload every time, so after the first fit it measures
+    # ingest + hashing + the forecast cache, not training
+    with open(os.path.join(BACKEND, 'retail_sales_data.csv'), 'rb') as f:
+        sales = f.read()
+    bodies = {
+        'predict-churn': [json.dumps(r).encode() for r in churn.to_dict(orient='records')],
+        'predict-product': [json.dumps(r).encode() for r in product_records],
+        'predict-product-batch': [json.dumps(product_records[i:i + PRODUCT_BATCH_ROWS]).encode()
+                                  for i in range(0, len(product_records), PRODUCT_BATCH_ROWS)],
+        'predict-file': [sales],
+        'metrics': [b'']
+    }
+    for values in bodies.values():
+        rng.shuffle(values)
+    return bodies
+
+
+# ---------- server ----------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port, timeout=120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(HOST, port, timeout=2)
+            conn.request('GET', '/ready')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"API on port {port} not ready after {timeout:.0f}s")
+
+
+def start_inprocess(port):
+    from werkzeug.serving import make_server
+
+    os.chdir(BACKEND)
+    os.environ.setdefault('MODEL_POLL_INTERVAL', '3600')
+    from app import app
+    server = make_server(HOST, port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown
+
+
+def start_subprocess(port, workers, extra_args=()):
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    proc = subprocess.Popen([sys.executable, os.path.join(BACKEND, 'serve.py'), '--host', HOST,
+                             '--port', str(port), '--workers', str(workers), *extra_args],
+                            cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def stop():
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return stop
+
+
+# ---------- load ----------
+
+def client(port, method, path, content_type, bodies, start_at, stop_at, latencies, errors, offset):
+    conn = http.client.HTTPConnection(HOST, port, timeout=30)
+    headers = {'Content-Type': content_type} if content_type else {}
+    i = offset
+    while True:
+        body = bodies[i % len(bodies)]
+        i += 1
+        sent = time.perf_counter()
+        if sent >= stop_at:
+            break
+        try:
+            conn.request(method, path, body=body or None, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status < 400
+            if response.getheader('Connection', '').lower() == 'close':
+                conn.close()
+        except (OSError, http.client.HTTPException):
+            ok = False
+            conn.close()
+        if sent >= start_at:
+            if ok:
+                latencies.append(time.perf_counter() - sent)
+            else:
+                errors.append(1)
+    conn.close()
+
+
+def run_endpoint(port, name, bodies, concurrency, warmup, duration):
+    method, path, content_type = ENDPOINTS[name]
+    start_at = time.perf_counter() + warmup
+    stop_at = start_at + duration
+    per_thread = [([], []) for _ in range(concurrency)]
+    threads = [threading.Thread(target=client, args=(port, method, path, content_type, bodies,
+                                                     start_at, stop_at, lat, err, n * 7919))
+               for n, (lat, err) in enumerate(per_thread)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies = np.array([x for lat, _ in per_thread for x in lat]) * 1000
+    errors = sum(len(err) for _, err in per_thread)
+    return summarize(latencies, errors, duration)
+
+
+def summarize(latencies_ms, errors, duration):
+    total = len(latencies_ms) + errors
+    result = {
+        "requests": int(total),
+        "errors": int(errors),
+        "error_rate": round(errors / total, 6) if total else 0.0,
+        "rps": round(len(latencies_ms) / duration, 1)
+    }
+    if len(latencies_ms):
+        p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+        result.update({
+            "mean_ms": round(float(latencies_ms.mean()), 3),
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(latencies_ms.max()), 3)
+        })
+    return result
+
+
+# ---------- checks ----------
+
+def check_thresholds(results, thresholds):
+    failures = []
+    for name, limits in thresholds.items():
+        r = results.get(name)
+        if r is None:
+            continue
+        for key, limit in limits.items():
+            if key == 'min_rps' and r['rps'] < limit:
+                failures.append(f"{name}: rps {r['rps']} < {limit}")
+            elif key == 'max_error_rate' and r['error_rate'] > limit:
+                failures.append(f"{name}: error_rate {r['error_rate']} > {limit}")
+            elif key.endswith('_ms') and r.get(key, float('inf')) > limit:
+                failures.append(f"{name}: {key} {r.get(key)} > {limit}")
+    return failures
+
+
+def check_baseline(results, baseline, tolerance):
+    # Latency may grow and throughput may drop by at most `tolerance` (relative)
+    failures = []
+    for name, before in baseline.get('endpoints', {}).items():
+        now = results.get(name)
+        if now is None:
+            continue
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if key in before and key in now and now[key] > before[key] * (1 + tolerance):
+                failures.append(f"{name}: {key} {before[key]} -> {now[key]}")
+        if now['rps'] < before['rps'] * (1 - tolerance):
+            failures.append(f"{name}: rps {before['rps']} -> {now['rps']}")
+    return failures
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    names = [n.strip() for n in args.endpoints.split(',') if n.strip()]
+    unknown = [n for n in names if n not in ENDPOINTS]
+    if unknown:
+        sys.exit(f"Unknown endpoints: {unknown}")
+
+    bodies = load_payloads(args.seed)
+    port = args.port or free_port()
+    stop = start_inprocess(port) if args.server == 'inprocess' else start_subprocess(port, args.workers)
+    try:
+        wait_ready(port)
+        endpoints = {}
+        for name in names:
+            endpoints[name] = run_endpoint(port, name, bodies[name], args.concurrency, args.warmup, args.duration)
+            print(f"{name:>16}: {endpoints[name]}", file=sys.stderr)
+    finally:
+        stop()
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "config": {"server": args.server, "workers": args.workers if args.server == 'subprocess' else None,
+                   "concurrency": args.concurrency, "duration": args.duration, "warmup": args.warmup,
+                   "cpus": os.cpu_count()},
+        "endpoints": endpoints
+    }
+    requests = sum(r['requests'] for r in endpoints.values())
+    errors = sum(r['errors'] for r in endpoints.values())
+    result["total"] = {"requests": requests, "errors": errors, "error_rate": round(errors / max(requests, 1), 6)}
+
+    failures = []
+    if args.thresholds:
+        with open(args.thresholds) as f:
+            failures += check_thresholds(dict(endpoints, total=result["total"]), json.load(f))
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures += check_baseline(endpoints, json.load(f), args.tolerance)
+    result["failures"] = failures
+
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
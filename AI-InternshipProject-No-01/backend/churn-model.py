@@ -1,13 +1,30 @@
+import argparse
+import os
+import pickle
+import time
+
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.pipeline import Pipeline
-from sklearn.compose import ColumnTransformer
-import pickle
+from sklearn.metrics import accuracy_score, log_loss, roc_auc_score
+from churn_kernel import save_feature_spec
+from model_artifacts import CHURN_ARTIFACT, save_churn
 
-# Load data
-df = pd.read_csv('/home/shayan/Desktop/Ammad stuff/all/AI-InternshipProjectNo1/backend/churndata.csv')
+# Churn model training.
+#
+#   python churn-model.py                                   # in memory: StandardScaler + LogisticRegression
+#   python churn-model.py --mode stream --path big.csv --chunksize 500000
+#
+# --mode stream never holds more than one chunk of the CSV: pass 1 accumulates
+# the scaler statistics (StandardScaler.partial_fit) and the account_status
+# values, pass 2 (x --epochs) trains SGDClassifier(loss="log_loss") with
+# partial_fit, and a last pass scores the holdout rows. Holdout rows are picked
+# per chunk with a seeded RNG, so every pass sees the same split.
+# Both modes write churn_model.pkl, churn_features.json and models/churn/.
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
 
 # Selected Features
 features = [
@@ -22,28 +39,176 @@ features = [
     'account_status'
 ]
 target = 'churn_flag'
+numeric = [f for f in features if f != 'account_status']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the churn model")
+    parser.add_argument('--path', default=os.path.join(BACKEND, 'churndata.csv'), help="Training CSV")
+    parser.add_argument('--mode', choices=['memory', 'stream'], default='memory')
+    parser.add_argument('--chunksize', type=int, default=100000, help="Rows per chunk in stream mode")
+    parser.add_argument('--epochs', type=int, default=5, help="partial_fit passes over the data in stream mode")
+    parser.add_argument('--holdout', type=float, default=0.2, help="Fraction of rows held out for evaluation")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=BACKEND, help="Folder for churn_model.pkl / churn_features.json / models/")
+    return parser.parse_args()
+
+
+def report(y_true, proba):
+    pred = (proba > 0.5).astype(int)
+    print(f"🎯 Holdout accuracy: {accuracy_score(y_true, pred) * 100:.2f}% | "
+          f"log loss: {log_loss(y_true, proba, labels=[0, 1]):.4f} | "
+          f"ROC AUC: {roc_auc_score(y_true, proba) if len(np.unique(y_true)) > 1 else float('nan'):.4f} "
+          f"({len(y_true)} rows)")
+
+
+# ---------- In memory: whole CSV, StandardScaler + LogisticRegression ----------
+
+def train_memory(args):
+    # Load data
+    df = pd.read_csv(args.path)
+
+    # Clean and prepare data
+    df = df[features + [target]].dropna()
+
+    # Encode categorical if needed
+    status_codes = {}
+    if df['account_status'].dtype == 'object':
+        status_encoder = LabelEncoder()
+        df['account_status'] = status_encoder.fit_transform(df['account_status'])
+        status_codes = {str(c): i for i, c in enumerate(status_encoder.classes_)}
+
+    # Split
+    X = df[features]
+    y = df[target]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=args.holdout, random_state=args.seed)
+
+    # Preprocessing
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X_train)
+
+    # Train model
+    model = LogisticRegression()
+    model.fit(X_scaled, y_train)
+    report(y_test.to_numpy(), model.predict_proba(scaler.transform(X_test))[:, 1])
+    return model, scaler, status_codes
+
+
+# ---------- Streaming: chunked CSV, partial_fit ----------
+
+def read_chunks(args):
+    return pd.read_csv(args.path, usecols=features + [target], chunksize=args.chunksize)
+
+
+def holdout_mask(args, chunk_no, n):
+    # Same rows on every pass: the RNG is seeded with the chunk number
+    return np.random.default_rng([args.seed, chunk_no]).random(n) < args.holdout
+
+
+def encode_chunk(chunk, status_codes):
+    # float64 matrix in feature order; unknown account_status values drop the row
+    chunk = chunk.dropna()
+    status = chunk['account_status']
+    if status.dtype == 'object':
+        status = status.map(status_codes)
+    X = chunk[features].assign(account_status=status).to_numpy(dtype=np.float64)
+    keep = np.isfinite(X).all(axis=1)
+    return X[keep], chunk[target].to_numpy()[keep]
+
+
+def timed_pass(name, args, handle):
+    # Runs handle(chunk_no, chunk) over every chunk and prints the throughput
+    start = time.perf_counter()
+    rows = chunks = 0
+    for chunk_no, chunk in enumerate(read_chunks(args)):
+        handle(chunk_no, chunk)
+        rows += len(chunk)
+        chunks += 1
+    seconds = time.perf_counter() - start
+    print(f"⏱️ {name}: {chunks} chunks, {rows} rows in {seconds:.2f}s "
+          f"({rows / seconds:,.0f} rows/s, {seconds / max(chunks, 1) * 1000:.1f} ms/chunk)")
+
+
+def train_stream(args):
+    # Pass 1: scaler statistics for the numeric columns + account_status value counts
+    numeric_scaler = StandardScaler()
+    status_counts = {}
+
+    def scan(chunk_no, chunk):
+        chunk = chunk.dropna()
+        train = chunk[~holdout_mask(args, chunk_no, len(chunk))]
+        if len(train):
+            numeric_scaler.partial_fit(train[numeric].to_numpy(dtype=np.float64))
+        for value, count in train['account_status'].value_counts().items():
+            status_counts[value] = status_counts.get(value, 0) + int(count)
+
+    timed_pass("Pass 1 (scaler statistics)", args, scan)
+
+    # Same codes as LabelEncoder (sorted values); numeric statuses are used as they are
+    values = sorted(status_counts)
+    textual = any(isinstance(v, str) for v in values)
+    status_codes = {str(v): i for i, v in enumerate(values)} if textual else {}
+    codes = np.array([status_codes[str(v)] if textual else v for v in values], dtype=np.float64)
+    counts = np.array([status_counts[v] for v in values], dtype=np.float64)
+    status_mean = float(np.dot(codes, counts) / counts.sum())
+    status_var = float(np.dot((codes - status_mean) ** 2, counts) / counts.sum())
+
+    # Assemble the full scaler in feature order, as StandardScaler.fit would have
+    index = features.index('account_status')
+    scaler = StandardScaler()
+    scaler.mean_ = np.insert(numeric_scaler.mean_, index, status_mean)
+    scaler.var_ = np.insert(numeric_scaler.var_, index, status_var)
+    scaler.scale_ = np.where(scaler.var_ > 0, np.sqrt(scaler.var_), 1.0)
+    scaler.n_samples_seen_ = int(numeric_scaler.n_samples_seen_)
+    scaler.n_features_in_ = len(features)
+    scaler.feature_names_in_ = np.array(features, dtype=object)
+
+    # Pass 2..: partial_fit on the training rows of every chunk
+    model = SGDClassifier(loss='log_loss', average=True, random_state=args.seed)
+    lookup = status_codes or {v: v for v in values}
+
+    def fit(chunk_no, chunk):
+        chunk = chunk.dropna()
+        X, y = encode_chunk(chunk[~holdout_mask(args, chunk_no, len(chunk))], lookup)
+        if len(X):
+            model.partial_fit((X - scaler.mean_) / scaler.scale_, y, classes=np.array([0, 1]))
+
+    for epoch in range(args.epochs):
+        timed_pass(f"Pass {epoch + 2} (partial_fit epoch {epoch + 1}/{args.epochs})", args, fit)
+
+    # Last pass: score the holdout rows
+    y_true, proba = [], []
+
+    def evaluate(chunk_no, chunk):
+        chunk = chunk.dropna()
+        X, y = encode_chunk(chunk[holdout_mask(args, chunk_no, len(chunk))], lookup)
+        if len(X):
+            y_true.append(y)
+            proba.append(model.predict_proba((X - scaler.mean_) / scaler.scale_)[:, 1])
+
+    timed_pass("Holdout pass", args, evaluate)
+    if y_true:
+        report(np.concatenate(y_true), np.concatenate(proba))
+    return model, scaler, status_codes
+
 
-# Clean and prepare data
-df = df[features + [target]].dropna()
+def main():
+    args = parse_args()
+    model, scaler, status_codes = train_stream(args) if args.mode == 'stream' else train_memory(args)
 
-# Encode categorical if needed
-if df['account_status'].dtype == 'object':
-    df['account_status'] = LabelEncoder().fit_transform(df['account_status'])
+    # Save both model and scaler
+    with open(os.path.join(args.output, 'churn_model.pkl'), 'wb') as f:
+        pickle.dump((model, scaler), f)
 
-# Split
-X = df[features]
-y = df[target]
+    # Persist field order + account_status codes for the serving kernel in app.py
+    save_feature_spec(os.path.join(args.output, 'churn_features.json'), features, status_codes)
 
-# Preprocessing
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
+    print("✅ Model and scaler saved as churn_model.pkl")
 
-# Train model
-model = LogisticRegression()
-model.fit(X_scaled, y)
+    # Versioned, memory-mappable copy loaded by app.py
+    manifest = save_churn(os.path.join(args.output, CHURN_ARTIFACT), model, scaler, features, status_codes)
+    print(f"✅ Churn artifact {manifest['version']} saved in {CHURN_ARTIFACT}/")
 
-# Save both model and scaler
-with open('churn_model.pkl', 'wb') as f:
-    pickle.dump((model, scaler), f)
 
-print("✅ Model and scaler saved as churn_model.pkl")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
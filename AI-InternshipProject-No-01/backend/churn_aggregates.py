@@ -0,0 +1,180 @@
+import csv
+import os
+import threading
+
+# Churn aggregates for /metrics, maintained incrementally from the CSV's byte offset.
+# The cache is keyed on (mtime, size): an unchanged file is served straight from
+# memory, appended rows are parsed from the last offset only, anything else
+# (truncation, rewrite) triggers a full rebuild. A last line without a newline is
+# counted at EOF like pandas does; if a later write extends that line instead of
+# starting a new one, the file is rebuilt.
+
+BREAKDOWN_COLUMNS = ['account_status', 'payment_frequency']
+
+# (upper bound in months, label) - customer_tenure is in months
+TENURE_BUCKETS = [(12, '0-12'), (24, '13-24'), (48, '25-48'), (72, '49-72'), (96, '73-96')]
+TENURE_OVERFLOW = '97+'
+
+READ_BLOCK = 8 * 1024 * 1024
+TAIL_GUARD = 64
+
+
+def tenure_bucket(value):
+    try:
+        tenure = float(value)
+    except (TypeError, ValueError):
+        return 'unknown'
+    for upper, label in TENURE_BUCKETS:
+        if tenure <= upper:
+            return label
+    return TENURE_OVERFLOW
+
+
+class CsvTail:
+    # Tracks how far a growing CSV has been consumed and yields only the new rows
+
+    def __init__(self, path):
+        self.path = path
+        self.key = None
+        self.offset = 0
+        self.header = None
+        self.inode = None
+        self.guard = b''
+        # The consumed bytes end in a line without a newline
+        self.open_line = False
+
+    def stat_key(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size), st
+
+    def is_append(self, f, st):
+        # Same file, grown past our offset, and the bytes we already consumed are unchanged
+        if self.header is None or st.st_ino != self.inode or st.st_size < self.offset:
+            return False
+        f.seek(max(self.offset - len(self.guard), 0))
+        if f.read(len(self.guard)) != self.guard:
+            return False
+        # An appended write must start a new line, not extend the one already counted
+        return not self.open_line or f.read(1) in (b'', b'\n', b'\r')
+
+    def read_blocks(self, f, start, end):
+        # Lines in [start, end), read block by block; leaves self.offset after the last one.
+        # A partial line at end is held back, unless end is EOF (the file's last line has no newline)
+        f.seek(start)
+        pending = b''
+        position = start
+        open_line = False
+        while position < end:
+            block = f.read(min(READ_BLOCK, end - position))
+            if not block:
+                break
+            position += len(block)
+            data = pending + block
+            cut = data.rfind(b'\n') + 1
+            if cut < len(data) and position == end and not f.read(1):
+                cut, open_line = len(data), True
+            pending = data[cut:]
+            if cut:
+                yield data[:cut]
+        if position > start:
+            self.open_line = open_line
+        self.offset = position - len(pending)
+
+    def read_rows(self, f, start, end):
+        for block in self.read_blocks(f, start, end):
+            yield from csv.reader(block.decode('utf-8').splitlines())
+
+    def refresh(self, on_reset, on_rows, blocks=False):
+        # on_rows gets parsed rows, or with blocks=True the raw bytes of whole lines
+        key, st = self.stat_key()
+        if key == self.key:
+            return False
+
+        with open(self.path, 'rb') as f:
+            if not self.is_append(f, st):
+                f.seek(0)
+                header_line = f.readline()
+                self.header = next(csv.reader([header_line.decode('utf-8-sig')]))
+                self.inode = st.st_ino
+                self.offset = len(header_line)
+                self.open_line = False
+                on_reset(self.header)
+
+            read = self.read_blocks if blocks else self.read_rows
+            on_rows(read(f, self.offset, st.st_size))
+
+            f.seek(max(self.offset - TAIL_GUARD, 0))
+            self.guard = f.read(self.offset - max(self.offset - TAIL_GUARD, 0))
+
+        self.key = key
+        return True
+
+
+class ChurnAggregateCache:
+    def __init__(self, path):
+        self.tail = CsvTail(path)
+        self.lock = threading.Lock()
+        self.snapshot = None
+
+    def _reset(self, header):
+        self.columns = {name: header.index(name) for name in header}
+        self.total = 0
+        self.churned = 0.0
+        self.groups = {name: {} for name in BREAKDOWN_COLUMNS + ['tenure_bucket']}
+
+    def _add_rows(self, rows):
+        flag_idx = self.columns['churn_flag']
+        tenure_idx = self.columns.get('customer_tenure')
+        dims = [(name, self.columns.get(name)) for name in BREAKDOWN_COLUMNS]
+
+        for row in rows:
+            if len(row) <= flag_idx:
+                continue
+            try:
+                flag = float(row[flag_idx])
+            except ValueError:
+                continue
+            if flag != flag:
+                continue
+
+            self.total += 1
+            self.churned += flag
+
+            for name, idx in dims:
+                value = row[idx] if idx is not None and idx < len(row) else 'unknown'
+                counts = self.groups[name].setdefault(value, [0, 0.0])
+                counts[0] += 1
+                counts[1] += flag
+
+            bucket = tenure_bucket(row[tenure_idx]) if tenure_idx is not None else 'unknown'
+            counts = self.groups['tenure_bucket'].setdefault(bucket, [0, 0.0])
+            counts[0] += 1
+            counts[1] += flag
+
+    def _build_snapshot(self):
+        breakdown = {}
+        for name, values in self.groups.items():
+            breakdown[name] = {
+                value: {
+                    "customers": n,
+                    "churned": int(churned),
+                    "churn_rate": round(churned / n * 100, 2) if n else 0.0
+                }
+                for value, (n, churned) in sorted(values.items())
+            }
+        return {
+            "total": self.total,
+            "churned": self.churned,
+            "breakdown": breakdown
+        }
+
+    def get(self):
+        # Fast path: one stat() and a tuple compare
+        snapshot = self.snapshot
+        if snapshot is not None and self.tail.stat_key()[0] == self.tail.key:
+            return snapshot
+
+        with self.lock:
+            if self.tail.refresh(self._reset, self._add_rows) or self.snapshot is None:
+                self.snapshot = self._build_snapshot()
+            return self.snapshot
@@ -0,0 +1,183 @@
+import io
+import threading
+
+import numpy as np
+import pandas as pd
+
+from churn_aggregates import TENURE_BUCKETS, TENURE_OVERFLOW, CsvTail
+
+# Churn segment cube for /metrics/segments: customers, churned and total_spent
+# summed per cell of a dense ndarray over every combination of the dimensions
+# below. Rows are parsed by pandas and grouped with vectorized codes +
+# np.bincount, one block of CSV lines at a time. Queries slice the cube along
+# the filtered axes and sum out the ones not grouped by, so a query never
+# touches the rows.
+#
+# The cube follows churndata.csv through CsvTail like ChurnAggregateCache:
+# appended rows are binned into the existing cube, any other change rebuilds
+# it. Categorical values seen for the first time grow their axis.
+
+CATEGORY_DIMENSIONS = ['account_status', 'payment_frequency', 'discount_or_offer_received']
+
+# average_monthly_usage, (upper bound, label) like TENURE_BUCKETS
+USAGE_BUCKETS = [(100, '0-100'), (200, '101-200'), (300, '201-300'), (400, '301-400'), (500, '401-500')]
+USAGE_OVERFLOW = '500+'
+
+# Bucketed dimensions: name -> (source column, buckets, overflow label)
+BUCKET_DIMENSIONS = {
+    'tenure_bucket': ('customer_tenure', TENURE_BUCKETS, TENURE_OVERFLOW),
+    'usage_bucket': ('average_monthly_usage', USAGE_BUCKETS, USAGE_OVERFLOW)
+}
+
+DIMENSIONS = CATEGORY_DIMENSIONS + list(BUCKET_DIMENSIONS)
+
+# Last axis of the cube
+MEASURES = ['customers', 'churned', 'spent', 'spent_customers']
+
+READ_COLUMNS = ['churn_flag', 'total_spent'] + CATEGORY_DIMENSIONS + [c for c, _, _ in BUCKET_DIMENSIONS.values()]
+
+
+def bucket_labels(buckets, overflow):
+    return [label for _, label in buckets] + [overflow, 'unknown']
+
+
+def bucket_codes(values, buckets):
+    # Index into bucket_labels(): first bucket whose upper bound is >= value, 'unknown' for NaN
+    values = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+    upper = np.array([bound for bound, _ in buckets], dtype=np.float64)
+    codes = np.searchsorted(upper, values, side='left')
+    codes[np.isnan(values)] = len(buckets) + 1
+    return codes
+
+
+class CubeSnapshot:
+    # Immutable view of the cube: labels per dimension and the (dims..., measures) array
+
+    def __init__(self, labels, cells):
+        self.labels = labels
+        self.cells = cells
+        self.index = {name: {label: i for i, label in enumerate(values)} for name, values in labels.items()}
+
+    def query(self, filters=None, group_by=()):
+        # filters: dimension -> list of labels (unknown labels match nothing)
+        filters = filters or {}
+        for name in list(filters) + list(group_by):
+            if name not in self.labels:
+                raise KeyError(name)
+        if len(set(group_by)) != len(group_by):
+            raise ValueError("group_by lists a dimension twice")
+
+        cells = self.cells
+        picked = {}
+        for axis, name in enumerate(DIMENSIONS):
+            if name in filters:
+                picked[name] = [label for label in dict.fromkeys(filters[name]) if label in self.index[name]]
+                codes = np.array([self.index[name][label] for label in picked[name]], dtype=np.intp)
+                cells = np.take(cells, codes, axis=axis)
+        grouped = [DIMENSIONS.index(name) for name in group_by]
+        cells = cells.sum(axis=tuple(axis for axis in range(len(DIMENSIONS)) if axis not in grouped))
+        # Remaining axes are in DIMENSIONS order; put them in group_by order
+        cells = np.moveaxis(cells, np.argsort(np.argsort(grouped)).tolist(), list(range(len(grouped))))
+
+        segments = []
+        if group_by:
+            labels = [picked.get(name, self.labels[name]) for name in group_by]
+            for position in zip(*np.nonzero(cells[..., 0])):
+                segment = {name: labels[i][p] for i, (name, p) in enumerate(zip(group_by, position))}
+                segment.update(summarize(cells[position]))
+                segments.append(segment)
+        total = cells.reshape(-1, len(MEASURES)).sum(axis=0)
+        return {"total": summarize(total), "segments": segments}
+
+
+def summarize(measures):
+    customers, churned, spent, spent_customers = (float(m) for m in measures)
+    return {
+        "customers": int(customers),
+        "churned": int(churned),
+        "churn_rate": round(churned / customers * 100, 2) if customers else 0.0,
+        "mean_total_spent": round(spent / spent_customers, 2) if spent_customers else None
+    }
+
+
+class ChurnSegmentCube:
+    def __init__(self, path):
+        self.tail = CsvTail(path)
+        self.lock = threading.Lock()
+        self.snapshot = None
+
+    def _reset(self, header):
+        if 'churn_flag' not in header:
+            raise ValueError(f"{self.tail.path} has no churn_flag column")
+        self.header = header
+        self.labels = {name: [] for name in CATEGORY_DIMENSIONS}
+        self.labels.update({name: bucket_labels(buckets, overflow)
+                            for name, (_, buckets, overflow) in BUCKET_DIMENSIONS.items()})
+        self.cells = np.zeros([len(self.labels[name]) for name in DIMENSIONS] + [len(MEASURES)])
+
+    def _add_blocks(self, blocks):
+        # Each block (complete CSV lines, READ_BLOCK bytes at most) is parsed by pandas; rows with
+        # more fields than the header are skipped, missing trailing fields read as NaN
+        usecols = [name for name in READ_COLUMNS if name in self.header]
+        dtype = {name: str for name in CATEGORY_DIMENSIONS}
+        for block in blocks:
+            df = pd.read_csv(io.BytesIO(block), header=None, names=self.header, usecols=usecols,
+                             dtype=dtype, on_bad_lines='skip')
+            self._add_frame(df)
+
+    def _category_codes(self, name, values):
+        # Codes into self.labels[name]; new values are appended and the cube axis grows
+        codes, uniques = pd.factorize(values.fillna('unknown'))
+        known = self.labels[name]
+        new = [value for value in uniques if value not in known]
+        if new:
+            known.extend(new)
+            pad = [(0, 0)] * self.cells.ndim
+            pad[DIMENSIONS.index(name)] = (0, len(new))
+            self.cells = np.pad(self.cells, pad)
+        return pd.Index(known).get_indexer(uniques)[codes]
+
+    def _add_frame(self, df):
+        flag = pd.to_numeric(df['churn_flag'], errors='coerce')
+        valid = flag.notna().to_numpy()
+        df, flag = df[valid], flag.to_numpy(dtype=np.float64)[valid]
+        if not len(df):
+            return
+
+        missing = pd.Series(np.nan, index=df.index)
+        codes = [self._category_codes(name, df.get(name, missing)) for name in CATEGORY_DIMENSIONS]
+        codes += [bucket_codes(df.get(column, missing), buckets)
+                  for column, buckets, _ in BUCKET_DIMENSIONS.values()]
+        spent = pd.to_numeric(df.get('total_spent', missing), errors='coerce').to_numpy(dtype=np.float64)
+        has_spent = ~np.isnan(spent)
+
+        # One flat bincount per measure over the raveled cell index
+        shape = self.cells.shape[:-1]
+        size = int(np.prod(shape))
+        cell = np.ravel_multi_index(codes, shape)
+        flat = self.cells.reshape(size, len(MEASURES))
+        flat[:, 0] += np.bincount(cell, minlength=size)
+        flat[:, 1] += np.bincount(cell, weights=flag, minlength=size)
+        flat[:, 2] += np.bincount(cell[has_spent], weights=spent[has_spent], minlength=size)
+        flat[:, 3] += np.bincount(cell[has_spent], minlength=size)
+
+    def _build_snapshot(self):
+        # Copy with categorical axes in sorted label order (bucket axes are ordered already)
+        labels = {name: list(values) for name, values in self.labels.items()}
+        cells = self.cells
+        for name in CATEGORY_DIMENSIONS:
+            order = sorted(range(len(labels[name])), key=lambda i: str(labels[name][i]))
+            labels[name] = [labels[name][i] for i in order]
+            cells = np.take(cells, np.array(order, dtype=np.intp), axis=DIMENSIONS.index(name))
+        return CubeSnapshot(labels, cells)
+
+    def get(self):
+        # Same fast path as ChurnAggregateCache.get()
+        snapshot = self.snapshot
+        if snapshot is not None and self.tail.stat_key()[0] == self.tail.key:
+            return snapshot
+
+        with self.lock:
+            if self.tail.refresh(self._reset, self._add_blocks, blocks=True) or self.snapshot is None:
+                self.snapshot = self._build_snapshot()
+            return self.snapshot
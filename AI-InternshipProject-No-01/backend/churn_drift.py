@@ -0,0 +1,192 @@
+import functools
+import hashlib
+import json
+from bisect import bisect_right
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import WorkerCounters
+
+# Streaming input-drift sketches for /predict-churn, in constant memory.
+#
+# The baseline is computed once from the training data (churndata.csv):
+#   numeric features   BINS quantile bins (edges at the training deciles, the
+#                      outer bins open-ended) with the training count per bin
+#   account_status     training count per category
+# Every scored request then adds one count per feature:
+#   numeric features   a bisect on the fixed edges, one counter per bin
+#   account_status     a count-min sketch (DEPTH x WIDTH counters, one blake2b
+#                      hash per distinct value, cached), so unexpected status
+#                      strings cannot grow memory
+# All counters live in one flat list per thread, updated without a lock and
+# handed to the next thread when one exits; like the latency histograms this is a
+# WorkerCounters (instrumentation.py), so memory follows the peak concurrency and,
+# under serve.py, every worker dumps its counters to API_METRICS_DIR/drift/ for
+# GET /metrics/drift to merge. Dumps made against another baseline are ignored.
+#
+# Scores per feature, training vs traffic since the server started:
+#   psi   population stability index over the baseline bins (or categories plus
+#         "other" for account_status), proportions floored at EPS
+#   ks    numeric features: largest gap between the cumulative bin proportions,
+#         i.e. Kolmogorov-Smirnov at the bin edges (a lower bound of the exact statistic)
+
+BINS = 10
+WIDTH = 512
+DEPTH = 4
+EPS = 1e-4
+CATEGORICAL = 'account_status'
+OTHER = 'other'
+FLUSH_INTERVAL = 5.0
+MIN_OBSERVATIONS = 100
+# Usual PSI reading: below 0.1 stable, 0.1-0.25 moderate shift, above 0.25 significant
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+
+@functools.lru_cache(maxsize=1024)
+def sketch_slots(value):
+    # Count-min counter index (offset from the sketch start) for each of the DEPTH rows
+    digest = hashlib.blake2b(value.encode(), digest_size=4 * DEPTH).digest()
+    return tuple(d * WIDTH + int.from_bytes(digest[4 * d:4 * d + 4], 'little') % WIDTH for d in range(DEPTH))
+
+
+def psi(expected, actual):
+    e = np.maximum(expected / max(expected.sum(), 1), EPS)
+    a = np.maximum(actual / max(actual.sum(), 1), EPS)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def binned_ks(expected, actual):
+    e = np.cumsum(expected) / max(expected.sum(), 1)
+    a = np.cumsum(actual) / max(actual.sum(), 1)
+    return float(np.abs(a - e).max())
+
+
+def drift_level(score, observations):
+    if observations < MIN_OBSERVATIONS:
+        return "insufficient data"
+    if score >= PSI_SIGNIFICANT:
+        return "significant"
+    if score >= PSI_MODERATE:
+        return "moderate"
+    return "stable"
+
+
+class DriftBaseline:
+    # Bin edges and training counts; fixes the layout of the flat counter list
+    def __init__(self, features, edges, counts, categories, category_counts, rows, source=None):
+        self.features = list(features)
+        self.numeric = [f for f in self.features if f != CATEGORICAL]
+        self.index = [self.features.index(f) for f in self.numeric]
+        self.status_index = self.features.index(CATEGORICAL) if CATEGORICAL in self.features else None
+        self.edges = [list(map(float, e)) for e in edges]
+        self.counts = [np.asarray(c, dtype=np.int64) for c in counts]
+        self.categories = list(categories)
+        self.category_counts = np.asarray(category_counts, dtype=np.int64)
+        self.rows = rows
+        self.source = source
+
+        self.offsets = list(np.cumsum([0] + [len(e) + 1 for e in self.edges]).tolist())
+        self.bins = list(zip(self.index, self.edges, self.offsets))
+        self.sketch_offset = self.offsets[-1]
+        self.size = self.sketch_offset + WIDTH * DEPTH
+
+        digest = hashlib.sha256(json.dumps([self.features, self.edges, self.categories]).encode())
+        for c in self.counts + [self.category_counts]:
+            digest.update(c.tobytes())
+        self.version = digest.hexdigest()[:12]
+
+    @classmethod
+    def from_csv(cls, path, features):
+        df = pd.read_csv(path, usecols=features)
+        edges, counts = [], []
+        for feature in (f for f in features if f != CATEGORICAL):
+            column = pd.to_numeric(df[feature], errors='coerce').dropna().to_numpy(dtype=np.float64)
+            e = np.unique(np.quantile(column, np.linspace(0, 1, BINS + 1)[1:-1]))
+            edges.append(e)
+            counts.append(np.bincount(np.searchsorted(e, column, side='right'), minlength=len(e) + 1))
+        categories, category_counts = [], []
+        if CATEGORICAL in features:
+            status = df[CATEGORICAL].dropna().astype(str).value_counts().sort_index()
+            categories, category_counts = status.index.tolist(), status.to_numpy()
+        return cls(features, edges, counts, categories, category_counts, len(df), source=path)
+
+
+class DriftSketch(WorkerCounters):
+    def __init__(self, baseline, status_codes=None, state_dir=None):
+        # Last slot of a store counts observations
+        super().__init__(lambda: [0] * (baseline.size + 1), state_dir)
+        self.baseline = baseline
+        # Requests may send account_status as its numeric code
+        self.status_names = {code: name for name, code in (status_codes or {}).items()}
+
+    def observe(self, values):
+        # One request's feature values in baseline feature order
+        store = getattr(self.local, 'store', None)
+        if store is None:
+            store = self._store()
+        base = self.baseline
+        for i, edges, offset in base.bins:
+            store[offset + bisect_right(edges, values[i])] += 1
+        if base.status_index is not None:
+            status = values[base.status_index]
+            if not isinstance(status, str):
+                status = str(self.status_names.get(status, status))
+            offset = base.sketch_offset
+            for slot in sketch_slots(status):
+                store[offset + slot] += 1
+        store[-1] += 1
+
+    def snapshot(self):
+        merged = np.zeros(self.baseline.size + 1, dtype=np.int64)
+        for store in self.threads.all():
+            merged += store
+        return merged
+
+    def dump(self, snapshot):
+        return {"baseline": self.baseline.version, "counts": snapshot.tolist()}
+
+    def merge(self, merged, data):
+        if data.get('baseline') == self.baseline.version and len(data['counts']) == len(merged):
+            merged += np.asarray(data['counts'], dtype=np.int64)
+
+    # ---------- drift scores ----------
+
+    def report(self):
+        base = self.baseline
+        counts = self.collect()
+        observations = int(counts[-1])
+        features = {}
+        for feature, expected, offset, end in zip(base.numeric, base.counts, base.offsets, base.offsets[1:]):
+            actual = counts[offset:end]
+            score = psi(expected, actual)
+            features[feature] = {"psi": round(score, 4), "ks": round(binned_ks(expected, actual), 4),
+                                 "drift": drift_level(score, observations)}
+            if not observations:
+                features[feature].update(psi=None, ks=None)
+
+        if base.status_index is not None:
+            # Count-min estimates for the training categories; the remainder is "other"
+            sketch = counts[base.sketch_offset:base.sketch_offset + WIDTH * DEPTH]
+            seen = np.array([sketch[list(sketch_slots(c))].min() for c in base.categories], dtype=np.int64)
+            seen = np.minimum(seen, observations)
+            actual = np.append(seen, max(observations - int(seen.sum()), 0))
+            expected = np.append(base.category_counts, 0)
+            score = psi(expected, actual)
+            features[CATEGORICAL] = {
+                "psi": round(score, 4) if observations else None,
+                "drift": drift_level(score, observations),
+                "share": {c: round(float(n) / observations, 4) if observations else 0.0
+                          for c, n in zip(base.categories + [OTHER], actual)},
+                "baseline_share": {c: round(float(n) / base.rows, 4)
+                                   for c, n in zip(base.categories + [OTHER], expected)}
+            }
+
+        scores = [f["psi"] for f in features.values() if f["psi"] is not None]
+        return {
+            "baseline": {"source": base.source, "rows": base.rows, "bins": BINS, "version": base.version},
+            "observations": observations,
+            "max_psi": max(scores) if scores else None,
+            "features": features
+        }
@@ -0,0 +1,89 @@
+import json
+import numpy as np
+import pandas as pd
+
+# Fused scoring kernel for the churn LogisticRegression + StandardScaler pair.
+# The scaler is folded into the coefficients once at load time:
+#   z = coef . (x - mean) / scale + intercept = (coef / scale) . x + (intercept - coef . mean / scale)
+# so scoring a customer is one dot product plus a sigmoid, no DataFrame or sklearn validation.
+
+
+def load_feature_spec(path, default_features, default_codes):
+    # Field order + account_status codes written by churn-model.py next to churn_model.pkl
+    try:
+        with open(path) as f:
+            spec = json.load(f)
+        return list(spec['features']), dict(spec['account_status_codes'])
+    except FileNotFoundError:
+        return list(default_features), dict(default_codes)
+
+
+def status_code(status_codes, status):
+    # account_status as its numeric code; the name or the code itself, anything else is rejected
+    if isinstance(status, str):
+        if status in status_codes:
+            return status_codes[status]
+    elif status in status_codes.values():
+        return status
+    raise ValueError(f"Unknown account_status: {status}")
+
+
+def status_column(status_codes, statuses):
+    # status_code() for a whole column (batch endpoints, RPC, churn_rescore.py): float64 codes,
+    # NaN where the status is unknown so the row is marked invalid. Numeric strings such as
+    # CSV cells count as codes, but only the known ones
+    statuses = pd.Series(statuses, copy=False)
+    names = statuses.map(lambda v: status_codes.get(v) if isinstance(v, str) else None)
+    codes = pd.to_numeric(statuses, errors='coerce')
+    codes = codes.where(codes.isin(list(status_codes.values())))
+    return names.astype('float64').fillna(codes).to_numpy(dtype=np.float64)
+
+
+def save_feature_spec(path, features, status_codes):
+    with open(path, 'w') as f:
+        json.dump({"features": list(features), "account_status_codes": status_codes}, f, indent=2)
+
+
+class ChurnKernel:
+    def __init__(self, weights, bias, features, status_codes):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.features = list(features)
+        self.status_codes = dict(status_codes)
+        self.status_index = self.features.index('account_status')
+
+    @classmethod
+    def from_sklearn(cls, model, scaler, features, status_codes):
+        coef = np.asarray(model.coef_, dtype=np.float64).ravel()
+        intercept = float(np.asarray(model.intercept_).ravel()[0])
+        mean = scaler.mean_ if getattr(scaler, 'mean_', None) is not None else np.zeros_like(coef)
+        scale = scaler.scale_ if getattr(scaler, 'scale_', None) is not None else np.ones_like(coef)
+
+        weights = coef / scale
+        bias = intercept - np.dot(coef, mean / scale)
+        return cls(weights, bias, features, status_codes)
+
+    def encode(self, record):
+        # Single record (dict) -> float64 vector in the fixed field order
+        return self.encode_values([record[field] for field in self.features])
+
+    def encode_values(self, values):
+        # Values already in the fixed field order (e.g. a decoded request struct)
+        values = list(values)
+        values[self.status_index] = status_code(self.status_codes, values[self.status_index])
+        return np.array([float(value) for value in values], dtype=np.float64)
+
+    def margin(self, X):
+        return X @ self.weights + self.bias
+
+    def predict_proba(self, X):
+        # Numerically stable sigmoid: 1 / (1 + exp(-z))
+        return np.exp(-np.logaddexp(0.0, -self.margin(X)))
+
+    def score(self, x):
+        return float(self.predict_proba(x))
+
+    def max_parity_error(self, model, scaler, X):
+        # sklearn stays the reference path; compare churn probabilities on X
+        reference = model.predict_proba(scaler.transform(X))[:, 1]
+        return float(np.max(np.abs(reference - self.predict_proba(np.asarray(X, dtype=np.float64)))))
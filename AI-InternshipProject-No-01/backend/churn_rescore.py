@@ -0,0 +1,264 @@
+import argparse
+import collections
+import csv
+import datetime
+import io
+import logging
+import multiprocessing
+import os
+import pickle
+import shutil
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from churn_kernel import ChurnKernel, load_feature_spec, status_column
+from product_lookup import file_digest
+
+# Offline rescoring of the whole customer base with churn_model.pkl, for CRM.
+#
+# The input CSV is cut into newline-aligned byte ranges; each range is parsed
+# and scored in a spawn process pool (model, scaler and the folded ChurnKernel
+# are sent once per worker) and written straight from the worker as one part
+# file per churn zone:
+#
+#   <output>/churn_zone=<zone>/score_date=<YYYY-MM-DD>/part-<chunk>.parquet
+#
+# Parts are written to a staging folder first; once every chunk succeeded each
+# zone's score_date partition replaces the previous run of the same date, so a
+# failed run leaves the last good output in place. Rows with missing or unknown
+# feature values are counted and logged, not written. Byte ranges assume no
+# quoted newlines in the file, which holds for churndata.csv.
+#
+#   python churn_rescore.py --input churndata.csv --output churn_scores --processes 8
+#   python churn_rescore.py --format csv     # without pyarrow
+
+# Fallback field order and account_status codes, same as app.py
+CHURN_FEATURES = [
+    'customer_tenure', 'number_of_services_or_products', 'average_monthly_usage',
+    'days_since_last_interaction', 'complaints_resolved_ratio', 'total_spent',
+    'average_transaction_value', 'discount_or_offer_received', 'account_status'
+]
+ACCOUNT_STATUS_CODES = {'Active': 0, 'Closed': 1, 'Suspended': 2}
+
+# Same cut points as churn_zone() in app.py: percentage <= 25 is green, and so on
+ZONE_BOUNDS = [25, 50, 75]
+ZONE_NAMES = ['green', 'blue', 'orange', 'red']
+
+KERNEL_PARITY = 1e-9
+
+_scorer = None  # per worker process, set by init_worker
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rescore every customer with the churn model")
+    parser.add_argument('--input', default='churndata.csv', help="Customer table (CSV with a customer_id column)")
+    parser.add_argument('--output', default='churn_scores')
+    parser.add_argument('--model', default='churn_model.pkl', help="Pickled (model, scaler)")
+    parser.add_argument('--features', default='churn_features.json')
+    parser.add_argument('--date', default=datetime.date.today().isoformat(), help="score_date partition")
+    parser.add_argument('--chunk-mb', type=float, default=32.0, help="Input bytes per chunk")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet')
+    return parser.parse_args()
+
+
+# ---------- scoring (worker side) ----------
+
+class Scorer:
+    def __init__(self, model, scaler, kernel, features, status_codes, version):
+        self.model = model
+        self.scaler = scaler
+        self.kernel = kernel
+        self.features = features
+        self.status_codes = status_codes
+        self.version = version
+
+    def matrix(self, df):
+        # Same encoding as churn_batch_matrix() in app.py: unknown statuses leave the row unscored
+        frame = df[self.features].copy()
+        frame['account_status'] = status_column(self.status_codes, df['account_status'])
+        frame = frame.apply(pd.to_numeric, errors='coerce').astype('float64').to_numpy()
+        return frame, np.isfinite(frame).all(axis=1)
+
+    def predict_proba(self, X):
+        if self.kernel is not None:
+            return self.kernel.predict_proba(X)
+        return self.model.predict_proba(self.scaler.transform(pd.DataFrame(X, columns=self.features)))[:, 1]
+
+
+def init_worker(scorer):
+    global _scorer
+    _scorer = scorer
+
+
+def score_range(path, header, start, end, chunk_no, staging, score_date, fmt):
+    # Worker entry point: parse, score and write one byte range; returns (rows, scored, rows per zone)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    usecols = ['customer_id'] + _scorer.features
+    df = pd.read_csv(io.BytesIO(data), header=None, names=header, usecols=usecols,
+                     dtype={'customer_id': str, 'account_status': str})
+
+    X, valid = _scorer.matrix(df)
+    proba = _scorer.predict_proba(X[valid])
+    zones = np.searchsorted(ZONE_BOUNDS, proba * 100, side='left')
+    scored = pd.DataFrame({
+        'customer_id': df['customer_id'].to_numpy()[valid],
+        'churn_probability': proba,
+        'churn_prediction': proba > 0.5,
+        'model_version': _scorer.version
+    })
+
+    counts = np.bincount(zones, minlength=len(ZONE_NAMES))
+    for zone, name in enumerate(ZONE_NAMES):
+        if not counts[zone]:
+            continue
+        folder = os.path.join(staging, f'churn_zone={name}', f'score_date={score_date}')
+        os.makedirs(folder, exist_ok=True)
+        part = scored[zones == zone]
+        if fmt == 'parquet':
+            part.to_parquet(os.path.join(folder, f'part-{chunk_no:05d}.parquet'), index=False)
+        else:
+            part.to_csv(os.path.join(folder, f'part-{chunk_no:05d}.csv'), index=False)
+    return len(df), int(valid.sum()), counts.tolist()
+
+
+# ---------- driver ----------
+
+def load_scorer(model_path, features_path, probe):
+    with open(model_path, 'rb') as f:
+        model, scaler = pickle.load(f)
+    features, status_codes = load_feature_spec(features_path, CHURN_FEATURES, ACCOUNT_STATUS_CODES)
+    version = f"pickle-{file_digest(model_path)[:12]}"
+    scorer = Scorer(model, scaler, None, features, status_codes, version)
+
+    # Score with the folded kernel only if it matches sklearn on the first rows of the input
+    kernel = ChurnKernel.from_sklearn(model, scaler, features, status_codes)
+    X, valid = scorer.matrix(probe)
+    parity = kernel.max_parity_error(model, scaler, pd.DataFrame(X[valid], columns=features)) if valid.any() else 0.0
+    if parity <= KERNEL_PARITY:
+        scorer.kernel = kernel
+        logging.info(f"✅ Churn model {version} loaded, scoring kernel parity {parity:.2e}")
+    else:
+        logging.warning(f"⚠️ Churn kernel parity {parity:.2e} > {KERNEL_PARITY}, scoring with sklearn")
+    return scorer
+
+
+def plan_chunks(path, chunk_bytes):
+    # (header, [(start, end)]) with every range ending on a newline
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header_line = f.readline()
+        header = next(csv.reader([header_line.decode('utf-8-sig')]))
+        ranges = []
+        start = len(header_line)
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return header, ranges
+
+
+def publish(staging, output, score_date):
+    # Swap each zone's score_date partition in; older dates are left alone
+    for zone_dir in sorted(os.listdir(staging)):
+        staged = os.path.join(staging, zone_dir, f'score_date={score_date}')
+        target = os.path.join(output, zone_dir, f'score_date={score_date}')
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(target):
+            retired = f"{target}.old-{uuid.uuid4().hex}"
+            os.replace(target, retired)
+            shutil.rmtree(retired, ignore_errors=True)
+        os.replace(staged, target)
+    # A zone left empty by this run must not keep an earlier run's scores for the same date
+    for zone_dir in os.listdir(output):
+        stale = os.path.join(output, zone_dir, f'score_date={score_date}')
+        if zone_dir.startswith('churn_zone=') and not os.path.exists(os.path.join(staging, zone_dir)) \
+                and os.path.isdir(stale):
+            shutil.rmtree(stale, ignore_errors=True)
+
+
+def rescore(args):
+    header, ranges = plan_chunks(args.input, int(args.chunk_mb * 1024 * 1024))
+    missing = {'customer_id', 'account_status'} - set(header)
+    if missing:
+        sys.exit(f"{args.input} is missing columns: {sorted(missing)}")
+    scorer = load_scorer(args.model, args.features, pd.read_csv(args.input, nrows=1000))
+    absent = set(scorer.features) - set(header)
+    if absent:
+        sys.exit(f"{args.input} is missing model features: {sorted(absent)}")
+
+    os.makedirs(args.output, exist_ok=True)
+    staging = os.path.join(args.output, f'.staging-{args.date}-{uuid.uuid4().hex[:8]}')
+    total_bytes = os.path.getsize(args.input)
+    logging.info(f"🚀 Rescoring {args.input} ({total_bytes / 1e6:,.0f} MB, {len(ranges)} chunks) "
+                 f"on {args.processes} processes for {args.date}")
+
+    rows = scored = done_bytes = 0
+    zones = np.zeros(len(ZONE_NAMES), dtype=np.int64)
+    started = time.perf_counter()
+    pending = collections.deque()
+    try:
+        with ProcessPoolExecutor(max_workers=args.processes, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=init_worker, initargs=(scorer,)) as pool:
+            chunks = iter(enumerate(ranges))
+            while True:
+                # At most two chunks per process in flight, results consumed in order
+                for chunk_no, (start, end) in chunks:
+                    pending.append((end - start, pool.submit(score_range, args.input, header, start, end,
+                                                             chunk_no, staging, args.date, args.format)))
+                    if len(pending) >= 2 * args.processes:
+                        break
+                if not pending:
+                    break
+                size, future = pending.popleft()
+                n, ok, counts = future.result()
+                rows += n
+                scored += ok
+                done_bytes += size
+                zones += counts
+                seconds = time.perf_counter() - started
+                logging.info(f"⏳ {done_bytes / total_bytes * 100:5.1f}% | {rows:,} rows | "
+                             f"{rows / seconds:,.0f} rows/s")
+        if scored:
+            publish(staging, args.output, args.date)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    seconds = time.perf_counter() - started
+    logging.info(f"✅ {scored:,} of {rows:,} customers scored in {seconds:.1f}s "
+                 f"({rows / seconds:,.0f} rows/s) -> {args.output}")
+    if rows > scored:
+        logging.warning(f"⚠️ {rows - scored:,} rows skipped: missing or unknown feature values")
+    for name, count in zip(ZONE_NAMES, zones):
+        logging.info(f"   {name:>6}: {count:>12,} ({count / max(scored, 1) * 100:5.1f}%)")
+    return zones
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    args = parse_args()
+    if args.chunk_mb <= 0 or args.processes < 1:
+        sys.exit("--chunk-mb and --processes must be positive")
+    try:
+        datetime.date.fromisoformat(args.date)
+    except ValueError:
+        sys.exit(f"--date must be YYYY-MM-DD, got {args.date!r}")
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            sys.exit("--format parquet needs pyarrow (pip install -r req.txt), or use --format csv")
+    rescore(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Content-addressed cache for /predict-file forecasts.
+# Entries live in <root>/<sha256 of normalized CSV>/ with the forecast JSON and the
+# trained XGBoost model (native JSON format, given as a model or raw booster bytes). Recency is tracked with the entry's
+# mtime so the LRU order survives restarts; eviction is by entry count and total bytes.
+
+RESULT_FILE = 'result.json'
+MODEL_FILE = 'model.json'
+
+
+class CsvDigest:
+    # sha256 over normalized CSV lines: no BOM, no \r, no trailing whitespace, no blank lines.
+    # Accepts the upload in arbitrary chunks so it can be fed while streaming.
+
+    def __init__(self):
+        self.hash = hashlib.sha256()
+        self.pending = b''
+        self.started = False
+
+    def update(self, chunk):
+        data = self.pending + chunk
+        if not self.started:
+            if len(data) < 3 and b'\n' not in data:
+                self.pending = data
+                return
+            if data.startswith(b'\xef\xbb\xbf'):
+                data = data[3:]
+            self.started = True
+        lines = data.split(b'\n')
+        self.pending = lines.pop()
+        for line in lines:
+            self._add_line(line)
+
+    def _add_line(self, line):
+        line = line.rstrip()
+        if line:
+            self.hash.update(line + b'\n')
+
+    def hexdigest(self):
+        if self.pending:
+            if not self.started and self.pending.startswith(b'\xef\xbb\xbf'):
+                self.pending = self.pending[3:]
+            self._add_line(self.pending)
+            self.pending = b''
+        return self.hash.hexdigest()
+
+
+def csv_digest(raw):
+    digest = CsvDigest()
+    digest.update(raw)
+    return digest.hexdigest()
+
+
+class ForecastCache:
+    def __init__(self, root, max_entries=64, max_bytes=256 * 1024 * 1024):
+        self.root = root
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> size in bytes, least recently used first
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def _entry_size(self, key):
+        folder = self._entry_dir(key)
+        return sum(os.path.getsize(os.path.join(folder, name)) for name in os.listdir(folder))
+
+    def _load_index(self):
+        found = []
+        for key in os.listdir(self.root):
+            result = os.path.join(self._entry_dir(key), RESULT_FILE)
+            if os.path.isfile(result):
+                found.append((os.path.getmtime(result), key))
+            else:
+                # Half-written temp folder or foreign entry
+                shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+        for _, key in sorted(found):
+            self.entries[key] = self._entry_size(key)
+        self._evict()
+
+    @property
+    def total_bytes(self):
+        return sum(self.entries.values())
+
+    def get(self, key):
+        path = os.path.join(self._entry_dir(key), RESULT_FILE)
+        with self.lock:
+            if key not in self.entries:
+                # Possibly written by another worker process sharing the folder
+                if not os.path.isfile(path):
+                    return None
+                self.entries[key] = self._entry_size(key)
+            self.entries.move_to_end(key)
+        try:
+            with open(path) as f:
+                result = json.load(f)
+            now = time.time()
+            os.utime(path, (now, now))
+            return result
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠️ Dropping unreadable forecast cache entry {key}: {e}")
+            with self.lock:
+                self.entries.pop(key, None)
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            return None
+
+    def model_path(self, key):
+        return os.path.join(self._entry_dir(key), MODEL_FILE)
+
+    def put(self, key, result, model=None):
+        # Write into a temp folder and rename so readers never see a partial entry
+        tmp = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp)
+        try:
+            if isinstance(model, (bytes, bytearray)):
+                with open(os.path.join(tmp, MODEL_FILE), 'wb') as f:
+                    f.write(model)
+            elif model is not None:
+                model.save_model(os.path.join(tmp, MODEL_FILE))
+            with open(os.path.join(tmp, RESULT_FILE), 'w') as f:
+                json.dump(result, f)
+            try:
+                os.rename(tmp, self._entry_dir(key))
+            except OSError:
+                # Another request cached the same upload first
+                shutil.rmtree(tmp, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        with self.lock:
+            self.entries[key] = self._entry_size(key)
+            self.entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        while self.entries and (len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes):
+            key, _ = self.entries.popitem(last=False)
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            logging.info(f"🧹 Evicted forecast cache entry {key}")
@@ -0,0 +1,155 @@
+import csv
+import io
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from forcast_cache import CsvDigest
+
+# Streaming ingest for /predict-file uploads.
+# The request body is read in fixed-size chunks: the header (and a typed sample
+# of the first rows) is validated on the first chunk so bad files fail before
+# the rest is read, the content hash for the forecast cache is computed on the
+# fly, and the bytes stay in memory only up to SPOOL_MEMORY_LIMIT before being
+# spilled to a file in the upload folder, which the forecast job removes once it
+# is done with it. Parsing uses explicit dtypes: category for the low-cardinality
+# text columns, parsed dates, and quantities read as float (so "3" and "3.0" both
+# parse) then narrowed to int32 when they are all whole numbers. Empty quantities
+# are rejected: XGBoost cannot train on a missing label.
+
+SALES_COLUMNS = ['Product_ID', 'Category', 'Gender', 'Region', 'Season', 'Date', 'Quantity_Sold']
+SALES_DTYPES = {
+    'Product_ID': 'category',
+    'Category': 'category',
+    'Gender': 'category',
+    'Region': 'category',
+    'Season': 'category',
+    'Quantity_Sold': 'float64'
+}
+INT32 = np.iinfo(np.int32)
+
+READ_CHUNK = 1024 * 1024
+SPOOL_MEMORY_LIMIT = 16 * 1024 * 1024
+MAX_HEADER_BYTES = 64 * 1024
+
+
+class IngestError(ValueError):
+    pass
+
+
+def read_sales_csv(source):
+    # pandas parses internally in blocks; category dtype keeps one copy of each label
+    try:
+        df = pd.read_csv(source, dtype=SALES_DTYPES, parse_dates=['Date'])
+        if not pd.api.types.is_datetime64_any_dtype(df['Date']):
+            # read_csv leaves unparseable dates as text; surface the actual error
+            df['Date'] = pd.to_datetime(df['Date'])
+    except (ValueError, TypeError) as e:
+        raise IngestError(f"Invalid sales data: {e}") from e
+
+    quantity = df['Quantity_Sold'].to_numpy()
+    if np.isnan(quantity).any():
+        raise IngestError("Invalid sales data: empty Quantity_Sold values")
+    if len(quantity) and (quantity % 1 == 0).all() and INT32.min <= quantity.min() and quantity.max() <= INT32.max:
+        df['Quantity_Sold'] = quantity.astype(np.int32)
+    return df
+
+
+def validate_sample(sample):
+    # Header + the complete rows of the first chunk, parsed with the real dtypes
+    header = sample.split(b'\n', 1)[0].decode('utf-8-sig').strip()
+    columns = next(csv.reader([header]), [])
+    missing = [col for col in SALES_COLUMNS if col not in columns]
+    if missing:
+        raise IngestError(f"Missing columns: {missing}")
+
+    complete = sample[:sample.rfind(b'\n') + 1] or sample
+    df = read_sales_csv(io.BytesIO(complete))
+    if df['Date'].isna().any():
+        raise IngestError("Invalid sales data: unparseable or empty Date values")
+
+
+class UploadSpool:
+    def __init__(self, folder, memory_limit=SPOOL_MEMORY_LIMIT):
+        self.folder = folder
+        self.memory_limit = memory_limit
+        self.buffer = io.BytesIO()
+        self.file = None
+        self.path = None
+        self.size = 0
+        self.digest = CsvDigest()
+        self.key = None
+
+    def write(self, chunk):
+        self.digest.update(chunk)
+        self.size += len(chunk)
+        if self.file is None and self.buffer.tell() + len(chunk) > self.memory_limit:
+            # Too big to keep in memory: continue on disk
+            fd, self.path = tempfile.mkstemp(prefix='.upload-', suffix='.csv', dir=self.folder)
+            self.file = os.fdopen(fd, 'wb')
+            self.file.write(self.buffer.getvalue())
+            self.buffer = None
+        if self.file is not None:
+            self.file.write(chunk)
+        else:
+            self.buffer.write(chunk)
+
+    def finish(self):
+        if self.file is not None:
+            self.file.close()
+        self.key = self.digest.hexdigest()
+        return self.key
+
+    @property
+    def in_memory(self):
+        return self.path is None
+
+    def source(self):
+        # Something read_sales_csv can take: the bytes if they never left memory,
+        # otherwise the spilled file. Its name is unique per upload, so concurrent
+        # uploads of the same content never share (or delete) each other's file
+        if self.in_memory:
+            return self.buffer.getvalue()
+        return self.path
+
+    def discard(self):
+        remove_spilled(self.path)
+        self.buffer = None
+
+
+def remove_spilled(source):
+    # Deletes a spilled upload; bytes sources and any other path are left alone
+    if isinstance(source, str) and os.path.basename(source).startswith('.upload-'):
+        try:
+            os.remove(source)
+        except OSError:
+            pass
+
+
+def spool_upload(stream, folder, memory_limit=SPOOL_MEMORY_LIMIT):
+    # Read the whole upload chunk by chunk; raises IngestError as soon as the first chunk is bad
+    spool = UploadSpool(folder, memory_limit)
+    first = b''
+    while b'\n' not in first and len(first) < MAX_HEADER_BYTES:
+        chunk = stream.read(READ_CHUNK)
+        if not chunk:
+            break
+        first += chunk
+    if not first.strip():
+        raise IngestError("Empty upload")
+
+    validate_sample(first)
+    spool.write(first)
+    try:
+        while True:
+            chunk = stream.read(READ_CHUNK)
+            if not chunk:
+                break
+            spool.write(chunk)
+        spool.finish()
+    except Exception:
+        spool.discard()
+        raise
+    return spool
@@ -0,0 +1,193 @@
+import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from forcast_ingest import read_sales_csv, remove_spilled
+from forcast_model import train_and_predict, train_incremental
+
+# Background training for /predict-file.
+# Fits run in a process pool (XGBoost and pandas hold the GIL in places), the
+# request thread only enqueues and returns a job id. The queue is bounded: once
+# max_pending jobs are queued or running, submit() refuses new work so the API
+# can answer 503 instead of piling up uploads.
+# With a state_dir, job status is also published as <state_dir>/<job id>.json so
+# any serve.py worker can answer GET /jobs/<id>, not only the one that queued it.
+# A job given a model_dir continues the booster stored there (train_incremental)
+# instead of fitting from scratch; aggregate=True fits on monthly cells (fit_aggregated).
+# A spilled upload handed over by path belongs to the queue from submit() on: it is
+# removed when its job finishes, or right away if the job is refused or deduplicated.
+
+
+class QueueFull(Exception):
+    pass
+
+
+def run_forecast_job(source, model_dir=None, aggregate=False):
+    # Runs in a worker process on the upload bytes or its path; returns the raw
+    # booster so the parent can cache it
+    df = read_sales_csv(io.BytesIO(source) if isinstance(source, bytes) else source)
+    if model_dir:
+        results, model = train_incremental(df, model_dir, return_model=True)
+    else:
+        results, model = train_and_predict(df, return_model=True, aggregate=aggregate)
+    return results, bytes(model.get_booster().save_raw('json'))
+
+
+class ForecastJobQueue:
+    def __init__(self, workers=2, max_pending=8, keep_finished=256, on_done=None, state_dir=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self.on_done = on_done
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.inflight = {}  # cache key -> job id, so identical uploads share one fit
+        self.pending = 0
+        self.executor = None
+        self.state_dir = state_dir
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+
+    def _executor(self):
+        # Created lazily so importing app.py does not start processes. 'spawn' because
+        # forking after XGBoost/OpenMP threads exist in the parent can deadlock the child.
+        # Spawn re-imports the main script (app.py as __mp_main__ under `python app.py`),
+        # so app.py keeps its startup work in create_app(), which that import skips.
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+    def submit(self, key, source, model_dir=None, aggregate=False):
+        with self.lock:
+            if key in self.inflight:
+                remove_spilled(source)
+                return self.inflight[key]
+            if self.pending >= self.max_pending:
+                remove_spilled(source)
+                raise QueueFull(f"{self.pending} forecast jobs already pending")
+            job_id = uuid.uuid4().hex
+            job = {
+                "job_id": job_id,
+                "cache_key": key,
+                "status": "queued",
+                "submitted_at": time.time(),
+                "finished_at": None,
+                "result": None,
+                "error": None
+            }
+            self.jobs[job_id] = job
+            self.inflight[key] = job_id
+            self.pending += 1
+
+        try:
+            try:
+                future = self._executor().submit(run_forecast_job, source, model_dir, aggregate)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM on a huge upload); start a fresh pool
+                logging.warning("⚠️ Forecast worker pool was broken, restarting it")
+                self.executor = None
+                future = self._executor().submit(run_forecast_job, source, model_dir, aggregate)
+        except Exception:
+            with self.lock:
+                self.jobs.pop(job_id, None)
+                self.inflight.pop(key, None)
+                self.pending -= 1
+            remove_spilled(source)
+            raise
+        job["future"] = future
+        self._publish(job)
+        future.add_done_callback(lambda f: self._finish(job, f, source))
+        return job_id
+
+    def _finish(self, job, future, source=None):
+        remove_spilled(source)
+        try:
+            results, model_raw = future.result()
+            if self.on_done is not None:
+                self.on_done(job["cache_key"], results, model_raw)
+            job["result"] = results
+            job["status"] = "done"
+        except Exception as e:
+            logging.error(f"❌ Forecast job {job['job_id']} failed: {e}")
+            job["error"] = str(e)
+            job["status"] = "failed"
+
+        job["finished_at"] = time.time()
+        self._publish(job)
+        with self.lock:
+            self.inflight.pop(job["cache_key"], None)
+            self.pending -= 1
+            self._trim()
+
+    def _trim(self):
+        finished = [j for j in self.jobs.values() if j["finished_at"] is not None]
+        if len(finished) > self.keep_finished:
+            finished.sort(key=lambda j: j["finished_at"])
+            for j in finished[:len(finished) - self.keep_finished]:
+                del self.jobs[j["job_id"]]
+                if self.state_dir:
+                    try:
+                        os.remove(self._state_path(j["job_id"]))
+                    except OSError:
+                        pass
+
+    def _state_path(self, job_id):
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    def _publish(self, job):
+        if not self.state_dir:
+            return
+        info = self._info(job)
+        tmp = self._state_path(job["job_id"]) + f".{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(info, f)
+            os.replace(tmp, self._state_path(job["job_id"]))
+        except OSError as e:
+            logging.warning(f"⚠️ Could not publish forecast job {job['job_id']}: {e}")
+
+    def _info(self, job):
+        status = job["status"]
+        future = job.get("future")
+        if status == "queued" and future is not None and future.running():
+            status = "running"
+
+        info = {
+            "job_id": job["job_id"],
+            "status": status,
+            "submitted_at": job["submitted_at"],
+            "finished_at": job["finished_at"]
+        }
+        if status == "done":
+            info["result"] = job["result"]
+        elif status == "failed":
+            info["error"] = job["error"]
+        return info
+
+    def status(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return self._info(job)
+
+        # Queued by another worker process
+        if self.state_dir and job_id.isalnum():
+            try:
+                with open(self._state_path(job_id)) as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        return None
+
+    def shutdown(self, wait=False):
+        # wait=True lets running fits finish (and publish) before the pool goes away
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+            self.executor = None
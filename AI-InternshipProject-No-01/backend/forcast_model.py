@@ -1,3 +1,10 @@
+import fcntl
+import json
+import os
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
 import pandas as pd
 import calendar
 from xgboost import XGBRegressor
@@ -5,108 +12,348 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import r2_score
 
-def train_and_predict(df):
+FORECAST_HORIZON = 3
+MONTH_NAMES = np.array(calendar.month_name, dtype=object)
+
+ENCODED_COLUMNS = ['Category', 'Gender', 'Region', 'Season']
+FEATURES = ['Category', 'Gender', 'Region', 'Season', 'Month', 'Year']
+MODEL_PARAMS = {'n_estimators': 100, 'max_depth': 3, 'learning_rate': 0.1}
+
+# Incremental mode (train_incremental): boosting rounds added per update, months
+# of recent history an update trains on besides the new rows, and the model size
+# at which the next update refits from scratch instead of growing further
+INCREMENTAL_ROUNDS = 20
+WINDOW_MONTHS = 3
+MAX_ROUNDS = 400
+STATE_FILE = 'state.json'
+
+def season_for_month(month):
+    # Get season for the forecast month (simple implementation)
+    if month in [12, 1, 2]:
+        return 'Winter'
+    elif month in [3, 4, 5]:
+        return 'Spring'
+    elif month in [6, 7, 8]:
+        return 'Summer'
+    return 'Autumn'
+
+def month_labels(months, years):
+    # "January 2024" style labels, built column-wise instead of per row
+    return MONTH_NAMES[np.asarray(months)] + ' ' + np.asarray(years).astype(str).astype(object)
+
+def first_combinations(X, label_encoders, cols):
+    # Same rows as X.drop_duplicates(subset=cols), via one mixed-radix code per row
+    combo = np.zeros(len(X), dtype=np.int64)
+    for col in cols:
+        combo = combo * len(label_encoders[col].classes_) + X[col].to_numpy()
+
+    # factorize numbers combinations in order of appearance, so a row is a first
+    # occurrence exactly when its id exceeds every id before it
+    ids, _ = pd.factorize(combo)
+    first = np.flatnonzero(np.diff(np.maximum.accumulate(ids), prepend=-1) > 0)
+    return X.iloc[first]
+
+def postprocess(df, X, model, label_encoders):
+    # Lookup arrays: code -> original label, one vectorized take instead of inverse_transform calls
+    names = {col: le.classes_.astype(str).astype(object) for col, le in label_encoders.items()}
+    quantity = df['Quantity_Sold'].to_numpy()
+
+    # 🔹 Step 4: Actual Monthly Sales for Chart 1 (bincount over a month index)
+    period = df['Year'].to_numpy() * 12 + df['Month'].to_numpy() - 1
+    start = int(period.min())
+    sold = np.bincount(period - start, weights=quantity)
+    seen = np.flatnonzero(np.bincount(period - start))
+    actual_monthly = pd.DataFrame({
+        'label': month_labels((seen + start) % 12 + 1, (seen + start) // 12),
+        'Quantity_Sold': sold[seen].astype(np.int64 if np.issubdtype(quantity.dtype, np.integer) else quantity.dtype)
+    })
+    actual_sales = actual_monthly.to_dict(orient='records')
+
+    # 🔹 Step 5: Forecast next months - all horizons stacked into one predict call
+    latest_date = df['Date'].max()
+    base = first_combinations(X, label_encoders, ['Category', 'Gender', 'Region', 'Season'])
+    n_base = len(base)
+
+    forecast_dates = [latest_date + pd.DateOffset(months=i) for i in range(1, FORECAST_HORIZON + 1)]
+    months = np.array([d.month for d in forecast_dates])
+    years = np.array([d.year for d in forecast_dates])
+    seasons = label_encoders['Season'].transform([season_for_month(m) for m in months])
+
+    stacked = pd.DataFrame({col: np.tile(base[col].to_numpy(), FORECAST_HORIZON) for col in base.columns})
+    stacked['Month'] = np.repeat(months, n_base)
+    stacked['Year'] = np.repeat(years, n_base)
+    stacked['Season'] = np.repeat(seasons, n_base)
+    stacked = stacked[X.columns]
+
+    preds = model.predict(stacked)
+    per_horizon = preds.reshape(FORECAST_HORIZON, n_base)
+
+    forecast = [
+        {"month": label, "predicted_total": float(round(per_horizon[h].sum(), 2))}
+        for h, label in enumerate(month_labels(months, years))
+    ]
+
+    # 🔹 Grouped Forecast: per-horizon group sums, then summed across horizons
+    stacked['horizon'] = np.repeat(np.arange(FORECAST_HORIZON), n_base)
+    stacked['preds'] = preds
+    grouped = stacked.groupby(['Category', 'Gender', 'Region', 'horizon'])['preds'].sum().unstack('horizon')
+    totals = np.zeros(len(grouped))
+    for h in range(FORECAST_HORIZON):
+        totals = totals + grouped[h].to_numpy(dtype=np.float64)
+
+    keys = grouped.index.to_frame(index=False)
+    keys = (names['Category'][keys['Category'].to_numpy()] + '_' +
+            names['Gender'][keys['Gender'].to_numpy()] + '_' +
+            names['Region'][keys['Region'].to_numpy()])
+    forecast_grouped = dict(zip(keys.tolist(), totals.tolist()))
+
+    # 🔹 Category % Change (first forecast month vs. history)
+    codes = df['Category'].to_numpy()
+    counts = np.bincount(codes)
+    present = np.flatnonzero(counts)
+    past_category_avg = pd.Series(np.bincount(codes, weights=quantity)[present] / counts[present], index=present)
+    predicted_avg = pd.Series(per_horizon[0].astype(np.float64), index=base['Category'].to_numpy()).groupby(level=0).mean()
+    common = past_category_avg.index.intersection(predicted_avg.index)
+    change = (predicted_avg[common] - past_category_avg[common]) / past_category_avg[common] * 100
+
+    category_changes = [
+        {"category": cat, "change": round(float(value), 2)}
+        for cat, value in zip(names['Category'][common.to_numpy()], change.to_numpy())
+    ]
+
+    return actual_sales, forecast, forecast_grouped, category_changes
+
+def prepare(df):
     # 🔹 Step 1: Prepare Date & Features
     df['Date'] = pd.to_datetime(df['Date'])
     df['Month'] = df['Date'].dt.month
     df['Year'] = df['Date'].dt.year
 
-    df = df.drop(columns=['Product_ID'])
+    return df.drop(columns=['Product_ID'])
+
+def results_for(df, X, model, label_encoders, accuracy):
+    # 🔹 Steps 4-5: Actual sales, forecast, grouped forecast, category change
+    actual_sales, forecast, forecast_grouped, category_changes = postprocess(df, X, model, label_encoders)
+
+    return {
+        "accuracy": float(round(accuracy * 100, 2)),
+        "actual_sales": actual_sales,
+        "forecast": forecast,
+        "grouped": forecast_grouped,
+        "category_change": category_changes
+    }
 
+def fit_full(df):
     # 🔹 Step 2: Encode categorical columns
     label_encoders = {}
-    for col in ['Category', 'Gender', 'Region', 'Season']:
+    for col in ENCODED_COLUMNS:
         le = LabelEncoder()
         df[col] = le.fit_transform(df[col])
         label_encoders[col] = le
 
-    category_encoder = label_encoders['Category']
-
     # 🔹 Step 3: Train model - Added more features and hyperparameters
-    X = df[['Category', 'Gender', 'Region', 'Season', 'Month', 'Year']]  # Added Year
+    X = df[FEATURES]  # Added Year
     y = df['Quantity_Sold']
 
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    model = XGBRegressor(n_estimators=100, max_depth=3, learning_rate=0.1)  # Tuned parameters
+    model = XGBRegressor(**MODEL_PARAMS)  # Tuned parameters
     model.fit(X_train, y_train)
     y_pred = model.predict(X_test)
     accuracy = r2_score(y_test, y_pred)
+    return df, X, model, label_encoders, accuracy
 
-    # 🔹 Step 4: Actual Monthly Sales for Chart 1
-    actual_monthly = df.groupby(['Year', 'Month'])['Quantity_Sold'].sum().reset_index()
-    actual_monthly['label'] = actual_monthly.apply(
-        lambda row: f"{calendar.month_name[row['Month']]} {row['Year']}", axis=1
-    )
-    actual_sales = actual_monthly[['label', 'Quantity_Sold']].to_dict(orient='records')
+# ---------- Pre-aggregated training ----------
+#
+# The model predicts Quantity_Sold from FEATURES only, so every row of one
+# (Category, Gender, Region, Season, Month, Year) cell has the same prediction.
+# With squared error, the gradient and hessian sums of a cell's rows equal those
+# of one row holding the cell mean with weight = row count, so XGBoost trained on
+# cell means with sample_weight=count grows the same trees as on the raw rows
+# while its DMatrix and split search scale with the number of cells.
+# The train/test split is the same row split as fit_full; the test R2 is computed
+# over rows from per-cell count, sum and sum of squares. Only the encoding and
+# one groupby touch the rows.
 
-    # 🔹 Step 5: Forecast next 3 months with proper temporal handling
-    latest_date = df['Date'].max()
-    base = X.drop_duplicates(subset=['Category', 'Gender', 'Region', 'Season']).copy()
-    
-    forecast = []
-    forecast_grouped = {}
-    all_preds = []
-
-    for i in range(1, 4):
-        forecast_date = (latest_date + pd.DateOffset(months=i))
-        forecast_month = forecast_date.month
-        forecast_year = forecast_date.year
-
-        temp = base.copy()
-        temp['Month'] = forecast_month
-        temp['Year'] = forecast_year  # Include the forecast year
-        
-        # Get season for the forecast month (simple implementation)
-        if forecast_month in [12, 1, 2]:
-            season = 'Winter'
-        elif forecast_month in [3, 4, 5]:
-            season = 'Spring'
-        elif forecast_month in [6, 7, 8]:
-            season = 'Summer'
-        else:
-            season = 'Autumn'
-            
-        # Encode the season
-        temp['Season'] = label_encoders['Season'].transform([season])[0]
-        
-        preds = model.predict(temp)
-        all_preds.extend(preds.tolist())
-        total_sales = float(round(preds.sum(), 2))
-
-        forecast.append({
-            "month": f"{calendar.month_name[forecast_month]} {forecast_year}",
-            "predicted_total": total_sales
-        })
-
-        # 🔹 Grouped Forecast
-        temp['preds'] = preds
-        grouped = temp.groupby(['Category', 'Gender', 'Region'])['preds'].sum().reset_index()
-
-        for _, row in grouped.iterrows():
-            key = f"{label_encoders['Category'].inverse_transform([int(row['Category'])])[0]}_" + \
-                  f"{label_encoders['Gender'].inverse_transform([int(row['Gender'])])[0]}_" + \
-                  f"{label_encoders['Region'].inverse_transform([int(row['Region'])])[0]}"
-            forecast_grouped[key] = forecast_grouped.get(key, 0) + float(row['preds'])
-
-    # 🔹 Category % Change
-    past_category_avg = df.groupby('Category')['Quantity_Sold'].mean().to_dict()
-    predicted_cats = base.copy()
-    predicted_cats['preds'] = all_preds[:len(base)]  # just first month predictions
-    predicted_avg = predicted_cats.groupby('Category')['preds'].mean().to_dict()
-
-    category_changes = []
-    for cat, past_avg in past_category_avg.items():
-        if cat in predicted_avg:
-            change = ((predicted_avg[cat] - past_avg) / past_avg) * 100
-            category_changes.append({
-                "category": category_encoder.inverse_transform([int(cat)])[0],
-                "change": round(float(change), 2)
-            })
+def encode_categories(df):
+    # Same codes as LabelEncoder (sorted observed values), from category dtype codes
+    label_encoders = {}
+    for col in ENCODED_COLUMNS:
+        values = df[col].astype('category').cat.remove_unused_categories()
+        values = values.cat.reorder_categories(sorted(values.cat.categories))
+        le = LabelEncoder()
+        le.classes_ = np.asarray(values.cat.categories, dtype=object)
+        label_encoders[col] = le
+        df[col] = values
+    return label_encoders
 
-    return {
-        "accuracy": float(round(accuracy * 100, 2)),
-        "actual_sales": actual_sales,
-        "forecast": forecast,
-        "grouped": forecast_grouped,
-        "category_change": category_changes
+def aggregate_cells(df, test_rows):
+    # One groupby over (fold, FEATURES) on the categorical columns: count, sum and sum of squares
+    y = df['Quantity_Sold'].to_numpy(dtype=np.float64)
+    fold = np.zeros(len(df), dtype=np.int8)
+    fold[test_rows] = 1
+    # Keys are passed as columns, not copied into a new frame
+    keys = [pd.Series(fold, index=df.index, name='fold')] + [df[col] for col in FEATURES]
+    cells = pd.DataFrame({'y': y, 'y2': y * y}, index=df.index).groupby(keys, observed=True, sort=False).agg(
+        n=('y', 'size'), total=('y', 'sum'), squares=('y2', 'sum')).reset_index()
+    for col in ENCODED_COLUMNS:
+        cells[col] = cells[col].cat.codes.astype(np.int64)
+    cells[['Month', 'Year']] = cells[['Month', 'Year']].astype(np.int64)
+    return cells[cells['fold'] == 0], cells[cells['fold'] == 1]
+
+def cell_r2(cells, pred):
+    # Row-level r2_score from cell statistics: within-cell error plus n * (mean - prediction)^2
+    n = cells['n'].to_numpy(dtype=np.float64)
+    total = cells['total'].to_numpy()
+    squares = cells['squares'].to_numpy()
+    residual = np.sum(squares - total * total / n) + np.sum(n * (total / n - pred) ** 2)
+    variance = squares.sum() - total.sum() ** 2 / n.sum()
+    return 1.0 - residual / variance if variance > 0 else 0.0
+
+def fit_aggregated(df):
+    label_encoders = encode_categories(df)
+
+    _, test_rows = train_test_split(np.arange(len(df)), test_size=0.2, random_state=42)
+    train, test = aggregate_cells(df, test_rows)
+
+    model = XGBRegressor(**MODEL_PARAMS)
+    model.fit(train[FEATURES], train['total'] / train['n'], sample_weight=train['n'])
+    accuracy = cell_r2(test, model.predict(test[FEATURES]))
+
+    # postprocess works on the rows with integer codes, as after fit_full
+    for col in ENCODED_COLUMNS:
+        df[col] = df[col].cat.codes.astype(np.int64)
+    return df, df[FEATURES], model, label_encoders, accuracy
+
+def train_and_predict(df, return_model=False, aggregate=False):
+    # aggregate=True trains on monthly cells (fit_aggregated); the response is the same either way
+    fit = fit_aggregated if aggregate else fit_full
+    df, X, model, label_encoders, accuracy = fit(prepare(df))
+    results = results_for(df, X, model, label_encoders, accuracy)
+    if return_model:
+        return results, model
+    return results
+
+# ---------- Incremental retraining ----------
+#
+# state_dir holds the booster of the last fit plus everything needed to continue
+# it: the label encoder classes (in code order), the last date trained on, the
+# number of boosting rounds and the last accuracy. An update trains only on rows
+# dated after that watermark plus the last WINDOW_MONTHS months before the newest
+# row, and adds INCREMENTAL_ROUNDS trees to the stored booster (xgb_model=...),
+# so its cost follows the size of the new data, not the history. Rows dated at or
+# before the watermark that were not already trained on are not picked up.
+#
+# Categories seen for the first time get the next free code; existing codes never
+# move, because the stored trees split on them. Once the booster would exceed
+# MAX_ROUNDS trees (or there is no state yet) the update is a full fit.
+
+@contextmanager
+def state_lock(state_dir):
+    # One update per state folder at a time, across forecast worker processes
+    os.makedirs(state_dir, exist_ok=True)
+    with open(os.path.join(state_dir, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def load_state(state_dir):
+    try:
+        with open(os.path.join(state_dir, STATE_FILE)) as f:
+            state = json.load(f)
+        model = XGBRegressor()
+        model.load_model(os.path.join(state_dir, state['model_file']))
+    except (OSError, ValueError, KeyError):
+        return None
+
+    label_encoders = {}
+    for col in ENCODED_COLUMNS:
+        le = LabelEncoder()
+        le.classes_ = np.array(state['classes'][col], dtype=object)
+        label_encoders[col] = le
+    state['trained_through'] = pd.Timestamp(state['trained_through'])
+    return state, model, label_encoders
+
+def state_version(state_dir):
+    # Changes with every save_state() (its model file name is unique), 'none' before the first
+    try:
+        with open(os.path.join(state_dir, STATE_FILE)) as f:
+            return os.path.splitext(json.load(f)['model_file'])[0]
+    except (OSError, ValueError, KeyError):
+        return 'none'
+
+def save_state(state_dir, model, label_encoders, trained_through, rounds, accuracy, updates):
+    # Model file first under a fresh name, then state.json replaced atomically to point at it
+    model_file = f"model-{uuid.uuid4().hex[:12]}.json"
+    model.save_model(os.path.join(state_dir, model_file))
+    state = {
+        "model_file": model_file,
+        "classes": {col: [str(c) for c in le.classes_] for col, le in label_encoders.items()},
+        "trained_through": trained_through.isoformat(),
+        "rounds": int(rounds),
+        "accuracy": float(accuracy),
+        "updates": int(updates)
     }
+    tmp = os.path.join(state_dir, f"{STATE_FILE}.{os.getpid()}.tmp")
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, os.path.join(state_dir, STATE_FILE))
+    for name in os.listdir(state_dir):
+        if name.startswith('model-') and name != model_file:
+            os.remove(os.path.join(state_dir, name))
+
+def extend_encoders(df, label_encoders):
+    # Unseen categories are appended (sorted, for a deterministic order) and then all codes mapped
+    # (factorize + one lookup per distinct value, not a dict lookup per row)
+    for col, le in label_encoders.items():
+        codes, uniques = pd.factorize(df[col])
+        uniques = np.asarray(uniques).astype(str)
+        new = np.setdiff1d(uniques, le.classes_.astype(str))
+        if len(new):
+            le.classes_ = np.concatenate([le.classes_, new.astype(object)])
+        df[col] = pd.Index(le.classes_.astype(str)).get_indexer(uniques)[codes]
+    return df
+
+def train_incremental(df, state_dir, window_months=WINDOW_MONTHS, return_model=False):
+    df = prepare(df)
+    with state_lock(state_dir):
+        loaded = load_state(state_dir)
+        if loaded is None or loaded[0]['rounds'] + INCREMENTAL_ROUNDS > MAX_ROUNDS:
+            df, X, model, label_encoders, accuracy = fit_full(df)
+            updates = 0 if loaded is None else loaded[0]['updates'] + 1
+            training = {"mode": "full", "rows": int(len(df)), "rounds": MODEL_PARAMS['n_estimators']}
+        else:
+            state, previous, label_encoders = loaded
+            df = extend_encoders(df, label_encoders)
+            X = df[FEATURES]
+            latest = df['Date'].max()
+            model, accuracy, updates = previous, state['accuracy'], state['updates']
+            training = {"mode": "unchanged", "rows": 0, "rounds": state['rounds']}
+
+            if latest > state['trained_through']:
+                # New rows plus a recent window, so one new month does not pull every tree towards itself
+                since = min(state['trained_through'], latest - pd.DateOffset(months=window_months))
+                recent = (df['Date'] > since).to_numpy()
+                X_recent, y_recent = X[recent], df['Quantity_Sold'][recent]
+                model = XGBRegressor(**dict(MODEL_PARAMS, n_estimators=INCREMENTAL_ROUNDS))
+                if recent.sum() >= 10:
+                    X_train, X_test, y_train, y_test = train_test_split(X_recent, y_recent, test_size=0.2,
+                                                                        random_state=42)
+                    model.fit(X_train, y_train, xgb_model=previous.get_booster())
+                    accuracy = r2_score(y_test, model.predict(X_test))
+                else:
+                    # Too few rows to hold any out; keep the last accuracy
+                    model.fit(X_recent, y_recent, xgb_model=previous.get_booster())
+                updates += 1
+                training = {"mode": "incremental", "rows": int(recent.sum()),
+                            "rounds": state['rounds'] + INCREMENTAL_ROUNDS}
+
+        if training["mode"] != "unchanged":
+            save_state(state_dir, model, label_encoders, df['Date'].max(), training["rounds"], accuracy, updates)
+
+    results = results_for(df, X, model, label_encoders, accuracy)
+    results["training"] = training
+    if return_model:
+        return results, model
+    return results
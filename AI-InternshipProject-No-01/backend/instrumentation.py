@@ -0,0 +1,237 @@
+import functools
+import glob
+import json
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from flask import g
+
+# Per-endpoint, per-stage latency histograms in Prometheus text format.
+#
+# Hot path cost is a perf_counter() call, a bisect and two list increments. Each
+# thread writes only to its own store, so there is no lock on the request path;
+# the scrape merges all thread stores. An exited thread's store is handed to the
+# next new thread (see ThreadStores), so with a thread per request the stores stay
+# bounded by the peak concurrency. Under serve.py every worker process also
+# dumps its histograms to API_METRICS_DIR every few seconds and the scrape merges
+# those files, so one /internal/metrics call covers every worker.
+
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+           0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FLUSH_INTERVAL = 5.0
+METRIC = 'api_stage_seconds'
+
+
+class _Owner:
+    # Kept only in a thread's locals: it is collected, and its finalizer runs, when the thread exits
+    __slots__ = ('__weakref__',)
+
+
+class ThreadStores:
+    # One counter store per thread, written without a lock. When a thread exits its
+    # store goes to a free list and the next new thread keeps counting in it; the
+    # counters are only ever summed, so the total is unchanged and the number of
+    # stores follows the peak number of live threads, not every thread ever started.
+    def __init__(self, factory):
+        self.factory = factory
+        self.local = threading.local()
+        self.stores = []
+        self.free = []
+        self.lock = threading.Lock()  # only taken when a thread starts or stops counting
+
+    def acquire(self):
+        with self.lock:
+            if self.free:
+                store = self.free.pop()
+            else:
+                store = self.factory()
+                self.stores.append(store)
+        owner = _Owner()
+        weakref.finalize(owner, self._release, store)
+        self.local.owner = owner
+        self.local.store = store
+        return store
+
+    def _release(self, store):
+        with self.lock:
+            self.free.append(store)
+
+    def all(self):
+        with self.lock:
+            return list(self.stores)
+
+
+class WorkerCounters:
+    # Per-thread counters (ThreadStores) that serve.py workers share through state_dir:
+    # each process dumps its merged stores to <state_dir>/<pid>.json every FLUSH_INTERVAL
+    # seconds, and collect() adds the other workers' last dumps to the live counts.
+    # Subclasses give the store factory and define snapshot() (this process),
+    # dump(snapshot) (JSON data) and merge(merged, data) (one other worker's dump).
+    def __init__(self, factory, state_dir=None):
+        self.threads = ThreadStores(factory)
+        self.local = self.threads.local
+        self.state_dir = state_dir
+        self.flusher_pid = None
+
+    def _store(self):
+        store = self.threads.acquire()
+        self._ensure_flusher()
+        return store
+
+    def _ensure_flusher(self):
+        # Threads do not survive fork, so each worker starts its own flusher
+        if not self.state_dir or self.flusher_pid == os.getpid():
+            return
+        self.flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        if not self.state_dir or not self.threads.stores:
+            return
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = os.path.join(self.state_dir, f"{os.getpid()}.json")
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.dump(self.snapshot()), f)
+        os.replace(path + '.tmp', path)
+
+    def collect(self):
+        # This process live, plus the last dump of every other worker (including recycled ones)
+        merged = self.snapshot()
+        if self.state_dir:
+            own = os.path.join(self.state_dir, f"{os.getpid()}.json")
+            for path in glob.glob(os.path.join(self.state_dir, '*.json')):
+                if path == own:
+                    continue
+                try:
+                    with open(path) as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                self.merge(merged, data)
+        return merged
+
+
+class StageHistograms(WorkerCounters):
+    def __init__(self, state_dir=None):
+        super().__init__(dict, state_dir)
+
+    def observe(self, endpoint, stage, seconds):
+        store = getattr(self.local, 'store', None)
+        if store is None:
+            store = self._store()
+        hist = store.get((endpoint, stage))
+        if hist is None:
+            hist = store[(endpoint, stage)] = [[0] * (len(BUCKETS) + 1), 0.0]
+        hist[0][bisect_left(BUCKETS, seconds)] += 1
+        hist[1] += seconds
+
+    def snapshot(self):
+        merged = {}
+        for store in self.threads.all():
+            for key, (counts, total) in list(store.items()):
+                merge_into(merged, key, counts, total)
+        return merged
+
+    def dump(self, snapshot):
+        return [[endpoint, stage, counts, total] for (endpoint, stage), (counts, total) in snapshot.items()]
+
+    def merge(self, merged, data):
+        for endpoint, stage, counts, total in data:
+            merge_into(merged, (endpoint, stage), counts, total)
+
+    def prometheus_text(self):
+        lines = [
+            f"# HELP {METRIC} Request latency per endpoint and stage.",
+            f"# TYPE {METRIC} histogram"
+        ]
+        for (endpoint, stage), (counts, total) in sorted(self.collect().items()):
+            labels = f'endpoint="{endpoint}",stage="{stage}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS, counts):
+                cumulative += count
+                lines.append(f'{METRIC}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{METRIC}_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f'{METRIC}_sum{{{labels}}} {total:.9f}')
+            lines.append(f'{METRIC}_count{{{labels}}} {cumulative}')
+        return "\n".join(lines) + "\n"
+
+
+
+class WorkerTotals(WorkerCounters):
+    # Named plain counters (e.g. lookup hits and misses), summed over threads and workers
+    def __init__(self, names, state_dir=None):
+        super().__init__(lambda: [0] * len(names), state_dir)
+        self.names = list(names)
+
+    def add(self, *amounts):
+        store = getattr(self.local, 'store', None)
+        if store is None:
+            store = self._store()
+        for i, amount in enumerate(amounts):
+            store[i] += amount
+
+    def snapshot(self):
+        merged = [0] * len(self.names)
+        for store in self.threads.all():
+            for i, count in enumerate(store):
+                merged[i] += count
+        return merged
+
+    def dump(self, snapshot):
+        return dict(zip(self.names, snapshot))
+
+    def merge(self, merged, data):
+        for i, name in enumerate(self.names):
+            merged[i] += int(data.get(name, 0))
+
+    def totals(self):
+        return dict(zip(self.names, self.collect()))
+
+def merge_into(merged, key, counts, total):
+    current = merged.get(key)
+    if current is None:
+        merged[key] = [list(counts), total]
+    else:
+        current[0] = [a + b for a, b in zip(current[0], counts)]
+        current[1] += total
+
+
+class StageTimer:
+    # Splits one request into consecutive stages; mark() closes the current stage
+    __slots__ = ('histograms', 'endpoint', 'start', 'last')
+
+    def __init__(self, histograms, endpoint):
+        self.histograms = histograms
+        self.endpoint = endpoint
+        self.start = self.last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.histograms.observe(self.endpoint, stage, now - self.last)
+        self.last = now
+
+    def finish(self):
+        self.histograms.observe(self.endpoint, 'total', time.perf_counter() - self.start)
+
+
+def instrumented(histograms, endpoint):
+    # Route decorator: records the total and exposes the timer as g.stage_timer
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            timer = g.stage_timer = StageTimer(histograms, endpoint)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timer.finish()
+        return wrapper
+    return decorator
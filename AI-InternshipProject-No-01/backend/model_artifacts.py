@@ -0,0 +1,284 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from churn_kernel import ChurnKernel
+from product_trees import TreeEnsemble, compile_booster
+
+# Versioned on-disk model format for the combined API, replacing the pickled
+# (model, scaler) / (pipeline, label_encoder) tuples.
+#
+#   models/churn/manifest.json     schema version, model version, features, codes
+#   models/churn/*.npy             coefficients, scaler statistics, folded kernel
+#   models/product/manifest.json   schema version, model version, one-hot layout, classes
+#   models/product/model.ubj       XGBoost booster in its native UBJSON format
+#   models/product/lookup_*.npy    precomputed answers for known combinations
+#   models/product/trees_*.npy     the booster compiled to flat node / leaf-mask
+#                                  tables (product_trees.py), used for inference
+#
+# Arrays are opened with mmap_mode='r', so every serve.py worker maps the same
+# page-cache pages instead of holding a private copy, and nothing is unpickled:
+# the files do not depend on the sklearn version that wrote them.
+#
+#   python model_artifacts.py      # convert the existing .pkl files
+
+SCHEMA_VERSION = 1
+MODELS_FOLDER = "models"
+CHURN_ARTIFACT = os.path.join(MODELS_FOLDER, "churn")
+PRODUCT_ARTIFACT = os.path.join(MODELS_FOLDER, "product")
+MANIFEST = "manifest.json"
+
+
+class ArtifactError(ValueError):
+    pass
+
+
+def read_manifest(path, kind):
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get('schema_version') != SCHEMA_VERSION:
+        raise ArtifactError(f"{path}: unsupported schema_version {manifest.get('schema_version')}")
+    if manifest.get('kind') != kind:
+        raise ArtifactError(f"{path}: expected a {kind} artifact, found {manifest.get('kind')}")
+    return manifest
+
+
+def write_artifact(path, manifest, arrays, files=None):
+    # Everything goes to a sibling temp folder first; the manifest is written
+    # last and the folder renamed into place, so readers never see half a model
+    tmp = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    digest = hashlib.sha256()
+    manifest['arrays'] = {}
+    for name, array in arrays.items():
+        filename = f"{name}.npy"
+        np.save(os.path.join(tmp, filename), np.ascontiguousarray(array))
+        manifest['arrays'][name] = filename
+        digest.update(np.ascontiguousarray(array).tobytes())
+    for filename, writer in (files or {}).items():
+        writer(os.path.join(tmp, filename))
+        with open(os.path.join(tmp, filename), 'rb') as f:
+            digest.update(f.read())
+
+    manifest['schema_version'] = SCHEMA_VERSION
+    manifest['version'] = f"{time.strftime('%Y%m%d%H%M%S')}-{digest.hexdigest()[:12]}"
+    manifest['created_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    with open(os.path.join(tmp, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.exists(path):
+        old = f"{path}.old-{os.getpid()}"
+        os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+    else:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        os.replace(tmp, path)
+    return manifest
+
+
+def load_arrays(path, manifest):
+    return {name: np.load(os.path.join(path, filename), mmap_mode='r', allow_pickle=False)
+            for name, filename in manifest['arrays'].items()}
+
+
+# ---------- Churn: LogisticRegression + StandardScaler ----------
+
+def save_churn(path, model, scaler, features, status_codes):
+    kernel = ChurnKernel.from_sklearn(model, scaler, features, status_codes)
+    manifest = {
+        "kind": "churn-logistic",
+        "features": list(features),
+        "account_status_codes": dict(status_codes),
+        "classes": np.asarray(model.classes_).tolist(),
+        "kernel_bias": kernel.bias
+    }
+    arrays = {
+        "coef": np.asarray(model.coef_, dtype=np.float64),
+        "intercept": np.asarray(model.intercept_, dtype=np.float64),
+        "scaler_mean": np.asarray(scaler.mean_, dtype=np.float64),
+        "scaler_scale": np.asarray(scaler.scale_, dtype=np.float64),
+        "scaler_var": np.asarray(scaler.var_, dtype=np.float64),
+        "kernel_weights": kernel.weights
+    }
+    return write_artifact(path, manifest, arrays)
+
+
+class ChurnArtifact:
+    def __init__(self, path):
+        self.path = path
+        self.manifest = read_manifest(path, "churn-logistic")
+        self.arrays = load_arrays(path, self.manifest)
+        self.version = self.manifest['version']
+        self.features = list(self.manifest['features'])
+        self.status_codes = dict(self.manifest['account_status_codes'])
+
+    def kernel(self):
+        # Scaler already folded in at export time, no parity probe needed at startup
+        return ChurnKernel(self.arrays['kernel_weights'], self.manifest['kernel_bias'],
+                           self.features, self.status_codes)
+
+    def sklearn(self):
+        # Fitted estimators rebuilt from the arrays, for the ?engine=sklearn reference path
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.preprocessing import StandardScaler
+
+        model = LogisticRegression()
+        model.classes_ = np.asarray(self.manifest['classes'])
+        model.coef_ = np.asarray(self.arrays['coef'])
+        model.intercept_ = np.asarray(self.arrays['intercept'])
+        model.n_features_in_ = len(self.features)
+
+        scaler = StandardScaler()
+        scaler.mean_ = np.asarray(self.arrays['scaler_mean'])
+        scaler.scale_ = np.asarray(self.arrays['scaler_scale'])
+        scaler.var_ = np.asarray(self.arrays['scaler_var'])
+        scaler.n_features_in_ = len(self.features)
+        scaler.feature_names_in_ = np.array(self.features, dtype=object)
+        scaler.n_samples_seen_ = 0
+        return model, scaler
+
+
+# ---------- Product: OneHotEncoder + XGBClassifier ----------
+
+class ProductModel:
+    # predict / predict_proba on a DataFrame, same output as the sklearn Pipeline:
+    # the sparse one-hot matrix is built directly from the stored category lists
+    # (unknown categories are all-zero rows, i.e. missing for XGBoost)
+    def __init__(self, booster, features, categories, iteration_range=None):
+        self.booster = booster
+        self.features = list(features)
+        self.categories = [pd.Index(categories[f]) for f in self.features]
+        self.offsets = np.cumsum([0] + [len(c) for c in self.categories])
+        self.iteration_range = tuple(iteration_range or (0, 0))
+
+    def encode(self, df):
+        from scipy import sparse
+
+        missing = [f for f in self.features if f not in df.columns]
+        if missing:
+            raise ValueError(f"columns are missing: {set(missing)}")
+
+        columns = []
+        for offset, feature, categories in zip(self.offsets, self.features, self.categories):
+            codes = categories.get_indexer(df[feature])
+            columns.append(np.where(codes >= 0, codes + offset, -1))
+        cols = np.stack(columns, axis=1)
+        known = cols >= 0
+        rows = np.nonzero(known)[0]
+        return sparse.csr_matrix((np.ones(len(rows)), (rows, cols[known])),
+                                 shape=(len(df), int(self.offsets[-1])))
+
+    def predict_proba(self, df):
+        return self.booster.inplace_predict(self.encode(df), iteration_range=self.iteration_range,
+                                            missing=np.nan)
+
+    def predict(self, df):
+        return np.argmax(self.predict_proba(df), axis=1)
+
+
+class LabelClasses:
+    # The parts of a fitted LabelEncoder the API uses, without sklearn
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes, dtype=object)
+
+    def inverse_transform(self, codes):
+        return self.classes_[np.asarray(codes, dtype=np.int64)]
+
+
+def save_product(path, pipeline, label_encoder, features, lookup=None):
+    encoder = pipeline.named_steps['preprocessor'].named_transformers_['cat']
+    classifier = pipeline.named_steps['classifier']
+    best = getattr(classifier, 'best_iteration', None)
+    manifest = {
+        "kind": "product-onehot-xgb",
+        "features": list(features),
+        "categories": {f: np.asarray(c).tolist() for f, c in zip(features, encoder.categories_)},
+        "classes": np.asarray(label_encoder.classes_).tolist(),
+        "booster": "model.ubj",
+        "iteration_range": [0, best + 1] if best is not None else [0, 0]
+    }
+    trees, manifest["trees"] = compile_booster(classifier.get_booster(), features, manifest["categories"],
+                                               manifest["iteration_range"])
+    arrays = {f"trees_{name}": array for name, array in trees.items()}
+    if lookup is not None:
+        arrays.update({"lookup_keys": lookup.keys, "lookup_proba": lookup.proba})
+    files = {"model.ubj": classifier.get_booster().save_model}
+    return write_artifact(path, manifest, arrays, files)
+
+
+class ProductArtifact:
+    def __init__(self, path):
+        from xgboost import Booster
+
+        self.path = path
+        self.manifest = read_manifest(path, "product-onehot-xgb")
+        self.arrays = load_arrays(path, self.manifest)
+        self.version = self.manifest['version']
+        self.features = list(self.manifest['features'])
+
+        booster = Booster()
+        booster.load_model(os.path.join(path, self.manifest['booster']))
+        self.booster_model = ProductModel(booster, self.features, self.manifest['categories'],
+                                          self.manifest['iteration_range'])
+        self.label_encoder = LabelClasses(self.manifest['classes'])
+
+        # Smoke prediction: checks the booster against the manifest and sets up
+        # XGBoost's predictor before serve.py forks, instead of in every worker
+        sample = pd.DataFrame([{f: c[0] for f, c in self.manifest['categories'].items()}, dict.fromkeys(self.features)])
+        expected = self.booster_model.predict_proba(sample)
+        if expected.shape != (2, len(self.manifest['classes'])):
+            raise ArtifactError(f"{path}: booster output does not match the {len(self.manifest['classes'])} classes")
+
+        # Compiled trees serve predictions when present (artifacts written before them use the booster)
+        self.trees = None
+        if 'trees_masks' in self.arrays:
+            tables = {name[len('trees_'):]: array for name, array in self.arrays.items() if name.startswith('trees_')}
+            self.trees = TreeEnsemble(tables, self.features, self.manifest['categories'], **self.manifest['trees'])
+            if np.abs(self.trees.predict_proba(sample) - expected).max() > 1e-4:
+                raise ArtifactError(f"{path}: compiled trees disagree with the booster")
+        self.model = self.trees if self.trees is not None else self.booster_model
+
+    def lookup(self):
+        from product_lookup import ProductLookup
+
+        if 'lookup_keys' not in self.arrays:
+            return None
+        return ProductLookup(self.arrays['lookup_keys'], self.arrays['lookup_proba'],
+                             self.features, self.version)
+
+
+def max_product_parity_error(pipeline, model, df):
+    return float(np.max(np.abs(pipeline.predict_proba(df) - model.predict_proba(df))))
+
+
+if __name__ == '__main__':
+    # One-off conversion of the pickled models written by churn-model.py and
+    # recommendatrion-model.py
+    import pickle
+    from churn_kernel import load_feature_spec
+    from product_lookup import ProductLookup
+
+    with open('churn_model.pkl', 'rb') as f:
+        churn_model, churn_scaler = pickle.load(f)
+    features, codes = load_feature_spec('churn_features.json', [], {})
+    manifest = save_churn(CHURN_ARTIFACT, churn_model, churn_scaler, features, codes)
+    print(f"✅ Churn artifact {manifest['version']} saved in {CHURN_ARTIFACT}/")
+
+    with open('product_recommendation_model.pkl', 'rb') as f:
+        product_model, label_encoder = pickle.load(f)
+    product_features = list(product_model.named_steps['preprocessor'].transformers_[0][2])
+    df = pd.read_csv('customer_recommendations_better.csv')
+    lookup = ProductLookup.build(product_model, df, product_features)
+    manifest = save_product(PRODUCT_ARTIFACT, product_model, label_encoder, product_features, lookup)
+
+    parity = max_product_parity_error(product_model, ProductArtifact(PRODUCT_ARTIFACT).model,
+                                      df[product_features].dropna())
+    print(f"✅ Product artifact {manifest['version']} saved in {PRODUCT_ARTIFACT}/ (max |Δp| vs pipeline = {parity:.2e})")
@@ -0,0 +1,108 @@
+import logging
+import os
+import threading
+import time
+
+# Hot-swappable model holder for the combined API.
+#
+# Each model name has a loader (returns an object with a .version, or None), a
+# smoke test, and the files it is loaded from. A reload builds the new version
+# completely off the request path, runs the smoke prediction on it, and only
+# then replaces the entry in `active` - a single dict assignment, so a request
+# that already fetched the old object with get() finishes on it, and the next
+# request sees the new one. A failing load or smoke test keeps the old version.
+#
+# Reloads are triggered by the file watcher (stat() of the watched files every
+# POLL_INTERVAL seconds) or explicitly through reload(). Under serve.py the
+# master owns the watcher and recycles the workers after a swap instead.
+
+POLL_INTERVAL = 5.0
+
+
+class ModelRegistry:
+    def __init__(self, loaders, poll_interval=POLL_INTERVAL):
+        # loaders: name -> (load(), smoke(loaded), [watched paths])
+        self.loaders = loaders
+        self.poll_interval = poll_interval
+        self.active = {}
+        self.signatures = {}
+        self.status = {}
+        self.lock = threading.Lock()  # one reload at a time; never taken by get()
+        self.watcher = None
+
+    def get(self, name):
+        return self.active.get(name)
+
+    def versions(self):
+        return {name: getattr(self.active.get(name), 'version', None) for name in self.loaders}
+
+    def signature(self, name):
+        # (inode, size, mtime) of every watched file; artifacts are replaced by rename,
+        # so a new export always shows up as a new inode of manifest.json
+        result = []
+        for path in self.loaders[name][2]:
+            try:
+                st = os.stat(path)
+                result.append((path, st.st_ino, st.st_size, st.st_mtime_ns))
+            except OSError:
+                result.append((path, None, None, None))
+        return tuple(result)
+
+    def changed(self):
+        return [name for name in self.loaders if self.signature(name) != self.signatures.get(name)]
+
+    def load_all(self):
+        # Initial load at import: a model that fails to load or smoke-test stays None
+        for name in self.loaders:
+            self._load(name, initial=True)
+
+    def reload(self, names=None, force=False):
+        # Returns the names whose active version was replaced
+        with self.lock:
+            names = list(self.loaders) if names is None else list(names)
+            if not force:
+                names = [name for name in names if name in self.changed()]
+            return [name for name in names if self._load(name)]
+
+    def _load(self, name, initial=False):
+        load, smoke, _ = self.loaders[name]
+        signature = self.signature(name)
+        started = time.perf_counter()
+        try:
+            loaded = load()
+            if loaded is None:
+                raise ValueError("no model files could be loaded")
+            smoke(loaded)
+        except Exception as e:
+            self.signatures[name] = signature  # do not retry the same broken files every poll
+            self.status[name] = {"ok": False, "error": str(e), "at": time.time()}
+            if initial:
+                self.active[name] = None
+            logging.error(f"❌ {name} model load failed, keeping {self.versions().get(name)}: {e}")
+            return False
+
+        previous = getattr(self.active.get(name), 'version', None)
+        self.active[name] = loaded
+        self.signatures[name] = signature
+        self.status[name] = {"ok": True, "version": loaded.version, "previous": previous,
+                             "seconds": round(time.perf_counter() - started, 3), "at": time.time()}
+        if not initial:
+            logging.info(f"🔄 {name} model {previous} -> {loaded.version}")
+        return True
+
+    # ---------- file watcher ----------
+
+    def start_watcher(self):
+        if self.watcher is not None and self.watcher.is_alive():
+            return
+        self.watcher = threading.Thread(target=self._watch, daemon=True)
+        self.watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                if self.changed():
+                    self.reload()
+            except Exception as e:
+                logging.error(f"❌ Model watcher error: {e}")
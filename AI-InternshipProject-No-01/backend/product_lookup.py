@@ -0,0 +1,87 @@
+import hashlib
+import numpy as np
+
+from instrumentation import WorkerTotals
+
+# Precomputed answers for the all-categorical product recommender.
+# Every observed combination of the seven inputs is scored once with the live
+# pipeline; predicted class + class probabilities are kept in compact arrays
+# addressed by a 64-bit hash of the combination, so a request for a known
+# combination is one dict lookup instead of OneHotEncoder + XGBoost.
+# Hits and misses are per-thread counters (WorkerTotals); with counters.state_dir
+# set, stats() covers every serve.py worker, not only the one answering.
+
+
+def combination_key(values):
+    joined = '\x1f'.join(str(v) for v in values).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(joined, digest_size=8).digest(), 'little')
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class ProductLookup:
+    def __init__(self, keys, proba, features, model_digest=None):
+        self.keys = np.asarray(keys, dtype=np.uint64)
+        self.proba = np.asarray(proba, dtype=np.float32)
+        self.pred = self.proba.argmax(axis=1).astype(np.int16)
+        self.features = list(features)
+        self.model_digest = model_digest
+        self.index = {int(key): row for row, key in enumerate(self.keys.tolist())}
+        self.counters = WorkerTotals(['hits', 'misses'])
+
+    @classmethod
+    def build(cls, model, df, features, model_digest=None):
+        combos = df[features].dropna().drop_duplicates()
+        keys = [combination_key(row) for row in combos.itertuples(index=False)]
+        keys, first = np.unique(np.asarray(keys, dtype=np.uint64), return_index=True)
+        proba = model.predict_proba(combos.iloc[first])
+        return cls(keys, proba, features, model_digest)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path, allow_pickle=False)
+        digest = str(data['model_digest']) if 'model_digest' in data else None
+        return cls(data['keys'], data['proba'], data['features'].tolist(), digest)
+
+    def save(self, path):
+        np.savez_compressed(path, keys=self.keys, proba=self.proba,
+                            features=np.array(self.features), model_digest=np.array(self.model_digest or ''))
+
+    def find(self, record):
+        # Row in the table for one request dict, or None for an unseen combination
+        return self.find_values([record.get(f) for f in self.features])
+
+    def find_values(self, values):
+        # Same for values already in feature order
+        row = self.index.get(combination_key(values))
+        if row is None:
+            self.counters.add(0, 1)
+        else:
+            self.counters.add(1, 0)
+        return row
+
+    def find_many(self, df):
+        # Table rows for a DataFrame of requests, -1 where the combination is unseen
+        return self.find_rows(df[self.features].itertuples(index=False))
+
+    def find_rows(self, rows):
+        # Same for rows of values in feature order
+        rows = np.array([self.index.get(combination_key(values), -1) for values in rows], dtype=np.int64)
+        found = int((rows >= 0).sum())
+        self.counters.add(found, len(rows) - found)
+        return rows
+
+    def stats(self):
+        totals = self.counters.totals()
+        hits, misses = totals['hits'], totals['misses']
+        lookups = hits + misses
+        return {
+            "entries": len(self.keys),
+            "bytes": int(self.keys.nbytes + self.proba.nbytes + self.pred.nbytes),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else None
+        }
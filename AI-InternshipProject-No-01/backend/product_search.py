@@ -0,0 +1,124 @@
+import itertools
+import math
+import os
+import time
+
+import numpy as np
+import xgboost as xgb
+from joblib import Parallel, delayed
+from sklearn.model_selection import StratifiedKFold
+from sklearn.preprocessing import OneHotEncoder
+
+# Successive-halving hyperparameter search for the product recommender
+# (OneHotEncoder + XGBClassifier), replacing GridSearchCV over the full grid.
+#
+# - The one-hot matrix is fitted and transformed once per fold and shared by
+#   every candidate (GridSearchCV refits the ColumnTransformer per candidate).
+# - n_estimators is the halving resource: all (max_depth, learning_rate) pairs
+#   get a small number of trees, the best 1/eta continue boosting from where
+#   they stopped (xgb.train(..., xgb_model=booster)), up to max(n_estimators).
+#   Every n_estimators value of the grid that a survivor reaches is scored with
+#   iteration_range, so no tree is trained twice.
+# - Candidates x folds run on a joblib thread pool (XGBoost releases the GIL,
+#   so the cached matrices are shared, not copied); jobs x XGBoost threads is
+#   kept at or below the CPU count.
+#
+# Folds come from the splitter GridSearchCV would use (pass check_cv(...) as cv)
+# and the score is accuracy, so the two searches rank candidates the same way.
+
+
+def thread_split(jobs=None, threads=None):
+    # (joblib workers, XGBoost threads per fit) with workers x threads <= CPUs
+    cpus = os.cpu_count() or 1
+    if jobs is None and threads is None:
+        threads = 1 if cpus >= 4 else cpus
+    if threads is None:
+        threads = max(1, cpus // jobs)
+    if jobs is None:
+        jobs = max(1, cpus // threads)
+    return jobs, threads
+
+
+def encode_folds(X, y, features, cv):
+    # Sparse one-hot train / validation matrices per fold, built once
+    cache = []
+    for train_idx, valid_idx in cv.split(X, y):
+        encoder = OneHotEncoder(handle_unknown='ignore')
+        train = encoder.fit_transform(X.iloc[train_idx][features])
+        valid = encoder.transform(X.iloc[valid_idx][features])
+        cache.append((xgb.DMatrix(train, label=y[train_idx]), valid, y[valid_idx]))
+    return cache
+
+
+def boost(params, fold, rounds, booster, score_at):
+    # Continue one candidate on one fold to `rounds` trees; accuracy at each of score_at
+    dtrain, valid, y_valid = fold
+    done = booster.num_boosted_rounds() if booster is not None else 0
+    if rounds > done:
+        booster = xgb.train(params, dtrain, num_boost_round=rounds - done, xgb_model=booster)
+    scores = {}
+    for n in score_at:
+        proba = booster.inplace_predict(valid, iteration_range=(0, n))
+        scores[n] = float(np.mean(proba.argmax(axis=1) == y_valid))
+    return booster, scores
+
+
+def halving_search(X, y, features, param_grid, cv=3, eta=3, jobs=None, threads=None, verbose=True):
+    jobs, threads = thread_split(jobs, threads)
+    if isinstance(cv, int):
+        cv = StratifiedKFold(n_splits=cv)
+    folds = cv.get_n_splits()
+    grid_estimators = sorted(param_grid['n_estimators'])
+    configs = [dict(zip(('max_depth', 'learning_rate'), values))
+               for values in itertools.product(param_grid['max_depth'], param_grid['learning_rate'])]
+
+    started = time.perf_counter()
+    cache = encode_folds(X, y, features, cv)
+    num_class = len(np.unique(y))
+
+    # Tree budgets per rung, e.g. 9 configs, eta 3, max 200 trees -> 22, 67, 200
+    n_rungs = int(math.floor(math.log(len(configs), eta) + 1e-9)) + 1
+    budgets = [max(1, round(grid_estimators[-1] / eta ** (n_rungs - 1 - k))) for k in range(n_rungs)]
+
+    survivors = list(range(len(configs)))
+    boosters = {}
+    results = {}  # (config index, n_estimators) -> mean validation accuracy
+    with Parallel(n_jobs=jobs, prefer='threads') as parallel:
+        for rung, budget in enumerate(budgets):
+            score_at = sorted({budget} | {n for n in grid_estimators if n <= budget})
+            tasks = [(c, f) for c in survivors for f in range(folds)]
+            outputs = parallel(
+                delayed(boost)(
+                    {'objective': 'multi:softprob', 'num_class': num_class, 'eval_metric': 'mlogloss',
+                     'eta': configs[c]['learning_rate'], 'max_depth': configs[c]['max_depth'], 'nthread': threads},
+                    cache[f], budget, boosters.get((c, f)), score_at)
+                for c, f in tasks)
+
+            per_config = {}
+            for (c, f), (booster, scores) in zip(tasks, outputs):
+                boosters[(c, f)] = booster
+                for n, score in scores.items():
+                    per_config.setdefault((c, n), []).append(score)
+            for key, scores in per_config.items():
+                results[key] = float(np.mean(scores))
+
+            if verbose:
+                print(f"🔎 Rung {rung + 1}/{n_rungs}: {len(survivors)} configs x {folds} folds at {budget} trees "
+                      f"({time.perf_counter() - started:.1f}s)")
+
+            # Keep the best 1/eta by accuracy at this budget
+            keep = max(1, len(survivors) // eta)
+            survivors = sorted(survivors, key=lambda c: -results[(c, budget)])[:keep]
+            for c, f in list(boosters):
+                if c not in survivors:
+                    del boosters[(c, f)]
+
+    # Best grid point among everything scored; ties go to fewer trees
+    scored = [(score, -n, c) for (c, n), score in results.items() if n in grid_estimators]
+    score, neg_n, c = max(scored)
+    best_params = {
+        'classifier__n_estimators': -neg_n,
+        'classifier__max_depth': configs[c]['max_depth'],
+        'classifier__learning_rate': configs[c]['learning_rate']
+    }
+    return best_params, score, time.perf_counter() - started
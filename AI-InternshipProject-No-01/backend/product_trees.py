@@ -0,0 +1,238 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+# Flattened-array inference for the product recommender (OneHotEncoder + XGBClassifier).
+#
+# Every split of the one-hot model tests a single one-hot column, i.e. "is input
+# feature f equal to category c". compile_booster() rewrites each node in those
+# terms and concatenates all trees into flat node tables:
+#
+#   feature[n], code[n]   input feature and category code the node tests (-1 for leaves)
+#   present[n]            child when the row has that category (one-hot value 1.0)
+#   absent[n]             child when it does not: the one-hot matrix is sparse, so
+#                         XGBoost sees the column as missing and takes the node's
+#                         default direction - unknown categories go the same way
+#   value[n]              leaf value (leaves point to themselves in present / absent)
+#   roots[t], classes[t]  first node and output class of tree t
+#
+# Walking those tables per row costs one random gather per tree and level, which
+# is slower than XGBoost itself on large batches. Inference instead uses leaf
+# bitmasks, as in QuickScorer: every internal node rules out the leaves of the
+# branch a row does not take, so AND-ing one mask per node leaves exactly the
+# exit leaf. A node's outcome depends on one input feature only, so the ANDs are
+# folded at export time into one table per feature and category value:
+#
+#   masks[mask_rows[f] + v, t]   leaves of tree t still reachable when feature f
+#                                has code v (v = cardinality: unknown value)
+#   leaves[t, bit]               leaf value per bit position
+#
+# A batch is then one table gather + AND per input feature, the lowest set bit
+# per tree, and a (rows x trees) @ (trees x classes) matmul for the margins: no
+# DataFrame -> sparse matrix -> DMatrix conversion and no XGBoost call. Outputs
+# match booster.inplace_predict on the same one-hot input up to float32 rounding.
+
+BLOCK_ROWS = 4096  # rows per block, bounds the (rows x trees) temporaries
+
+
+def mask_dtype(n_leaves):
+    # Smallest unsigned word for n_leaves bits, and the number of words
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if n_leaves <= np.dtype(dtype).itemsize * 8:
+            return dtype, 1
+    return np.uint64, -(-n_leaves // 64)
+
+
+def to_words(bits, dtype, words):
+    width = np.dtype(dtype).itemsize * 8
+    return np.array([(bits >> (width * w)) & ((1 << width) - 1) for w in range(words)], dtype=dtype)
+
+
+def compile_booster(booster, features, categories, iteration_range=None):
+    # (arrays, meta) for TreeEnsemble from a multi:softprob booster over the one-hot layout
+    model = json.loads(booster.save_raw('json'))
+    learner = model['learner']
+    trees = learner['gradient_booster']['model']['trees']
+    tree_info = learner['gradient_booster']['model']['tree_info']
+    n_classes = max(int(learner['learner_model_param']['num_class']), 1)
+
+    rounds = max(booster.num_boosted_rounds(), 1)
+    begin, end = iteration_range or (0, 0)
+    selected = range(begin * len(trees) // rounds, (end or rounds) * len(trees) // rounds)
+
+    cardinalities = [len(categories[f]) for f in features]
+    offsets = np.cumsum([0] + cardinalities)
+    feature, code, present, absent, value, roots, classes = [], [], [], [], [], [], []
+    splits = []  # per tree: (feature, code, leaves kept if present, leaves kept if absent) per internal node
+    leaf_values = []
+    base = 0
+    for t in selected:
+        tree = trees[t]
+        left = np.asarray(tree['left_children'], dtype=np.int64)
+        right = np.asarray(tree['right_children'], dtype=np.int64)
+        column = np.asarray(tree['split_indices'], dtype=np.int64)
+        threshold = np.asarray(tree['split_conditions'], dtype=np.float32)
+        default_left = np.asarray(tree['default_left'], dtype=bool)
+        leaf = left < 0
+        nodes = np.arange(len(left))
+
+        # One-hot column -> (input feature, category code)
+        f = np.clip(np.searchsorted(offsets, column, side='right') - 1, 0, len(features) - 1)
+        c = column - offsets[f]
+        # A present category has the value 1.0: XGBoost goes left when value < threshold
+        goes_left = np.float32(1.0) < threshold
+        feature.append(np.where(leaf, -1, f))
+        code.append(np.where(leaf, -1, c))
+        present.append(np.where(leaf, nodes, np.where(goes_left, left, right)) + base)
+        absent.append(np.where(leaf, nodes, np.where(default_left, left, right)) + base)
+        value.append(np.where(leaf, threshold, 0.0))
+        roots.append(base)
+        classes.append(tree_info[t])
+        base += len(left)
+
+        # Leaf bits below every node; children always have higher ids than their parent
+        slot = np.cumsum(leaf) - 1
+        below = [0] * len(left)
+        for n in reversed(range(len(left))):
+            below[n] = 1 << int(slot[n]) if leaf[n] else below[left[n]] | below[right[n]]
+        full = below[0]
+        splits.append([(int(f[n]), int(c[n]),
+                        full & ~below[right[n] if goes_left[n] else left[n]],
+                        full & ~below[right[n] if default_left[n] else left[n]])
+                       for n in nodes[~leaf]])
+        leaf_values.append(threshold[leaf])
+
+    dtype, words = mask_dtype(max(len(v) for v in leaf_values))
+    mask_rows = np.cumsum([0] + [c + 1 for c in cardinalities])
+    masks = np.full((mask_rows[-1], len(roots), words), np.iinfo(dtype).max, dtype=dtype)
+    leaves = np.zeros((len(roots), words * np.dtype(dtype).itemsize * 8), dtype=np.float32)
+    for t, (tree_splits, values) in enumerate(zip(splits, leaf_values)):
+        leaves[t, :len(values)] = values
+        for f, c, keep_present, keep_absent in tree_splits:
+            hit = masks[mask_rows[f] + c, t] & to_words(keep_present, dtype, words)
+            masks[mask_rows[f]:mask_rows[f + 1], t] &= to_words(keep_absent, dtype, words)
+            masks[mask_rows[f] + c, t] = hit
+
+    arrays = {
+        'feature': np.concatenate(feature).astype(np.int32),
+        'code': np.concatenate(code).astype(np.int32),
+        'present': np.concatenate(present).astype(np.int32),
+        'absent': np.concatenate(absent).astype(np.int32),
+        'value': np.concatenate(value).astype(np.float32),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'classes': np.asarray(classes, dtype=np.int32),
+        'masks': masks,
+        'mask_rows': mask_rows.astype(np.int32),
+        'leaves': leaves
+    }
+    meta = {'n_classes': n_classes, 'base_score': float(learner['learner_model_param']['base_score'])}
+    return arrays, meta
+
+
+class TreeEnsemble:
+    # predict / predict_proba on a DataFrame, like ProductModel, from the compiled tables
+    def __init__(self, arrays, features, categories, n_classes, base_score):
+        self.features = list(features)
+        self.categories = [pd.Index(categories[f]) for f in self.features]
+        self.codes = [{value: code for code, value in enumerate(categories[f])} for f in self.features]
+        self.arrays = arrays
+        self.masks = arrays['masks']
+        self.mask_rows = np.asarray(arrays['mask_rows'], dtype=np.int64)
+        self.unknown = self.mask_rows[1:] - 1
+        self.cardinality = self.unknown - self.mask_rows[:-1]
+        self.leaves = arrays['leaves']
+        self.base_score = np.float32(base_score)
+        self.n_trees = self.masks.shape[1]
+        self.bits = self.masks.dtype.itemsize * 8
+        self.trees = np.arange(self.n_trees)
+        # Exit-leaf lookups by mask value: for 8-bit masks the leaf value itself
+        # (trees x 256), for 16-bit masks the lowest set bit; wider ones compute it
+        self.by_mask = self.low_bit = None
+        if self.bits <= 16 and self.masks.shape[2] == 1:
+            low_bit = np.array([(v & -v).bit_length() - 1 for v in range(1 << self.bits)], dtype=np.int16)
+            if self.bits == 8:
+                self.by_mask = self.leaves[:, np.maximum(low_bit, 0)]
+            else:
+                self.low_bit = low_bit
+        # Tree -> class as a (trees x classes) 0/1 matrix: per-class sums are one matmul
+        self.assign = np.zeros((self.n_trees, n_classes), dtype=np.float32)
+        self.assign[np.arange(self.n_trees), arrays['classes']] = 1.0
+
+    def encode(self, df):
+        # Category code per input feature, -1 for unknown values
+        missing = [f for f in self.features if f not in df.columns]
+        if missing:
+            raise ValueError(f"columns are missing: {set(missing)}")
+        return np.stack([categories.get_indexer(df[feature])
+                         for feature, categories in zip(self.features, self.categories)], axis=1)
+
+    def encode_records(self, records):
+        # Same as encode() for request dicts, without building a DataFrame (single-row requests)
+        for record in records:
+            missing = [f for f in self.features if f not in record]
+            if missing:
+                raise ValueError(f"columns are missing: {set(missing)}")
+        return self.encode_rows([[record[f] for f in self.features] for record in records])
+
+    def encode_rows(self, rows):
+        # Rows of values in self.features order (e.g. decoded request structs)
+        out = np.empty((len(rows), len(self.features)), dtype=np.int64)
+        for i, row in enumerate(rows):
+            for j, (value, codes) in enumerate(zip(row, self.codes)):
+                out[i, j] = codes.get(value, -1) if isinstance(value, str) else -1
+        return out
+
+    def reachable(self, codes):
+        # Leaf bitmask per (row, tree): one table row per input feature, AND-ed; codes outside
+        # [0, cardinality) read the unknown-value row instead of another feature's table
+        known = (codes >= 0) & (codes < self.cardinality)
+        rows = np.where(known, codes + self.mask_rows[:-1], self.unknown)
+        reachable = self.masks[rows[:, 0]]
+        for f in range(1, rows.shape[1]):
+            reachable &= self.masks[rows[:, f]]
+        return reachable
+
+    def leaf_values(self, reachable):
+        if self.by_mask is not None:
+            return self.by_mask[self.trees, reachable[:, :, 0]]
+        if self.low_bit is not None:
+            return self.leaves[self.trees, self.low_bit[reachable[:, :, 0]]]
+        # Wide masks: first non-zero word, then its lowest set bit (exact in float64)
+        first = np.argmax(reachable != 0, axis=2)
+        word = np.take_along_axis(reachable, first[:, :, None], axis=2)[:, :, 0].astype(np.uint64)
+        low = np.log2((word & (~word + np.uint64(1))).astype(np.float64)).astype(np.int64)
+        return self.leaves[self.trees, first * self.bits + low]
+
+    def margins(self, codes):
+        codes = np.asarray(codes, dtype=np.int64)
+        out = np.empty((len(codes), self.assign.shape[1]), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = codes[start:start + BLOCK_ROWS]
+            out[start:start + len(block)] = self.leaf_values(self.reachable(block)) @ self.assign
+        return out + self.base_score
+
+    def traverse(self, codes):
+        # Reference: margins by walking the node tables level by level (slow, for parity checks)
+        a = self.arrays
+        codes = np.asarray(codes, dtype=np.int64)
+        rows = np.arange(len(codes))[:, None]
+        nodes = np.broadcast_to(a['roots'], (len(codes), self.n_trees))
+        while True:
+            f = a['feature'][nodes]
+            if (f < 0).all():
+                break
+            hit = codes[rows, np.maximum(f, 0)] == a['code'][nodes]
+            nodes = np.where(hit, a['present'][nodes], a['absent'][nodes])
+        return a['value'][nodes] @ self.assign + self.base_score
+
+    def predict_proba_codes(self, codes):
+        margins = self.margins(codes)
+        exp = np.exp(margins - margins.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, df):
+        return self.predict_proba_codes(self.encode(df))
+
+    def predict(self, df):
+        return np.argmax(self.margins(self.encode(df)), axis=1)
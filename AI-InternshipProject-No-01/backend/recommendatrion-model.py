@@ -1,14 +1,28 @@
+import argparse
+import os
+import time
+
 import pandas as pd
-from sklearn.model_selection import train_test_split, GridSearchCV
+from sklearn.model_selection import train_test_split, GridSearchCV, check_cv
+from sklearn.base import is_classifier
 from sklearn.preprocessing import OneHotEncoder, LabelEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import accuracy_score, classification_report
 from xgboost import XGBClassifier
 import pickle
+from product_lookup import ProductLookup, file_digest
+from model_artifacts import PRODUCT_ARTIFACT, save_product
+from product_search import halving_search, thread_split
+
+# Product recommendation model training.
+#
+#   python recommendatrion-model.py                      # successive-halving search (default)
+#   python recommendatrion-model.py --search grid        # the original GridSearchCV
+#   python recommendatrion-model.py --compare            # run both, report the wall-clock saving
+#   python recommendatrion-model.py --jobs 4 --threads 2 # joblib workers x XGBoost threads
 
-# Load data
-df = pd.read_csv('/home/shayan/Desktop/Ammad stuff/all/AI-InternshipProjectNo1/backend/customer_recommendations_better.csv')
+BACKEND = os.path.dirname(os.path.abspath(__file__))
 
 # Features and target
 features = [
@@ -22,54 +36,113 @@ features = [
 ]
 target = 'suggested_product'
 
-# Drop missing data
-df = df[features + [target]].dropna()
+# Search space (same grid as before)
+param_grid = {
+    'classifier__n_estimators': [100, 200],
+    'classifier__max_depth': [3, 5, 7],
+    'classifier__learning_rate': [0.01, 0.1, 0.3]
+}
 
-# Split X and y
-X = df[features]
-y = df[target]
 
-# Encode labels (for output class)
-label_encoder = LabelEncoder()
-y_encoded = label_encoder.fit_transform(y)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the product recommendation model")
+    parser.add_argument('--path', default=os.path.join(BACKEND, 'customer_recommendations_better.csv'))
+    parser.add_argument('--search', choices=['halving', 'grid'], default='halving')
+    parser.add_argument('--compare', action='store_true', help="Run both searches and report the saving")
+    parser.add_argument('--eta', type=int, default=3, help="Halving factor: keep the best 1/eta per rung")
+    parser.add_argument('--jobs', type=int, help="Parallel candidate fits (default: CPUs / threads)")
+    parser.add_argument('--threads', type=int, help="XGBoost threads per fit (default: 1 with 4+ CPUs)")
+    parser.add_argument('--output', default=BACKEND, help="Folder for the .pkl, lookup table and models/")
+    return parser.parse_args()
 
-# Train-test split
-X_train, X_test, y_train, y_test = train_test_split(X, y_encoded, test_size=0.2, random_state=42)
 
-# Preprocessing pipeline (OneHot for all features)
-preprocessor = ColumnTransformer([
-    ('cat', OneHotEncoder(handle_unknown='ignore'), features)
-])
+def build_pipeline(threads=None):
+    # Preprocessing pipeline (OneHot for all features)
+    preprocessor = ColumnTransformer([
+        ('cat', OneHotEncoder(handle_unknown='ignore'), features)
+    ])
 
-# XGBoost model inside pipeline
-pipeline = Pipeline([
-    ('preprocessor', preprocessor),
-    ('classifier', XGBClassifier(use_label_encoder=False, eval_metric='mlogloss'))
-])
+    # XGBoost model inside pipeline
+    return Pipeline([
+        ('preprocessor', preprocessor),
+        ('classifier', XGBClassifier(use_label_encoder=False, eval_metric='mlogloss', n_jobs=threads))
+    ])
 
-# GridSearch parameters
-param_grid = {
-    'classifier__n_estimators': [100, 200],
-    'classifier__max_depth': [3, 5, 7],
-    'classifier__learning_rate': [0.01, 0.1, 0.3]
-}
 
-# Grid Search with CV
-grid_search = GridSearchCV(pipeline, param_grid, cv=3, verbose=1, n_jobs=-1)
-grid_search.fit(X_train, y_train)
+def grid_search(X_train, y_train, jobs, threads):
+    # Grid Search with CV: every candidate refits the encoder and trains all its trees
+    started = time.perf_counter()
+    grid = GridSearchCV(build_pipeline(threads), param_grid, cv=3, verbose=1, n_jobs=jobs)
+    grid.fit(X_train, y_train)
+    return grid.best_params_, grid.best_score_, time.perf_counter() - started
+
+
+def main():
+    args = parse_args()
+    jobs, threads = thread_split(args.jobs, args.threads)
+
+    # Load data
+    df = pd.read_csv(args.path)
+
+    # Drop missing data
+    df = df[features + [target]].dropna()
+
+    # Split X and y
+    X = df[features]
+    y = df[target]
+
+    # Encode labels (for output class)
+    label_encoder = LabelEncoder()
+    y_encoded = label_encoder.fit_transform(y)
+
+    # Train-test split
+    X_train, X_test, y_train, y_test = train_test_split(X, y_encoded, test_size=0.2, random_state=42)
+
+    grid = {name.split('__', 1)[1]: values for name, values in param_grid.items()}
+    print(f"⚙️ {jobs} parallel fits x {threads} XGBoost threads")
+    if args.compare or args.search == 'halving':
+        # Same folds GridSearchCV(cv=3) would use for this pipeline (KFold when the
+        # installed xgboost does not register as a sklearn classifier)
+        cv = check_cv(3, y_train, classifier=is_classifier(build_pipeline()))
+        best_params, best_score, seconds = halving_search(X_train, y_train, features, grid, cv=cv, eta=args.eta,
+                                                          jobs=jobs, threads=threads)
+        print(f"⏱️ Successive halving: {seconds:.1f}s, CV accuracy {best_score:.4f}, {best_params}")
+    if args.compare or args.search == 'grid':
+        grid_params, grid_score, grid_seconds = grid_search(X_train, y_train, jobs, threads)
+        print(f"⏱️ GridSearchCV: {grid_seconds:.1f}s, CV accuracy {grid_score:.4f}, {grid_params}")
+        if args.compare:
+            print(f"📉 Wall-clock saving: {grid_seconds - seconds:.1f}s ({(1 - seconds / grid_seconds) * 100:.0f}%, "
+                  f"{grid_seconds / seconds:.1f}x faster)")
+        else:
+            best_params, best_score = grid_params, grid_score
+
+    # Best model, refitted on the whole training split
+    best_model = build_pipeline(threads).set_params(**best_params)
+    best_model.fit(X_train, y_train)
+
+    # Evaluate
+    y_pred = best_model.predict(X_test)
+    accuracy = accuracy_score(y_test, y_pred)
+    print("✅ Best Hyperparameters:", best_params)
+    print("🎯 Model Accuracy:", round(accuracy * 100, 2), "%")
+    print("\n📊 Classification Report:\n", classification_report(label_encoder.inverse_transform(y_test), label_encoder.inverse_transform(y_pred)))
+
+    # Save model and label encoder
+    model_path = os.path.join(args.output, 'product_recommendation_model.pkl')
+    with open(model_path, 'wb') as f:
+        pickle.dump((best_model, label_encoder), f)
+
+    print("✅ Model and encoder saved as product_recommendation_model.pkl")
 
-# Best model
-best_model = grid_search.best_estimator_
+    # Precompute predictions for every observed input combination (served by app.py)
+    lookup = ProductLookup.build(best_model, df, features, file_digest(model_path))
+    lookup.save(os.path.join(args.output, 'product_lookup.npz'))
+    print(f"✅ Lookup table with {len(lookup.keys)} combinations saved as product_lookup.npz")
 
-# Evaluate
-y_pred = best_model.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
-print("✅ Best Hyperparameters:", grid_search.best_params_)
-print("🎯 Model Accuracy:", round(accuracy * 100, 2), "%")
-print("\n📊 Classification Report:\n", classification_report(label_encoder.inverse_transform(y_test), label_encoder.inverse_transform(y_pred)))
+    # Versioned artifact loaded by app.py: native XGBoost model + one-hot layout + lookup arrays
+    manifest = save_product(os.path.join(args.output, PRODUCT_ARTIFACT), best_model, label_encoder, features, lookup)
+    print(f"✅ Product artifact {manifest['version']} saved in {PRODUCT_ARTIFACT}/")
 
-# Save model and label encoder
-with open('product_recommendation_model.pkl', 'wb') as f:
-    pickle.dump((best_model, label_encoder), f)
 
-print("✅ Model and encoder saved as product_recommendation_model.pkl")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+import errno
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+
+import msgpack
+import numpy as np
+import pandas as pd
+
+from churn_kernel import status_column
+
+# Binary scoring RPC for internal callers, next to the JSON routes.
+#
+# Frames are a 4-byte big-endian length followed by one msgpack map; a
+# connection carries any number of request / response frames in order.
+# Feature matrices travel as raw little-endian buffers (msgpack bin), so a
+# batch is decoded with one np.frombuffer instead of JSON + DataFrame:
+#
+#   {"method": "schema"}
+#       -> {"churn": {"version", "features", "account_status_codes"},
+#           "product": {"version", "features", "categories", "classes"}}
+#   {"method": "churn", "x": <float64 rows x features>}   account_status as its code
+#   {"method": "churn", "rows": [[value, ...], ...]}      values in feature order
+#       -> {"version", "proba": <float64 rows>}           NaN for invalid rows (incl. unknown status)
+#   {"method": "product", "codes": <int32 rows x features>, "k": 3}   category codes, -1 unknown
+#   {"method": "product", "rows": [[value, ...], ...], "k": 3}
+#       -> {"version", "top": <int32 rows x k>, "proba": <float32 rows x k>}   indices into classes
+#
+# Any request may carry an "id", echoed back; failures answer {"id", "error"}.
+# The service reads the models through the same registry as the Flask app, so
+# hot-swapped versions apply to both. The address is a Unix socket path or
+# host:port; serve.py binds it once in the master and every worker accepts on it.
+
+LENGTH = struct.Struct('>I')
+MAX_FRAME = 256 * 1024 * 1024
+
+
+class RpcError(Exception):
+    pass
+
+
+def listen(address, backlog=1024):
+    # Listening socket for a Unix path or host:port, inheritable so forked workers can accept on it
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, int(port)))
+    else:
+        if os.path.exists(address):
+            # Only a stale socket file is replaced, never one a live server accepts on
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(address)
+            except OSError:
+                os.remove(address)
+            else:
+                raise OSError(errno.EADDRINUSE, f"{address} is already served by another process")
+            finally:
+                probe.close()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(address)
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def connect(address):
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+        sock = socket.create_connection((host, int(port)))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address)
+    return sock
+
+
+def recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    while n:
+        got = sock.recv_into(view[-n:], n)
+        if not got:
+            raise ConnectionError("connection closed mid-frame")
+        n -= got
+    return buf
+
+
+def read_frame(sock):
+    # Next message, or None when the peer closed the connection between frames
+    header = sock.recv(LENGTH.size, socket.MSG_WAITALL)
+    if not header:
+        return None
+    if len(header) < LENGTH.size:
+        header += recv_exact(sock, LENGTH.size - len(header))
+    (size,) = LENGTH.unpack(header)
+    if size > MAX_FRAME:
+        raise RpcError(f"frame of {size} bytes exceeds {MAX_FRAME}")
+    return msgpack.unpackb(recv_exact(sock, size), raw=False)
+
+
+def write_frame(sock, message):
+    body = msgpack.packb(message, use_bin_type=True)
+    sock.sendall(LENGTH.pack(len(body)) + body)
+
+
+def matrix(message, key, dtype, columns):
+    data = np.frombuffer(message[key], dtype=np.dtype(dtype).newbyteorder('<'))
+    if len(data) % columns:
+        raise RpcError(f"{key} has {len(data)} values, not a multiple of {columns} features")
+    return data.reshape(-1, columns)
+
+
+def top_k(proba, k):
+    # Same ordering as product_top_k() in app.py, as class indices
+    k = max(1, min(k, proba.shape[1]))
+    idx = np.argpartition(-proba, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(proba, idx, axis=1), axis=1, kind='stable')
+    idx = np.take_along_axis(idx, order, axis=1)
+    return idx, np.take_along_axis(proba, idx, axis=1)
+
+
+class ScoringService:
+    # Dispatches decoded requests; get_model(name) returns the active model namespace (see app.py)
+    def __init__(self, get_model, product_features, default_k=3):
+        self.get_model = get_model
+        self.product_features = list(product_features)
+        self.default_k = default_k
+
+    def model(self, name):
+        loaded = self.get_model(name)
+        if loaded is None:
+            raise RpcError(f"{name} model not available")
+        return loaded
+
+    def handle(self, message):
+        if not isinstance(message, dict):
+            raise RpcError("expected a msgpack map")
+        method = message.get('method')
+        if method == 'churn':
+            return self.churn(message)
+        if method == 'product':
+            return self.product(message)
+        if method == 'schema':
+            return self.schema()
+        raise RpcError(f"unknown method {method!r}")
+
+    def schema(self):
+        result = {}
+        churn = self.get_model('churn')
+        if churn is not None:
+            result['churn'] = {"version": churn.version, "features": churn.features,
+                               "account_status_codes": churn.status_codes}
+        product = self.get_model('product')
+        if product is not None:
+            trees = product.trees
+            result['product'] = {
+                "version": product.version,
+                "features": self.product_features,
+                "categories": {f: [str(v) for v in c] for f, c in zip(trees.features, trees.categories)}
+                if trees is not None else None,
+                "classes": [str(c) for c in product.label_encoder.classes_]
+            }
+        return result
+
+    def churn(self, message):
+        churn = self.model('churn')
+        # Unknown account_status codes or names make the row invalid, as /predict-churn rejects them
+        status = churn.features.index('account_status')
+        if 'x' in message:
+            X = matrix(message, 'x', np.float64, len(churn.features)).copy()
+            X[:, status] = status_column(churn.status_codes, X[:, status])
+        elif 'rows' in message:
+            frame = pd.DataFrame(message['rows'], columns=churn.features)
+            frame['account_status'] = status_column(churn.status_codes, frame['account_status'])
+            X = frame.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+        else:
+            raise RpcError("churn needs x or rows")
+
+        valid = np.isfinite(X).all(axis=1)
+        proba = np.full(len(X), np.nan)
+        if valid.any():
+            if churn.kernel is not None:
+                proba[valid] = churn.kernel.predict_proba(X[valid])
+            else:
+                scaled = churn.scaler.transform(pd.DataFrame(X[valid], columns=churn.features))
+                proba[valid] = churn.model.predict_proba(scaled)[:, 1]
+        return {"version": churn.version, "proba": proba.astype('<f8').tobytes()}
+
+    def product(self, message):
+        product = self.model('product')
+        k = message.get('k', self.default_k)
+        if not isinstance(k, int) or k <= 0:
+            raise RpcError("k must be a positive integer")
+        trees = product.trees
+        if 'codes' in message:
+            if trees is None:
+                raise RpcError("category codes need the compiled product model; send rows")
+            codes = matrix(message, 'codes', np.int32, len(trees.features))
+            if ((codes < -1) | (codes >= np.array([len(c) for c in trees.categories]))).any():
+                raise RpcError("category code out of range")
+            proba = trees.predict_proba_codes(codes)
+        elif 'rows' in message:
+            df = pd.DataFrame(message['rows'], columns=self.product_features)
+            proba = trees.predict_proba(df) if trees is not None else product.model.predict_proba(df)
+        else:
+            raise RpcError("product needs codes or rows")
+
+        idx, scores = top_k(np.asarray(proba, dtype=np.float32), k)
+        return {"version": product.version, "top": idx.astype('<i4').tobytes(),
+                "proba": scores.astype('<f4').tobytes()}
+
+
+class RpcHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        service = self.server.service
+        while True:
+            try:
+                message = read_frame(self.request)
+            except (ConnectionError, OSError):
+                return
+            except Exception as e:
+                # Bad length or undecodable body: the stream cannot be resynchronized
+                write_frame(self.request, {"error": str(e)})
+                return
+            if message is None:
+                return
+            request_id = message.get('id') if isinstance(message, dict) else None
+            try:
+                response = service.handle(message)
+            except (RpcError, KeyError, ValueError, TypeError) as e:
+                response = {"error": str(e)}
+            except Exception as e:
+                logging.error(f"❌ RPC error: {e}")
+                response = {"error": "Internal Server Error"}
+            if request_id is not None:
+                response["id"] = request_id
+            try:
+                write_frame(self.request, response)
+            except OSError:
+                return
+
+
+class RpcServer(socketserver.ThreadingMixIn, socketserver.BaseServer):
+    # One thread per connection on an already listening socket
+    daemon_threads = True
+
+    def __init__(self, service, sock):
+        super().__init__(sock.getsockname(), RpcHandler)
+        self.service = service
+        self.socket = sock
+
+    def fileno(self):
+        return self.socket.fileno()
+
+    def get_request(self):
+        conn, address = self.socket.accept()
+        if conn.family != socket.AF_UNIX:
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return conn, address
+
+    def shutdown_request(self, request):
+        try:
+            request.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+        request.close()
+
+
+def start_rpc_server(service, sock):
+    # Accept loop on a daemon thread of the calling process; returns the server (server.shutdown() stops it)
+    server = RpcServer(service, sock)
+    threading.Thread(target=server.serve_forever, name='scoring-rpc', daemon=True).start()
+    logging.info(f"✅ Scoring RPC listening on {sock.getsockname() or sock}")
+    return server
+
+
+class RpcClient:
+    # Blocking client; one request in flight per client
+    def __init__(self, address):
+        self.sock = connect(address)
+        self.next_id = 0
+
+    def call(self, method, **params):
+        self.next_id += 1
+        write_frame(self.sock, dict(params, method=method, id=self.next_id))
+        response = read_frame(self.sock)
+        if response is None:
+            raise ConnectionError("server closed the connection")
+        if 'error' in response:
+            raise RpcError(response['error'])
+        return response
+
+    def churn(self, X):
+        response = self.call('churn', x=np.ascontiguousarray(X, dtype='<f8').tobytes())
+        return np.frombuffer(response['proba'], dtype='<f8')
+
+    def product(self, codes, k=3):
+        response = self.call('product', codes=np.ascontiguousarray(codes, dtype='<i4').tobytes(), k=k)
+        top = np.frombuffer(response['top'], dtype='<i4').reshape(len(codes), -1)
+        return top, np.frombuffer(response['proba'], dtype='<f4').reshape(len(codes), -1)
+
+    def close(self):
+        self.sock.close()
@@ -0,0 +1,297 @@
+import argparse
+import gc
+import logging
+import os
+import random
+import shutil
+import signal
+import socket
+import sys
+import time
+
+from werkzeug.serving import BaseWSGIServer
+
+# Pre-fork production entry point for the combined API.
+#
+# The master imports app.py once, so churn_model.pkl and
+# product_recommendation_model.pkl are loaded a single time, then forks N
+# workers that share those pages copy-on-write and accept on one listening
+# socket. Workers are recycled after --max-requests (+ jitter), on SIGHUP
+# (rolling restart) or when they die. The master also watches the model files:
+# when a retrained model appears it loads and smoke-tests it, then rolls the
+# workers over to it, so no worker ever loads a model on the request path.
+#
+#   python serve.py --workers 4 --port 5000
+#   API_WORKERS=4 python serve.py
+#
+# Signals to the master: SIGTERM/SIGINT graceful stop, SIGHUP reload changed
+# models and recycle all workers, SIGTTIN / SIGTTOU add / remove one worker.
+#
+# Every worker runs its own /predict-file job queue and training pool, so the
+# --forecast-workers / --forecast-max-pending budgets (FORECAST_WORKERS /
+# FORECAST_MAX_PENDING) are totals for the whole server: each worker gets
+# total // --workers, at least 1. Workers added later with SIGTTIN get the same
+# share, so the bound grows with them.
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pre-fork server for the combined API")
+    parser.add_argument('--host', default=os.environ.get('API_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('API_PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('API_WORKERS', os.cpu_count() or 1)),
+                        help="Worker processes (env API_WORKERS, default: CPU count)")
+    parser.add_argument('--max-requests', type=int, default=int(os.environ.get('API_MAX_REQUESTS', 0)),
+                        help="Recycle a worker after this many requests, 0 = never (env API_MAX_REQUESTS)")
+    parser.add_argument('--max-requests-jitter', type=int, default=int(os.environ.get('API_MAX_REQUESTS_JITTER', 0)),
+                        help="Random extra requests per worker so they do not all recycle together")
+    parser.add_argument('--rpc', default=os.environ.get('SCORING_RPC_ADDRESS'),
+                        help="Also serve the binary scoring RPC on this Unix socket or host:port "
+                             "(env SCORING_RPC_ADDRESS)")
+    parser.add_argument('--forecast-workers', type=int, default=int(os.environ.get('FORECAST_WORKERS', 2)),
+                        help="Forecast training processes across all workers (env FORECAST_WORKERS)")
+    parser.add_argument('--forecast-max-pending', type=int, default=int(os.environ.get('FORECAST_MAX_PENDING', 8)),
+                        help="Queued or running forecast jobs across all workers before /predict-file "
+                             "answers 503 (env FORECAST_MAX_PENDING)")
+    parser.add_argument('--graceful-timeout', type=float, default=30.0,
+                        help="Seconds a stopping worker gets to finish its request before SIGKILL")
+    return parser.parse_args()
+
+
+class Worker:
+    def __init__(self, app, sock, max_requests, on_exit=None):
+        self.app = app
+        self.on_exit = on_exit
+        self.sock = sock
+        self.max_requests = max_requests
+        self.alive = True
+        self.requests = 0
+
+    def stop(self, *_):
+        self.alive = False
+
+    def counted(self, environ, start_response):
+        self.requests += 1
+        return self.app(environ, start_response)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        for sig in (signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(sig, signal.SIG_DFL)
+
+        host, port = self.sock.getsockname()[:2]
+        server = BaseWSGIServer(host, port, self.counted, fd=self.sock.fileno())
+        server.timeout = 1.0  # wake up regularly to notice SIGTERM or a dead master
+        master = os.getppid()
+
+        # One request at a time: the in-flight request always completes before a stop
+        while self.alive and os.getppid() == master:
+            server.handle_request()
+            if self.max_requests and self.requests >= self.max_requests:
+                logging.info(f"♻️ Worker {os.getpid()} served {self.requests} requests, recycling")
+                break
+
+        if self.on_exit is not None:
+            self.on_exit()
+
+
+class Arbiter:
+    def __init__(self, app, sock, args, on_worker_exit=None, models=None, on_worker_start=None):
+        self.app = app
+        self.on_worker_start = on_worker_start
+        self.on_worker_exit = on_worker_exit
+        self.models = models
+        self.next_model_check = 0.0
+        self.sock = sock
+        self.args = args
+        self.target = max(1, args.workers)
+        self.workers = {}  # pid -> start time, until reaped
+        self.retiring = set()  # workers sent SIGTERM, still tracked until they exit
+        self.stopping = False
+        self.recycle = False
+
+    def spawn(self):
+        max_requests = self.args.max_requests
+        if max_requests and self.args.max_requests_jitter:
+            max_requests += random.randint(0, self.args.max_requests_jitter)
+
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.time()
+            return pid
+
+        # Child: serve until stopped or recycled, never return into the master loop
+        code = 0
+        try:
+            random.seed()
+            if self.on_worker_start is not None:
+                self.on_worker_start()
+            Worker(self.app, self.sock, max_requests, self.on_worker_exit).run()
+        except Exception as e:
+            logging.error(f"❌ Worker {os.getpid()} crashed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self.workers.pop(pid, None)
+            self.retiring.discard(pid)
+            if not self.stopping:
+                logging.info(f"🔁 Worker {pid} exited ({status}), {len(self.workers)} left")
+
+    def kill_workers(self, sig):
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                self.workers.pop(pid, None)
+                self.retiring.discard(pid)
+
+    def on_stop(self, *_):
+        self.stopping = True
+
+    def on_hup(self, *_):
+        self.recycle = True
+
+    def on_ttin(self, *_):
+        self.target += 1
+
+    def on_ttou(self, *_):
+        self.target = max(1, self.target - 1)
+
+    def check_models(self):
+        # Load retrained models here, off the request path; new workers fork with them
+        if self.models is None or time.time() < self.next_model_check:
+            return
+        self.next_model_check = time.time() + self.models.poll_interval
+        if self.models.reload():
+            self.recycle = True
+
+    def active(self):
+        return [pid for pid in self.workers if pid not in self.retiring]
+
+    def retire(self, pid):
+        # Stays in self.workers until reap() collects it, so shutdown still waits for it
+        self.retiring.add(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def rolling_restart(self):
+        # Start a replacement before stopping each old worker so capacity never drops
+        self.recycle = False
+        if self.models is not None:
+            self.models.reload()
+            gc.collect()
+            gc.freeze()
+        for pid in self.active():
+            self.spawn()
+            self.retire(pid)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.on_stop)
+        signal.signal(signal.SIGINT, self.on_stop)
+        signal.signal(signal.SIGHUP, self.on_hup)
+        signal.signal(signal.SIGTTIN, self.on_ttin)
+        signal.signal(signal.SIGTTOU, self.on_ttou)
+
+        logging.info(f"🚀 Master {os.getpid()} serving on {self.sock.getsockname()} with {self.target} workers")
+        while not self.stopping:
+            self.reap()
+            self.check_models()
+            if self.recycle:
+                self.rolling_restart()
+            while len(self.active()) < self.target:
+                self.spawn()
+            active = self.active()
+            if len(active) > self.target:
+                self.retire(min(active, key=self.workers.get))
+            time.sleep(0.5)
+
+        # Graceful shutdown: let in-flight requests finish, then force
+        self.kill_workers(signal.SIGTERM)
+        deadline = time.time() + self.args.graceful_timeout
+        while self.workers and time.time() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        self.kill_workers(signal.SIGKILL)
+        self.reap()
+        logging.info("👋 Master stopped")
+
+
+def main():
+    args = parse_args()
+
+    # Listening socket is created before the fork and inherited by every worker
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+
+    # Load the models once in the master (app.py resolves its files relative to backend/)
+    backend = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(backend)
+    sys.path.insert(0, backend)
+
+    # Workers dump their latency histograms (drift sketches in drift/, product lookup
+    # hits in lookup/<model version>/) here so /internal/metrics, /metrics/drift and
+    # /product-lookup/stats on any worker report all of them; start each run from an
+    # empty folder
+    metrics_dir = os.environ.setdefault('API_METRICS_DIR', os.path.join(backend, 'api_metrics'))
+    os.makedirs(metrics_dir, exist_ok=True)
+    for folder in (metrics_dir, os.path.join(metrics_dir, 'drift')):
+        for name in os.listdir(folder) if os.path.isdir(folder) else ():
+            if name.endswith('.json'):
+                os.remove(os.path.join(folder, name))
+    shutil.rmtree(os.path.join(metrics_dir, 'lookup'), ignore_errors=True)
+
+    # The master watches the model files itself (see Arbiter.check_models)
+    os.environ['API_PREFORK'] = '1'
+
+    # app.py sizes one worker's forecast queue and pool from these; split the totals
+    workers = max(1, args.workers)
+    os.environ['FORECAST_WORKERS'] = str(max(1, args.forecast_workers // workers))
+    os.environ['FORECAST_MAX_PENDING'] = str(max(1, args.forecast_max_pending // workers))
+
+    from app import app, forecast_jobs, stage_metrics, churn_drift, models, scoring_service
+    from scoring_rpc import listen, start_rpc_server
+    logging.info(f"ℹ️ Forecast budget per worker: {os.environ['FORECAST_WORKERS']} training processes, "
+                 f"{os.environ['FORECAST_MAX_PENDING']} pending jobs")
+
+    # Like the HTTP socket, the RPC socket is bound once and every worker accepts on it
+    rpc_sock = listen(args.rpc) if args.rpc else None
+
+    # Move everything allocated so far out of the GC's reach, so collections in
+    # the workers do not touch (and copy) the shared model pages
+    gc.collect()
+    gc.freeze()
+
+    # Workers drain their forecast training pool and dump their final latency,
+    # drift and lookup counts before exiting
+    def on_worker_exit():
+        forecast_jobs.shutdown(wait=True)
+        stage_metrics.flush()
+        if churn_drift is not None:
+            churn_drift.flush()
+        product = models.get('product')
+        if product is not None and product.lookup is not None:
+            product.lookup.counters.flush()
+
+    def on_worker_start():
+        if rpc_sock is not None:
+            start_rpc_server(scoring_service, rpc_sock)
+
+    Arbiter(app, sock, args, on_worker_exit=on_worker_exit, models=models, on_worker_start=on_worker_start).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# app.py and the models resolve their files relative to backend/, as under serve.py
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.chdir(BACKEND)
@@ -0,0 +1,136 @@
+import json
+
+import pytest
+
+from app import app, CHURN_FEATURES, PRODUCT_FEATURES
+
+# Payloads the dict + float(...) handlers accepted before the msgspec schemas
+
+CHURN_RECORD = {
+    'customer_tenure': 46, 'number_of_services_or_products': 1, 'average_monthly_usage': 156.21,
+    'days_since_last_interaction': 192, 'complaints_resolved_ratio': 0.84, 'total_spent': 8691.93,
+    'average_transaction_value': 869.19, 'discount_or_offer_received': 1, 'account_status': 'Closed'
+}
+PRODUCT_RECORD = {
+    'region': 'Karachi', 'gender': 'Male', 'user_age_group': '26-35', 'user_preferences': 'casual',
+    'season': 'Summer', 'product_keywords': 'cotton', 'previous_buy': 'tshirt'
+}
+
+
+@pytest.fixture(scope='module')
+def client():
+    return app.test_client()
+
+
+@pytest.mark.parametrize('engine', ['', '?engine=sklearn'])
+@pytest.mark.parametrize('variant', [
+    {'customer_tenure': '46', 'total_spent': '8691.93', 'complaints_resolved_ratio': '0.84'},
+    {'discount_or_offer_received': True},
+    {'discount_or_offer_received': '1', 'number_of_services_or_products': '1'},
+    {'account_status': 1},
+    {'customer_id': 'abc', 'unused_field': [1, 2]},
+])
+def test_churn_accepts_old_payloads(client, engine, variant):
+    expected = client.post('/predict-churn' + engine, json=CHURN_RECORD)
+    response = client.post('/predict-churn' + engine, json=dict(CHURN_RECORD, **variant))
+    assert expected.status_code == response.status_code == 200
+    assert response.get_json() == expected.get_json()
+
+
+def test_churn_rejects_non_numeric_value(client):
+    response = client.post('/predict-churn', json=dict(CHURN_RECORD, total_spent='a lot'))
+    assert response.status_code == 400
+    assert '$.total_spent' in response.get_json()['error']
+
+
+def test_churn_batch_keeps_per_row_errors(client):
+    rows = [CHURN_RECORD, dict(CHURN_RECORD, customer_tenure='46'), dict(CHURN_RECORD, total_spent='a lot')]
+    response = client.post('/predict-churn-batch', json=rows)
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line['row'] for line in lines] == [0, 1, 2]
+    assert lines[0]['probability'] == lines[1]['probability']
+    assert 'error' in lines[2]
+
+
+def churn_csv(*rows):
+    header = ','.join(CHURN_RECORD)
+    return '\n'.join([header] + [','.join(map(str, row)) for row in rows]) + '\n'
+
+
+@pytest.mark.parametrize('body', ['', '\n'])
+def test_churn_batch_csv_empty_body(client, body):
+    response = client.post('/predict-churn-batch', data=body, content_type='text/csv')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Empty CSV body'
+
+
+def test_churn_batch_csv_malformed(client):
+    body = churn_csv(CHURN_RECORD.values(), list(CHURN_RECORD.values()) + ['extra', 'fields'])
+    response = client.post('/predict-churn-batch', data=body, content_type='text/csv')
+    assert response.status_code == 400
+    assert 'Malformed CSV' in response.get_json()['error']
+
+
+def test_churn_batch_csv_malformed_later_chunk(client):
+    # Past pandas' first read buffer the 200 is already sent: the stream ends with an error line
+    rows = [CHURN_RECORD.values()] * 20000 + [list(CHURN_RECORD.values())[:-1] + ['"Closed']]
+    response = client.post('/predict-churn-batch?chunk=5000', data=churn_csv(*rows), content_type='text/csv')
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert all('probability' in line for line in lines[:-1])
+    assert 'Malformed CSV' in lines[-1]['error']
+
+
+@pytest.mark.parametrize('body', [{'records': []}, '[1, 2]', 'not json'])
+def test_churn_batch_rejects_non_arrays(client, body):
+    data = json.dumps(body) if isinstance(body, dict) else body
+    response = client.post('/predict-churn-batch', data=data, content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_product_accepts_old_payloads(client):
+    expected = client.post('/predict-product', json=PRODUCT_RECORD)
+    response = client.post('/predict-product', json=dict(PRODUCT_RECORD, user_id=17, extra='ignored'))
+    assert expected.status_code == response.status_code == 200
+    assert response.get_json() == expected.get_json()
+
+    as_list = client.post('/predict-product-batch', json=[dict(PRODUCT_RECORD, user_id='u1')])
+    as_records = client.post('/predict-product-batch', json={'records': [dict(PRODUCT_RECORD, user_id='u1')]})
+    assert as_list.status_code == as_records.status_code == 200
+    assert as_list.get_json() == as_records.get_json()
+    assert as_list.get_json()['results'][0]['user_id'] == 'u1'
+
+
+def test_product_batch_k_query(client):
+    response = client.post('/predict-product-batch?k=2', json=[PRODUCT_RECORD])
+    assert response.status_code == 200
+    assert response.get_json()['k'] == 2
+    assert len(response.get_json()['results'][0]['top_k']) == 2
+
+
+@pytest.mark.parametrize('k', ['abc', '2.5', '0', '-1'])
+def test_product_batch_rejects_bad_k(client, k):
+    response = client.post(f'/predict-product-batch?k={k}', json=[PRODUCT_RECORD])
+    assert response.status_code == 400
+    assert 'k' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('flag', ['1', 'true', 'True', 'yes', 'YES'])
+def test_forecast_aggregate_flag_words(client, flag):
+    # aggregate only conflicts with series when it parsed as true
+    response = client.post(f'/predict-file?series=s1&aggregate={flag}', data=b'', content_type='text/csv')
+    assert response.status_code == 400
+    assert 'aggregate applies' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('flag', ['0', 'false', 'no', ''])
+def test_forecast_aggregate_false_words(client, flag):
+    response = client.post(f'/predict-file?series=s1&aggregate={flag}', data=b'', content_type='text/csv')
+    assert 'aggregate applies' not in response.get_json().get('error', '')
+
+
+def test_features_cover_the_schemas():
+    from api_schemas import ChurnRequest, ProductRequest
+    assert set(CHURN_FEATURES) <= set(ChurnRequest.__struct_fields__)
+    assert set(PRODUCT_FEATURES) <= set(ProductRequest.__struct_fields__)
@@ -0,0 +1,57 @@
+import pandas as pd
+
+from churn_aggregates import ChurnAggregateCache
+from churn_cube import ChurnSegmentCube
+
+
+def write_unterminated(path, rows):
+    # churndata.csv's first rows, without the final newline
+    lines = open('churndata.csv', 'rb').read().splitlines()[:rows + 1]
+    path.write_bytes(b'\n'.join(lines))
+    return lines
+
+
+def expected(path):
+    df = pd.read_csv(path)
+    return len(df), float(df['churn_flag'].sum())
+
+
+def cube_totals(cube):
+    cells = cube.get().cells
+    return int(cells[..., 0].sum()), float(cells[..., 1].sum())
+
+
+def test_last_line_without_newline_is_counted(tmp_path):
+    path = tmp_path / 'churn.csv'
+    write_unterminated(path, 50)
+    aggregates, cube = ChurnAggregateCache(str(path)), ChurnSegmentCube(str(path))
+
+    total, churned = expected(path)
+    assert total == 50
+    assert (aggregates.get()['total'], aggregates.get()['churned']) == (total, churned)
+    assert cube_totals(cube) == (total, churned)
+
+
+def test_append_after_unterminated_line(tmp_path):
+    path = tmp_path / 'churn.csv'
+    lines = write_unterminated(path, 50)
+    aggregates, cube = ChurnAggregateCache(str(path)), ChurnSegmentCube(str(path))
+    aggregates.get(), cube.get()
+
+    # A new line starts with the missing newline
+    with open(path, 'ab') as f:
+        f.write(b'\n' + b'\n'.join(open('churndata.csv', 'rb').read().splitlines()[51:61]) + b'\n')
+    total, churned = expected(path)
+    assert total == 60
+    assert (aggregates.get()['total'], aggregates.get()['churned']) == (total, churned)
+    assert cube_totals(cube) == (total, churned)
+
+    # A write that extends the last counted line rebuilds instead of double counting
+    path.write_bytes(b'\n'.join(lines)[:-2])
+    aggregates.get(), cube.get()
+    with open(path, 'ab') as f:
+        f.write(lines[-1][-2:] + b'\n')
+    total, churned = expected(path)
+    assert total == 50
+    assert (aggregates.get()['total'], aggregates.get()['churned']) == (total, churned)
+    assert cube_totals(cube) == (total, churned)
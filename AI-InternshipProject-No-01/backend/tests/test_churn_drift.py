@@ -0,0 +1,60 @@
+import json
+import os
+import threading
+
+import pandas as pd
+
+from churn_drift import DriftBaseline, DriftSketch
+
+FEATURES = ['customer_tenure', 'number_of_services_or_products', 'average_monthly_usage',
+            'days_since_last_interaction', 'complaints_resolved_ratio', 'total_spent',
+            'average_transaction_value', 'discount_or_offer_received', 'account_status']
+STATUS_CODES = {'Active': 0, 'Closed': 1, 'Suspended': 2}
+
+
+def training_rows(n, seed=0):
+    df = pd.read_csv('churndata.csv', usecols=FEATURES)[FEATURES]
+    return [[float(v) if f != 'account_status' else v for f, v in zip(FEATURES, row)]
+            for row in df.sample(n, replace=True, random_state=seed).itertuples(index=False)]
+
+
+def test_thread_per_request_memory_is_bounded():
+    sketch = DriftSketch(DriftBaseline.from_csv('churndata.csv', FEATURES), STATUS_CODES)
+    for values in training_rows(500):
+        t = threading.Thread(target=sketch.observe, args=(values,))
+        t.start()
+        t.join()
+    assert len(sketch.threads.stores) <= 2
+    report = sketch.report()
+    assert report['observations'] == 500
+    assert all(f['drift'] == 'stable' for f in report['features'].values())
+
+
+def test_shift_and_unknown_status_are_flagged():
+    sketch = DriftSketch(DriftBaseline.from_csv('churndata.csv', FEATURES), STATUS_CODES)
+    usage = FEATURES.index('average_monthly_usage')
+    for values in training_rows(400, seed=1):
+        values[usage] *= 1.6
+        values[-1] = 'Paused'
+        sketch.observe(values)
+    features = sketch.report()['features']
+    assert features['average_monthly_usage']['drift'] in ('moderate', 'significant')
+    assert features['account_status']['drift'] == 'significant'
+    assert features['account_status']['share']['other'] == 1.0
+    assert features['customer_tenure']['drift'] == 'stable'
+
+
+def test_workers_merge_dumps_on_the_same_baseline(tmp_path):
+    baseline = DriftBaseline.from_csv('churndata.csv', FEATURES)
+    worker = DriftSketch(baseline, STATUS_CODES, state_dir=str(tmp_path))
+    for values in training_rows(150):
+        worker.observe(values)
+    worker.flush()
+    os.replace(tmp_path / f'{os.getpid()}.json', tmp_path / '1.json')
+    # A dump made against another baseline is ignored
+    (tmp_path / '2.json').write_text(json.dumps({"baseline": "other", "counts": [1] * (baseline.size + 1)}))
+
+    sketch = DriftSketch(baseline, STATUS_CODES, state_dir=str(tmp_path))
+    for values in training_rows(50, seed=1):
+        sketch.observe(values)
+    assert sketch.report()['observations'] == 200
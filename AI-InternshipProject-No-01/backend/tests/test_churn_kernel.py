@@ -0,0 +1,97 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from churn_kernel import ChurnKernel, status_code, status_column
+from model_artifacts import CHURN_ARTIFACT, ChurnArtifact
+
+
+@pytest.fixture(scope='module')
+def artifact():
+    return ChurnArtifact(CHURN_ARTIFACT)
+
+
+def random_rows(features, status_codes, n, seed=0):
+    # Feature ranges well beyond churndata.csv, account_status as a valid code
+    rng = np.random.default_rng(seed)
+    X = rng.normal(0, 1, (n, len(features))) * rng.choice([1, 100, 1e4], (n, len(features)))
+    X[:, features.index('account_status')] = rng.choice(list(status_codes.values()), n)
+    return X
+
+
+def test_kernel_matches_scaler_and_logistic_regression(artifact):
+    model, scaler = artifact.sklearn()
+    kernel = ChurnKernel.from_sklearn(model, scaler, artifact.features, artifact.status_codes)
+    X = random_rows(artifact.features, artifact.status_codes, 5000)
+    reference = model.predict_proba(scaler.transform(pd.DataFrame(X, columns=artifact.features)))[:, 1]
+    np.testing.assert_allclose(kernel.predict_proba(X), reference, rtol=0, atol=1e-12)
+    assert kernel.max_parity_error(model, scaler, pd.DataFrame(X, columns=artifact.features)) <= 1e-9
+
+
+def test_encode_values_maps_status_names_and_codes(artifact):
+    kernel = artifact.kernel()
+    row = [12.0] * len(artifact.features)
+    index = artifact.features.index('account_status')
+    for name, code in artifact.status_codes.items():
+        row[index] = name
+        by_name = kernel.encode_values(row)
+        row[index] = code
+        np.testing.assert_array_equal(kernel.encode_values(row), by_name)
+
+
+@pytest.mark.parametrize('status', ['Inactive', 'active', 7, -1])
+def test_unknown_status_is_rejected(artifact, status):
+    row = [12.0] * len(artifact.features)
+    row[artifact.features.index('account_status')] = status
+    with pytest.raises(ValueError, match='Unknown account_status'):
+        artifact.kernel().encode_values(row)
+    with pytest.raises(ValueError):
+        status_code(artifact.status_codes, status)
+
+
+@pytest.mark.parametrize('engine', ['', '?engine=sklearn'])
+def test_unknown_status_is_400_on_both_engines(engine):
+    from app import app, CHURN_FEATURES
+
+    record = dict.fromkeys(CHURN_FEATURES, 10.0)
+    client = app.test_client()
+    record['account_status'] = 'Inactive'
+    response = client.post('/predict-churn' + engine, json=record)
+    assert response.status_code == 400
+    assert 'Unknown account_status' in response.get_json()['error']
+
+    record['account_status'] = 'Closed'
+    by_name = client.post('/predict-churn' + engine, json=record)
+    record['account_status'] = 1
+    by_code = client.post('/predict-churn' + engine, json=record)
+    assert by_name.status_code == by_code.status_code == 200
+    assert by_name.get_json() == by_code.get_json()
+
+
+def test_status_column_matches_status_code(artifact):
+    codes = artifact.status_codes
+    statuses = list(codes) + list(codes.values()) + ['Inactive', 'active', 7, -1, -3.5, None]
+    expected = []
+    for status in statuses:
+        try:
+            expected.append(status_code(codes, status))
+        except ValueError:
+            expected.append(np.nan)
+    np.testing.assert_array_equal(status_column(codes, statuses), np.array(expected, dtype=np.float64))
+    # CSV cells arrive as text: known codes only
+    np.testing.assert_array_equal(status_column(codes, ['1', '7']), [1.0, np.nan])
+
+
+def test_batch_marks_unknown_status_invalid():
+    from app import app, CHURN_FEATURES
+
+    rows = [dict.fromkeys(CHURN_FEATURES, 10.0) for _ in range(5)]
+    for row, status in zip(rows, ['Closed', 1, 7, -3.5, 'Inactive']):
+        row['account_status'] = status
+    response = app.test_client().post('/predict-churn-batch', json=rows)
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[0]['probability'] == lines[1]['probability']
+    assert all('error' in line and 'probability' not in line for line in lines[2:])
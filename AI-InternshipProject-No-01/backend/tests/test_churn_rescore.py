@@ -0,0 +1,16 @@
+import numpy as np
+import pandas as pd
+
+from churn_rescore import Scorer
+from model_artifacts import CHURN_ARTIFACT, ChurnArtifact
+
+
+def test_unknown_status_rows_are_not_scored():
+    artifact = ChurnArtifact(CHURN_ARTIFACT)
+    scorer = Scorer(None, None, artifact.kernel(), artifact.features, artifact.status_codes, 'test')
+    # read_csv in score_range parses account_status as text
+    df = pd.DataFrame([dict.fromkeys(artifact.features, '10')] * 5)
+    df['account_status'] = ['Closed', '1', '7', '-3.5', 'Inactive']
+    X, valid = scorer.matrix(df)
+    assert valid.tolist() == [True, True, False, False, False]
+    np.testing.assert_array_equal(X[0], X[1])
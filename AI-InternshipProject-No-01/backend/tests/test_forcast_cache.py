@@ -0,0 +1,53 @@
+import shutil
+import time
+import uuid
+
+import pytest
+
+SALES = open('retail_sales_data.csv', 'rb').read()
+
+
+@pytest.fixture
+def series():
+    import app
+    name = f"test-{uuid.uuid4().hex[:12]}"
+    yield name
+    shutil.rmtree(f"{app.FORECAST_STATE_FOLDER}/{name}", ignore_errors=True)
+
+
+def later_month():
+    # The sample plus rows one month after its last date: an incremental update of the series
+    lines = SALES.decode().splitlines()
+    latest = max(line.split(',')[5] for line in lines[1:])
+    month = f"{int(latest[:4]) + int(latest[5:7]) // 12}-{int(latest[5:7]) % 12 + 1:02d}-15"
+    extra = [','.join(line.split(',')[:5] + [month] + line.split(',')[6:]) for line in lines[1:21]]
+    return ('\n'.join(lines + extra) + '\n').encode()
+
+
+def upload(client, series, body=SALES):
+    response = client.post(f'/predict-file?series={series}', data=body, content_type='text/csv')
+    assert response.status_code in (200, 202), response.get_json()
+    if response.status_code == 202:
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            info = client.get(response.headers['Location']).get_json()
+            if info['status'] in ('done', 'failed'):
+                assert info['status'] == 'done', info.get('error')
+                break
+            time.sleep(0.2)
+    return response.headers['X-Forecast-Cache'], response.headers['X-Forecast-Cache-Key']
+
+
+def test_series_cache_key_follows_the_state(series):
+    from app import app
+    client = app.test_client()
+
+    first = upload(client, series)
+    assert first[0] == 'MISS'
+    # Another upload moves the series state on: the first file is trained again, not served stale
+    assert upload(client, series, later_month())[0] == 'MISS'
+    again = upload(client, series)
+    assert again[0] == 'MISS'
+    assert again[1] != first[1]
+    # Unchanged state: the same upload is a cache hit
+    assert upload(client, series) == ('HIT', again[1])
@@ -0,0 +1,77 @@
+import io
+import os
+import time
+
+import numpy as np
+import pytest
+
+from forcast_ingest import IngestError, read_sales_csv, spool_upload
+from forcast_jobs import ForecastJobQueue, QueueFull
+
+SALES = open('retail_sales_data.csv', 'rb').read()
+
+
+def with_quantity(value):
+    # The sample file with the second row's Quantity_Sold replaced
+    lines = SALES.splitlines()
+    lines[2] = lines[2].rsplit(b',', 1)[0] + b',' + value
+    return b'\n'.join(lines) + b'\n'
+
+
+def test_whole_quantities_are_int32():
+    df = read_sales_csv(io.BytesIO(with_quantity(b'90.0')))
+    assert df['Quantity_Sold'].dtype == np.int32
+    assert df['Quantity_Sold'][1] == 90
+
+
+def test_fractional_quantities_stay_float():
+    df = read_sales_csv(io.BytesIO(with_quantity(b'90.5')))
+    assert df['Quantity_Sold'].dtype == np.float64
+    assert df['Quantity_Sold'][1] == 90.5
+
+
+@pytest.mark.parametrize('value', [b'', b'NaN', b'many'])
+def test_missing_or_text_quantities_are_rejected(value):
+    with pytest.raises(IngestError):
+        read_sales_csv(io.BytesIO(with_quantity(value)))
+
+
+def test_empty_quantity_is_400():
+    from app import app
+    response = app.test_client().post('/predict-file', data=with_quantity(b''), content_type='text/csv')
+    assert response.status_code == 400
+    assert 'Quantity_Sold' in response.get_json()['error']
+
+
+def spilled(folder):
+    spool = spool_upload(io.BytesIO(SALES), str(folder), memory_limit=1024)
+    assert not spool.in_memory
+    return spool.source()
+
+
+def test_spilled_upload_is_removed_when_the_job_finishes(tmp_path):
+    done = []
+    queue = ForecastJobQueue(workers=1, on_done=lambda key, results, model: done.append(key))
+    try:
+        path = spilled(tmp_path)
+        job_id = queue.submit('sales', path)
+        # An identical upload joins the running job and its own copy is dropped
+        duplicate = spilled(tmp_path)
+        assert queue.submit('sales', duplicate) == job_id
+        assert not os.path.exists(duplicate)
+
+        deadline = time.time() + 120
+        while queue.status(job_id)['status'] in ('queued', 'running') and time.time() < deadline:
+            time.sleep(0.2)
+        assert queue.status(job_id)['status'] == 'done'
+        assert done == ['sales']
+        assert os.listdir(tmp_path) == []
+    finally:
+        queue.shutdown()
+
+
+def test_spilled_upload_is_removed_when_the_queue_is_full(tmp_path):
+    queue = ForecastJobQueue(workers=1, max_pending=0)
+    with pytest.raises(QueueFull):
+        queue.submit('sales', spilled(tmp_path))
+    assert os.listdir(tmp_path) == []
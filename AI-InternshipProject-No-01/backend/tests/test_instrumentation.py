@@ -0,0 +1,49 @@
+import os
+import threading
+
+from instrumentation import StageHistograms
+
+
+def run_threads(histograms, count, concurrent=1):
+    for _ in range(0, count, concurrent):
+        threads = [threading.Thread(target=histograms.observe, args=('predict-churn', 'total', 0.002))
+                   for _ in range(concurrent)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+
+def total_count(histograms):
+    counts, _ = histograms.snapshot()[('predict-churn', 'total')]
+    return sum(counts)
+
+
+def test_thread_per_request_reuses_stores():
+    # Like app.run(threaded=True): every request runs on a fresh thread
+    histograms = StageHistograms()
+    run_threads(histograms, 500)
+    assert total_count(histograms) == 500
+    assert len(histograms.threads.stores) <= 2
+
+
+def test_stores_bounded_by_concurrent_threads():
+    histograms = StageHistograms()
+    run_threads(histograms, 400, concurrent=8)
+    assert total_count(histograms) == 400
+    assert len(histograms.threads.stores) <= 9
+    assert '_count{endpoint="predict-churn",stage="total"} 400' in histograms.prometheus_text()
+
+
+def test_workers_merge_through_state_dir(tmp_path):
+    # Another worker's dump (any other pid) is added to the live counts; a corrupt one is skipped
+    worker = StageHistograms(str(tmp_path))
+    run_threads(worker, 30)
+    worker.flush()
+    os.replace(tmp_path / f'{os.getpid()}.json', tmp_path / '1.json')
+    (tmp_path / '2.json').write_text('{not json')
+
+    histograms = StageHistograms(str(tmp_path))
+    run_threads(histograms, 20)
+    counts, _ = histograms.collect()[('predict-churn', 'total')]
+    assert sum(counts) == 50
@@ -0,0 +1,30 @@
+import threading
+
+import pandas as pd
+
+from model_artifacts import PRODUCT_ARTIFACT, ProductArtifact
+
+
+def test_counts_are_exact_under_threads(tmp_path):
+    lookup = ProductArtifact(PRODUCT_ARTIFACT).lookup()
+    known = pd.read_csv('customer_recommendations_better.csv')[lookup.features].iloc[0].tolist()
+    unknown = ['Atlantis'] + known[1:]
+
+    def requests():
+        for _ in range(2000):
+            lookup.find_values(known)
+            lookup.find_rows([known, unknown, unknown])
+
+    threads = [threading.Thread(target=requests) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = lookup.stats()
+    assert (stats['hits'], stats['misses']) == (8 * 2000 * 2, 8 * 2000 * 2)
+    assert stats['hit_rate'] == 0.5
+
+    # Another serve.py worker's dump is included
+    lookup.counters.state_dir = str(tmp_path)
+    (tmp_path / '1.json').write_text('{"hits": 10, "misses": 30}')
+    assert (lookup.stats()['hits'], lookup.stats()['misses']) == (32010, 32030)
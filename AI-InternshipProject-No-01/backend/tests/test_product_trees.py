@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from model_artifacts import PRODUCT_ARTIFACT, ProductArtifact
+
+
+@pytest.fixture(scope='module')
+def artifact():
+    artifact = ProductArtifact(PRODUCT_ARTIFACT)
+    assert artifact.trees is not None
+    return artifact
+
+
+def customer_rows(artifact, n, seed=0):
+    # Real customers, random combinations of known values, and values the model never saw
+    rng = np.random.default_rng(seed)
+    real = pd.read_csv('customer_recommendations_better.csv')[artifact.features].dropna()
+    rows = real.sample(n, replace=True, random_state=seed).reset_index(drop=True)
+    shuffled = rng.random(n) < 0.5
+    for f in artifact.features:
+        values = np.asarray(artifact.manifest['categories'][f], dtype=object)
+        rows.loc[shuffled, f] = values[rng.integers(0, len(values), shuffled.sum())]
+        rows.loc[rng.random(n) < 0.1, f] = 'unseen'
+    return rows
+
+
+def booster_margins(artifact, rows):
+    model = artifact.booster_model
+    return model.booster.inplace_predict(model.encode(rows), iteration_range=model.iteration_range,
+                                         missing=np.nan, predict_type='margin')
+
+
+def test_margins_and_proba_match_the_booster(artifact):
+    trees = artifact.trees
+    rows = customer_rows(artifact, 5000)
+    codes = trees.encode(rows)
+    assert (codes < 0).any(axis=1).mean() > 0.3
+
+    reference = booster_margins(artifact, rows)
+    np.testing.assert_allclose(trees.margins(codes), reference, rtol=0, atol=1e-4)
+    np.testing.assert_allclose(trees.traverse(codes), reference, rtol=0, atol=1e-4)
+
+    proba = artifact.booster_model.predict_proba(rows)
+    np.testing.assert_allclose(trees.predict_proba(rows), proba, rtol=0, atol=1e-5)
+    assert (trees.predict(rows) == proba.argmax(axis=1)).all()
+    records = trees.encode_records(rows.to_dict(orient='records'))
+    np.testing.assert_array_equal(records, codes)
+
+
+def test_out_of_range_codes_score_as_unknown(artifact):
+    trees = artifact.trees
+    codes = trees.encode(customer_rows(artifact, 200, seed=1))
+    unknown = codes.copy()
+    unknown[:, ::2] = -1
+    out_of_range = codes.copy()
+    out_of_range[:, ::2] = trees.cardinality[::2] + np.arange(len(codes))[:, None] % 3
+    np.testing.assert_array_equal(trees.margins(out_of_range), trees.margins(unknown))
+    np.testing.assert_array_equal(trees.traverse(out_of_range), trees.traverse(unknown))
@@ -0,0 +1,124 @@
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+import numpy as np
+import pytest
+
+from conftest import BACKEND
+from scoring_rpc import RpcClient, listen
+
+HOST = '127.0.0.1'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+def request(port, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection(HOST, port, timeout=30)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def wait_for(check, timeout, what):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            result = check()
+            if result:
+                return result
+        except OSError:
+            pass
+        time.sleep(0.5)
+    pytest.fail(f"timed out waiting for {what}")
+
+
+def unique_upload():
+    # retail_sales_data.csv with one quantity changed, so the forecast cache misses
+    with open(os.path.join(BACKEND, 'retail_sales_data.csv')) as f:
+        lines = f.read().splitlines()
+    fields = lines[1].split(',')
+    fields[-1] = str(uuid.uuid4().int % 500 + 1)
+    lines[1] = ','.join(fields)
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def run_forecast(port):
+    status, body = request(port, 'POST', '/predict-file', unique_upload(), {'Content-Type': 'text/csv'})
+    assert status == 202, body
+    job_url = json.loads(body)['status_url']
+
+    def finished():
+        status, body = request(port, 'GET', job_url)
+        info = json.loads(body)
+        return info if info['status'] in ('done', 'failed') else None
+    return wait_for(finished, 180, 'the forecast job')
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="process groups")
+def test_forecast_jobs_with_rpc_address_under_python_app(tmp_path):
+    # The spawned forecast workers re-import app.py as __mp_main__; they must not bind
+    # SCORING_RPC_ADDRESS again (EADDRINUSE broke the pool on every job)
+    port, rpc_port = free_port(), free_port()
+    env = dict(os.environ, API_PORT=str(port), SCORING_RPC_ADDRESS=f'{HOST}:{rpc_port}', FORECAST_WORKERS='1')
+    env.pop('API_PREFORK', None)
+    log = open(tmp_path / 'app.log', 'w')
+    server = subprocess.Popen([sys.executable, 'app.py'], cwd=BACKEND, env=env, stdout=log,
+                              stderr=subprocess.STDOUT, start_new_session=True)
+    try:
+        wait_for(lambda: request(port, 'GET', '/ready')[0] == 200, 120, '/ready')
+        for _ in range(2):
+            info = run_forecast(port)
+            assert info['status'] == 'done', info.get('error')
+
+        client = RpcClient(f'{HOST}:{rpc_port}')
+        assert 'churn' in client.call('schema')
+        client.close()
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=30)
+        log.close()
+
+
+def test_listen_does_not_take_over_a_live_unix_socket(tmp_path):
+    address = str(tmp_path / 'rpc.sock')
+    live = listen(address)
+    try:
+        with pytest.raises(OSError):
+            listen(address)
+    finally:
+        live.close()
+    # A stale socket file (no server behind it) is replaced
+    listen(address).close()
+
+
+def test_churn_unknown_status_is_nan_on_both_paths():
+    from app import CHURN_FEATURES, scoring_service
+
+    churn = scoring_service.model('churn')
+    status = CHURN_FEATURES.index('account_status')
+    rows = [[10.0] * len(CHURN_FEATURES) for _ in range(5)]
+    for row, value in zip(rows, ['Closed', 1, 7, -3.5, 'Inactive']):
+        row[status] = value
+    by_rows = np.frombuffer(scoring_service.churn({'rows': rows})['proba'], dtype='<f8')
+    assert by_rows[0] == by_rows[1]
+    assert np.isnan(by_rows[2:]).all()
+
+    X = np.full((4, len(CHURN_FEATURES)), 10.0)
+    X[:, status] = [churn.status_codes['Closed'], 7, -3.5, np.nan]
+    by_x = np.frombuffer(scoring_service.churn({'x': X.astype('<f8').tobytes()})['proba'], dtype='<f8')
+    assert by_x[0] == by_rows[0]
+    assert np.isnan(by_x[1:]).all()
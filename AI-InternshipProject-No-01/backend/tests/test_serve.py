@@ -0,0 +1,79 @@
+import glob
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from conftest import BACKEND
+from test_scoring_rpc import free_port, request, unique_upload, wait_for
+
+
+def children(master):
+    # pid -> state letter ('Z' for a zombie) of the master's child processes
+    states = {}
+    for path in glob.glob('/proc/[0-9]*/stat'):
+        try:
+            with open(path) as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == master:
+            states[int(path.split('/')[2])] = fields[0]
+    return states
+
+
+def start(tmp_path):
+    port = free_port()
+    env = dict(os.environ, API_METRICS_DIR=str(tmp_path / 'metrics'))
+    with open(tmp_path / 'serve.log', 'wb') as log:
+        master = subprocess.Popen([sys.executable, 'serve.py', '--port', str(port), '--workers', '2',
+                                   '--graceful-timeout', '30'], cwd=BACKEND, env=env, stdout=log, stderr=log)
+    return master, port
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def test_restart_and_scale_down_leave_no_zombies(tmp_path):
+    master, port = start(tmp_path)
+    try:
+        wait_for(lambda: request(port, 'GET', '/ready')[0] == 200, 120, '/ready')
+        wait_for(lambda: len(children(master.pid)) == 2, 30, 'two workers')
+        first = set(children(master.pid))
+
+        # Rolling restart, then one worker fewer while the old ones are still exiting
+        master.send_signal(signal.SIGHUP)
+        wait_for(lambda: first.isdisjoint(children(master.pid)), 60, 'the rolling restart')
+        master.send_signal(signal.SIGTTOU)
+        wait_for(lambda: list(children(master.pid).values()) == ['S'] or
+                 list(children(master.pid).values()) == ['R'], 60, 'one live worker and no zombies')
+        assert request(port, 'GET', '/ready')[0] == 200
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=60)
+    assert children(master.pid) == {}
+
+
+def test_shutdown_waits_for_retired_workers(tmp_path):
+    # A retired worker drains its forecast pool before exiting; the master must not exit first
+    master, port = start(tmp_path)
+    try:
+        wait_for(lambda: request(port, 'GET', '/ready')[0] == 200, 120, '/ready')
+        wait_for(lambda: len(children(master.pid)) == 2, 30, 'two workers')
+        first = set(children(master.pid))
+        header, rows = unique_upload().split(b'\n', 1)
+        status, _ = request(port, 'POST', '/predict-file', header + b'\n' + rows * 3000, {'Content-Type': 'text/csv'})
+        assert status == 202
+        master.send_signal(signal.SIGHUP)
+        wait_for(lambda: len(children(master.pid)) == 4, 30, 'the replacement workers')
+        time.sleep(1)
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=60)
+    assert not any(alive(pid) for pid in first)
@@ -1,6 +1,19 @@
 let groupedDataGlobal = {};
 let chart2Instance = null;
 
+const API_BASE = 'http://127.0.0.1:5000';
+
+// Training runs in the background: poll the job until it finishes
+async function waitForJob(statusUrl) {
+  while (true) {
+    await new Promise(resolve => setTimeout(resolve, 1000));
+    const res = await fetch(API_BASE + statusUrl);
+    const job = await res.json();
+    if (job.status === 'done') return job.result;
+    if (job.status === 'failed' || job.error) return { error: job.error || 'Forecast job failed' };
+  }
+}
+
 async function uploadFile() {
   const fileInput = document.getElementById('csvFile');
   const file = fileInput.files[0];
@@ -10,12 +23,13 @@ async function uploadFile() {
   formData.append('file', file);
 
   try {
-    const response = await fetch('http://127.0.0.1:5000/predict-file', {
+    const response = await fetch(API_BASE + '/predict-file', {
       method: 'POST',
       body: formData
     });
 
-    const data = await response.json();
+    let data = await response.json();
+    if (response.status === 202) data = await waitForJob(data.status_url);
     if (data.error) return alert("❌ " + data.error);
 
     document.getElementById("accuracy").innerText = `✅ Model Accuracy: ${data.accuracy}%`;